@@ -91,6 +91,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "pjtk2.middleware.PermissionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     #'main.middleware.LoginRequiredMiddleware',
@@ -208,6 +209,65 @@ LINK_PATTERNS = [
 # the maximum number of images to include in the report for each project.
 MAX_REPORT_IMG_COUNT = 2
 
+# cache the employee hierarchy (supervisors and minions) for the life
+# of each process.  The cache is cleared whenever an employee is saved,
+# but only in the process that saved it.
+EMPLOYEE_HIERARCHY_CACHE = False
+
+# the project detail page is cached in fragments that are versioned
+# by Project.cache_version.  Any of the django cache backends can be
+# used - the local-memory cache is the default, but it is per process
+# so a file (or shared) cache makes better use of memory when several
+# workers are running:
+#
+# CACHES = {
+#     "default": {
+#         "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+#         "LOCATION": "/var/tmp/pjtk2_cache",
+#     }
+# }
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pjtk2",
+    }
+}
+
+# the number of seconds that each version of the project detail
+# fragments is kept.  Old versions are never used, they just expire.
+# Changes to users (e.g. names of staff) do not change the version, so
+# they can take this long to appear.
+PROJECT_DETAIL_CACHE_TIMEOUT = 60 * 60 * 6
+
+# the number of seconds that the facet counts of each project search
+# are cached.  They are also discarded whenever a project is saved.
+PROJECT_FACET_CACHE_TIMEOUT = 60 * 5
+
+# the number of seconds that each vector tile (for each set of filters)
+# is cached.  They are also discarded whenever a project or project
+# polygon is saved.
+VECTOR_TILE_CACHE_TIMEOUT = 60 * 60
+
+# regions of interest drawn on the maps with more than
+# ROI_SIMPLIFY_MIN_COORDS vertices are simplified to this tolerance (in
+# degrees - 0.0001 is about 10 m) before they are used in spatial
+# queries.  Set the tolerance to None to never simplify them.
+ROI_SIMPLIFY_TOLERANCE = 0.0001
+ROI_SIMPLIFY_MIN_COORDS = 250
+
+# the number of seconds that each normalized roi, and the projects it
+# contains, are cached.
+ROI_CACHE_TIMEOUT = 60 * 10
+
+# the maximum number of sample points that can be uploaded for a
+# project in a single points file.
+MAX_UPLOAD_POINTS = 500000
+
+# milestone notifications are added to an outbox when the transaction
+# is committed and are sent by the process_notifications management
+# command.  Set to False to send them immediately.
+DEFER_NOTIFICATIONS = True
+
 
 # a dictionary of attributes used to create links to project details in
 # associated (but currently distinct) apps - fisheye, fsis-II and
@@ -35,4 +35,11 @@ COVERAGE_MODULE_EXCLUDES += THIRDPARTY_APPS + DJANGO_APPS
 COVERAGE_REPORT_HTML_OUTPUT_DIR = os.path.join(__file__, "../../../coverage")
 
 
+# the notification tests expect the messages to be sent when the
+# milestones are saved.
+DEFER_NOTIFICATIONS = False
+
+# nothing is cached unless a test explicitly overrides CACHES.
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
 logging.getLogger("factory").setLevel(logging.WARN)
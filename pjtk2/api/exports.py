@@ -0,0 +1,150 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/api/exports.py
+Created: 18 Oct 2026 14:10:44
+
+
+DESCRIPTION:
+
+Streaming bulk exports of projects and sample points as csv or
+newline delimited json (ndjson).
+
+Unlike the DRF endpoints, the exports never build model or serializer
+instances - the rows are retrieved as tuples with .values_list(),
+read from a server side cursor with .iterator(chunk_size) and written
+to a StreamingHttpResponse as they arrive.  Memory use is the same
+whether a hundred or a couple of million rows are exported, and the
+first row is sent as soon as it is available.
+
+Both exports accept the same filters as the corresponding api
+endpoints (ProjectFilter and SamplePointFilter).
+
+A. Cottrill
+=============================================================
+"""
+
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from pjtk2.filters import ProjectFilter, SamplePointFilter
+from pjtk2.models import Project, SamplePoint
+from pjtk2.utils.spatial_utils import PointX, PointY
+
+
+# the number of rows fetched from the database (and written to the
+# response) at a time.
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# (column name, lookup) of each exported field
+PROJECT_EXPORT_FIELDS = (
+    ("prj_cd", "prj_cd"),
+    ("prj_nm", "prj_nm"),
+    ("year", "year"),
+    ("prj_date0", "prj_date0"),
+    ("prj_date1", "prj_date1"),
+    ("status", "status"),
+    ("project_type", "project_type__project_type"),
+    ("protocol", "protocol__abbrev"),
+    ("lake", "lake__abbrev"),
+    ("prj_ldr", "prj_ldr__username"),
+    ("slug", "slug"),
+)
+
+SAMPLE_POINT_EXPORT_FIELDS = (
+    ("prj_cd", "project__prj_cd"),
+    ("label", "label"),
+    ("dd_lat", "dd_lat"),
+    ("dd_lon", "dd_lon"),
+    ("project_type", "project__project_type__project_type"),
+)
+
+
+class Echo:
+    """A file-like object that just returns what is written to it, so
+    that csv.writer can format one row at a time."""
+
+    def write(self, value):
+        return value
+
+
+def stream_rows(names, rows, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """A generator that formats the rows (tuples in the same order as
+    names) as csv or ndjson.  The formatted rows are yielded in chunks
+    of chunk_size rows, except for the first row (and the csv header)
+    which are yielded immediately.
+
+    Arguments:
+    - `names`: the names of the columns
+    - `rows`: an iterable of tuples
+    - `fmt`: either 'csv' or 'ndjson'
+    - `chunk_size`: the number of rows yielded at a time
+
+    """
+
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(names)
+        format_row = writer.writerow
+    else:
+        encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+        def format_row(row):
+            return encoder.encode(dict(zip(names, row))) + "\n"
+
+    chunk = []
+    limit = 1
+    for row in rows:
+        chunk.append(format_row(row))
+        if len(chunk) >= limit:
+            yield "".join(chunk)
+            chunk = []
+            limit = chunk_size
+    if chunk:
+        yield "".join(chunk)
+
+
+def export_response(queryset, fields, fmt, filename):
+    """Return a StreamingHttpResponse containing the fields of every row
+    in the queryset formatted as csv or ndjson."""
+
+    names = [x[0] for x in fields]
+    rows = queryset.values_list(*[x[1] for x in fields]).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    response = StreamingHttpResponse(
+        stream_rows(names, rows, fmt), content_type=CONTENT_TYPES[fmt]
+    )
+    response["Content-Disposition"] = 'attachment; filename="{}.{}"'.format(
+        filename, fmt
+    )
+    return response
+
+
+@require_GET
+def export_projects(request, fmt="ndjson"):
+    """Stream all of the active projects that match the filters in the
+    request, newest first."""
+
+    queryset = ProjectFilter(request.GET, Project.objects.all()).qs
+    queryset = queryset.order_by("-year", "prj_cd")
+    return export_response(queryset, PROJECT_EXPORT_FIELDS, fmt, "projects")
+
+
+@require_GET
+def export_sample_points(request, fmt="ndjson"):
+    """Stream the sample points of all of the projects that match the
+    filters in the request.  The points are in the order they were
+    created (which keeps the points of each project together) and the
+    coordinates are calculated by the database."""
+
+    queryset = SamplePointFilter(request.GET, SamplePoint.objects.all()).qs
+    queryset = queryset.annotate(dd_lat=PointY("geom"), dd_lon=PointX("geom"))
+    queryset = queryset.order_by("id")
+    return export_response(
+        queryset, SAMPLE_POINT_EXPORT_FIELDS, fmt, "sample_points"
+    )
@@ -0,0 +1,193 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/api/pagination.py
+Created: 18 Oct 2026 13:32:18
+
+
+DESCRIPTION:
+
+Pagination classes used by the pjtk2 api.
+
+StandardResultsSetPagination is the default page number pagination.
+Every page requires a COUNT(*) and an OFFSET scan that gets slower the
+deeper you go, so endpoints that are walked from start to finish (like
+project_abstracts for the annual report) can opt in to keyset (cursor)
+pagination by adding ?pagination=cursor to the first request and then
+following the 'next' links.
+
+Keyset pagination orders the queryset by the view's keyset_ordering
+(which must end with a unique field) and encodes the ordering values of
+the last row of each page in the cursor.  The next page is selected
+with a WHERE clause on those values, so there is no count query and no
+offset - retrieving every page is linear in the number of rows.
+
+A. Cottrill
+=============================================================
+"""
+
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class KeysetPagination(BasePagination):
+    """Forward only keyset pagination on a multi-column ordering.  The
+    ordering is taken from view.keyset_ordering (field names, optionally
+    prefixed with '-' and following relationships with '__').  The last
+    field must be unique.  Null values are assumed to sort the way
+    postgres sorts them - last in ascending order and first in
+    descending order."""
+
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_param = StandardResultsSetPagination.page_size_query_param
+    max_page_size = StandardResultsSetPagination.max_page_size
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    ordering = ("id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = getattr(view, "keyset_ordering", self.ordering)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        # get one extra row to see if there is another page
+        rows = list(queryset[: self.page_size + 1])
+        self.page = rows[: self.page_size]
+        self.next_position = None
+        if len(rows) > self.page_size:
+            self.next_position = self.get_position(self.page[-1])
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_position(self, instance):
+        """The value of each of the ordering fields of instance."""
+        position = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip("-").split("__"):
+                value = getattr(value, attr, None)
+                if value is None:
+                    break
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def get_keyset_filter(self, position):
+        """A Q object that selects the rows that come after position -
+        the rows that equal position in the first n fields and come
+        after it in field n+1, for each field in the ordering."""
+
+        keyset = None
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            descending = field.startswith("-")
+            if value is None:
+                # nulls come first in descending order - so everything
+                # else comes after them - and last in ascending order.
+                after = Q(**{name + "__isnull": False}) if descending else None
+                is_equal = Q(**{name + "__isnull": True})
+            else:
+                lookup = "__lt" if descending else "__gt"
+                after = Q(**{name + lookup: value})
+                if not descending:
+                    after |= Q(**{name + "__isnull": True})
+                is_equal = Q(**{name: value})
+            if after is not None:
+                keyset = equal & after if keyset is None else keyset | (equal & after)
+            equal &= is_equal
+
+        if keyset is None:
+            # position is the very last row
+            return Q(pk__in=[])
+        return keyset
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class OptionalKeysetPagination(StandardResultsSetPagination):
+    """Page number pagination unless the request asks for cursor
+    pagination (?pagination=cursor) or includes a cursor."""
+
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request):
+        params = request.query_params
+        return params.get("pagination") == "cursor" or (
+            self.keyset_class.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super(OptionalKeysetPagination, self).paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super(OptionalKeysetPagination, self).get_paginated_response(data)
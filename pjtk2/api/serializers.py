@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import WKTWriter
 from pjtk2.models import Project, ProjectType, SamplePoint, ProjectPolygon, ProjectImage
+from pjtk2.utils.spatial_utils import PointX, PointY
 
 User = get_user_model()
 
@@ -130,6 +132,45 @@ class ProjectPointSerializer(serializers.HyperlinkedModelSerializer):
         )
 
 
+def serialize_project_points(queryset):
+    """A fast alternative to ProjectPointSerializer(queryset, many=True).
+
+    The coordinates, label, project code and project type of each
+    sample point are retrieved with a single values_list() query (the
+    coordinates are calculated by postgis) and converted directly to
+    dictionaries - no SamplePoint, Project or GEOS objects are created.
+    The dictionaries are identical to the ones returned by
+    ProjectPointSerializer.
+
+    Arguments:
+    - `queryset`: a SamplePoint queryset (any ordering is preserved)
+
+    """
+
+    rows = queryset.annotate(
+        dd_lat=PointY("geom"), dd_lon=PointX("geom")
+    ).values_list(
+        "project__prj_cd",
+        "label",
+        "dd_lat",
+        "dd_lon",
+        "project__project_type__project_type",
+    )
+
+    # popup_text is the same as SamplePoint.__str__()
+    return [
+        {
+            "prj_cd": prj_cd,
+            "label": label,
+            "dd_lat": dd_lat,
+            "dd_lon": dd_lon,
+            "popup_text": "{} - {}".format(prj_cd, label) if label else prj_cd,
+            "project_type": project_type,
+        }
+        for prj_cd, label, dd_lat, dd_lon, project_type in rows
+    ]
+
+
 class ProjectPolygonSerializer(serializers.HyperlinkedModelSerializer):
 
     prj_cd = serializers.CharField(source="project.prj_cd", read_only=True)
@@ -137,3 +178,29 @@ class ProjectPolygonSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = ProjectPolygon
         fields = ("prj_cd", "geom")
+
+
+def serialize_project_polygons(queryset, column="geom", precision=None):
+    """Return the project code and polygon of each ProjectPolygon in
+    queryset in the same format as ProjectPolygonSerializer, but using
+    the polygon in `column` (e.g. one of the simplified polygons) with
+    the coordinates rounded to `precision` decimal places.
+
+    Arguments:
+    - `queryset`: a ProjectPolygon queryset
+    - `column`: the polygon field to return
+    - `precision`: the number of decimal places in the coordinates
+
+    """
+
+    writer = WKTWriter(trim=True, precision=precision)
+    rows = queryset.values_list("project__prj_cd", column)
+    return [
+        {
+            "prj_cd": prj_cd,
+            "geom": "SRID={};{}".format(geom.srid, writer.write(geom).decode())
+            if geom
+            else None,
+        }
+        for prj_cd, geom in rows
+    ]
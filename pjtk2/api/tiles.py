@@ -0,0 +1,62 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/api/tiles.py
+Created: 18 Oct 2026 15:06:38
+
+
+DESCRIPTION:
+
+Mapbox Vector Tiles of the sample points and project polygons for the
+project maps - /api/tiles/{z}/{x}/{y}.mvt.
+
+The tiles accept the same filters as the sample point endpoints
+(year, first_year, last_year, lake, prj_cd and project_type) and are
+built by pjtk2.utils.vector_tiles, which caches each tile for each set
+of filters.  The project polygons are simplified to suit the zoom
+level of the tile.
+
+A. Cottrill
+=============================================================
+"""
+
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+
+from pjtk2.filters import ProjectPolygonFilter, SamplePointFilter
+from pjtk2.models import ProjectPolygon, SamplePoint, get_zoom_resolution
+from pjtk2.utils.vector_tiles import get_vector_tile, tile_bounds
+
+
+MVT_CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+
+# the number of seconds that browsers (and proxies) can cache a tile
+TILE_MAX_AGE = 60 * 5
+
+
+@require_GET
+def vector_tile(request, z, x, y):
+    """Return the vector tile z/x/y containing the sample points and
+    project polygons of the projects that match the filters in the
+    request.  Empty tiles are returned with a 204 so the map doesn't
+    have to decode them."""
+
+    try:
+        tile_bounds(z, x, y)
+    except ValueError:
+        raise Http404("Tile does not exist.")
+
+    points = SamplePointFilter(request.GET, SamplePoint.objects.all()).qs
+    polygons = ProjectPolygonFilter(request.GET, ProjectPolygon.objects.all()).qs
+
+    # the simplified polygons are drawn at lower zoom levels - the same
+    # ones returned by the project polygon endpoint with ?zoom=
+    resolution = get_zoom_resolution(int(z))
+    polygon_column = "geom" if resolution is None else "geom_" + resolution[0]
+
+    tile = get_vector_tile(points, polygons, z, x, y, request.GET, polygon_column)
+
+    status = 200 if tile else 204
+    response = HttpResponse(tile, content_type=MVT_CONTENT_TYPE, status=status)
+    patch_cache_control(response, public=True, max_age=TILE_MAX_AGE)
+    return response
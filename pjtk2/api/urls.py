@@ -3,6 +3,8 @@ from django.conf.urls import url, include
 from rest_framework import routers
 from rest_framework.urlpatterns import format_suffix_patterns
 
+from .exports import export_projects, export_sample_points
+from .tiles import vector_tile
 from .views import (
     UserViewSet,
     ProjectViewSet,
@@ -11,6 +13,7 @@ from .views import (
     ProjectPolygonViewSet,
     ProjectAbstractViewSet,
     points_roi,
+    project_lookup,
 )
 
 app_name = "api"
@@ -42,6 +45,25 @@ urlpatterns = [
         ProjectPolygonViewSet.as_view({"get": "list"}),
         name="project_polygon",
     ),
+    # typeahead lookups by project code or name
+    url(r"^project_lookup/$", project_lookup, name="project_lookup"),
+    # streaming csv or ndjson exports
+    url(
+        r"^export/projects\.(?P<fmt>csv|ndjson)$",
+        export_projects,
+        name="export_projects",
+    ),
+    url(
+        r"^export/sample_points\.(?P<fmt>csv|ndjson)$",
+        export_sample_points,
+        name="export_sample_points",
+    ),
+    # vector tiles of the sample points and project polygons
+    url(
+        r"^tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$",
+        vector_tile,
+        name="vector_tile",
+    ),
     # just the points - regardless of project
     url(r"points_in_roi/", points_roi, {"how": "points_in"}, name="get_points_in_roi"),
     # points for projects were ALL points are in roi
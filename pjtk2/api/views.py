@@ -1,7 +1,7 @@
-from django.db.models import Q, Prefetch
+from django.db.models import Case, IntegerField, Q, Prefetch, Value, When
 from django.http import Http404
+from django.utils.cache import patch_cache_control
 from django.contrib.auth import get_user_model
-from django.contrib.gis.geos import GEOSGeometry, Polygon
 
 from rest_framework import generics, viewsets, status
 from rest_framework.generics import RetrieveAPIView
@@ -12,10 +12,10 @@ from rest_framework.permissions import AllowAny
 
 from django_filters import rest_framework as filters
 
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.exceptions import ValidationError
 
 
+from .pagination import OptionalKeysetPagination, StandardResultsSetPagination
 from .serializers import (
     ProjectSerializer,
     ProjectAbstractSerializer,
@@ -23,26 +23,44 @@ from .serializers import (
     ProjectPointSerializer,
     ProjectPolygonSerializer,
     UserSerializer,
+    serialize_project_points,
+    serialize_project_polygons,
+)
+from pjtk2.models import (
+    POLYGON_RESOLUTIONS,
+    get_zoom_resolution,
+    Project,
+    ProjectType,
+    SamplePoint,
+    ProjectPolygon,
+    ProjectImage,
 )
-from pjtk2.models import Project, ProjectType, SamplePoint, ProjectPolygon, ProjectImage
 
 from pjtk2.filters import SamplePointFilter, ProjectFilter
 
-from pjtk2.utils.spatial_utils import find_roi_points
+from pjtk2.utils.roi import InvalidROI, normalize_roi
+from pjtk2.utils.spatial_utils import find_roi_points, get_roi_project_ids
 
 User = get_user_model()
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 50
-    page_size_query_param = "page_size"
-    max_page_size = 1000
+# the project lookup (typeahead) endpoint - shorter search strings
+# can't use the trigram indexes.
+LOOKUP_MIN_LENGTH = 3
+LOOKUP_LIMIT = 10
+LOOKUP_MAX_LIMIT = 50
+LOOKUP_MAX_AGE = 60 * 5
+
+# the decimal places of the full resolution project polygons (about
+# 10 cm) when a resolution or zoom level is requested.
+POLYGON_FULL_PRECISION = 6
 
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.order_by("id").all()
     serializer_class = UserSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = OptionalKeysetPagination
+    keyset_ordering = ("id",)
     lookup_field = "username"
 
 
@@ -55,7 +73,8 @@ class ProjectTypeViewSet(viewsets.ReadOnlyModelViewSet):
 class ProjectViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = OptionalKeysetPagination
+    keyset_ordering = ("-prj_date1", "id")
     lookup_field = "slug"
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = ProjectFilter
@@ -74,7 +93,8 @@ class ProjectAbstractViewSet(viewsets.ReadOnlyModelViewSet):
         .order_by("-year", "project_type__project_type", "prj_nm")
     )
     serializer_class = ProjectAbstractSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = OptionalKeysetPagination
+    keyset_ordering = ("-year", "project_type__project_type", "prj_nm", "id")
     lookup_field = "slug"
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = ProjectFilter
@@ -100,8 +120,51 @@ class ProjectPointViewSet(viewsets.ReadOnlyModelViewSet):
         slug = self.kwargs.get("slug").lower()
         return queryset.filter(project__slug=slug)
 
+    def list(self, request, *args, **kwargs):
+        # the same data as ProjectPointSerializer without building a
+        # model instance for every point.
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(serialize_project_points(queryset))
+
+
+def get_polygon_resolution(query_params):
+    """Return the (resolution, decimal places) of the polygons requested
+    with either ?resolution=low|medium|full or the zoom level of the
+    map (?zoom=n) - the lowest resolution that is adequate at that
+    zoom.  Returns None if neither is given (the full polygon)."""
+
+    resolutions = {x[0]: x for x in POLYGON_RESOLUTIONS}
+    resolution = query_params.get("resolution")
+    zoom = query_params.get("zoom")
+
+    if resolution:
+        if resolution == "full":
+            return ("full", POLYGON_FULL_PRECISION)
+        if resolution not in resolutions:
+            choices = ", ".join(list(resolutions) + ["full"])
+            raise ValidationError(
+                {"resolution": "resolution must be one of: {}.".format(choices)}
+            )
+        return (resolution, resolutions[resolution][2])
+
+    if zoom:
+        try:
+            zoom = int(zoom)
+        except ValueError:
+            raise ValidationError({"zoom": "zoom must be an integer."})
+        resolution = get_zoom_resolution(zoom)
+        if resolution is None:
+            return ("full", POLYGON_FULL_PRECISION)
+        return (resolution[0], resolution[2])
+
+    return None
+
 
 class ProjectPolygonViewSet(viewsets.ReadOnlyModelViewSet):
+    """The convex hull of the sample points of a project.  The maps can
+    ask for a simplified version of the polygon with ?resolution=low or
+    ?resolution=medium (or ?zoom=n to get the one suited to that zoom
+    level), with the coordinates rounded accordingly."""
 
     serializer_class = ProjectPolygonSerializer
 
@@ -109,6 +172,62 @@ class ProjectPolygonViewSet(viewsets.ReadOnlyModelViewSet):
         slug = self.kwargs.get("slug").lower()
         return ProjectPolygon.objects.filter(project__slug=slug)
 
+    def list(self, request, *args, **kwargs):
+        resolution = get_polygon_resolution(request.query_params)
+        if resolution is None:
+            return super(ProjectPolygonViewSet, self).list(request, *args, **kwargs)
+
+        resolution, precision = resolution
+        column = "geom" if resolution == "full" else "geom_" + resolution
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(serialize_project_polygons(queryset, column, precision))
+
+
+@api_view(["GET"])
+@permission_classes((AllowAny,))
+def project_lookup(request):
+    """A light-weight endpoint for typeahead widgets.  Returns the
+    project code, name and slug of (at most) `limit` active projects
+    with a project code or name that contains `q`.  Projects with a
+    project code that starts with `q` are returned first, followed by
+    projects with a name that starts with `q` and then everything else
+    - newest projects first within each group.
+
+    The lookups use the trigram indexes on UPPER(prj_cd) and
+    UPPER(prj_nm), so `q` must be at least LOOKUP_MIN_LENGTH characters
+    long - shorter strings return an empty list.  The response can be
+    cached by the browser (and any proxies) for LOOKUP_MAX_AGE seconds.
+
+    """
+
+    q = request.GET.get("q", "").strip()
+    try:
+        limit = int(request.GET.get("limit", LOOKUP_LIMIT))
+    except ValueError:
+        raise ValidationError("limit must be an integer.")
+    limit = max(1, min(limit, LOOKUP_MAX_LIMIT))
+
+    if len(q) < LOOKUP_MIN_LENGTH:
+        matches = []
+    else:
+        matches = (
+            Project.objects.filter(Q(prj_cd__icontains=q) | Q(prj_nm__icontains=q))
+            .annotate(
+                match=Case(
+                    When(prj_cd__istartswith=q, then=Value(0)),
+                    When(prj_nm__istartswith=q, then=Value(1)),
+                    default=Value(2),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by("match", "-year", "prj_cd")
+            .values("prj_cd", "prj_nm", "slug")[:limit]
+        )
+
+    response = Response(list(matches))
+    patch_cache_control(response, public=True, max_age=LOOKUP_MAX_AGE)
+    return response
+
 
 @api_view(["POST"])
 @permission_classes((AllowAny,))
@@ -134,42 +253,32 @@ def points_roi(request, how="contained"):
         if request_roi is None:
             raise Http404
 
-    # convert the roi string to a geos object
+    # validate, simplify and normalize the roi - raise an error if it
+    # isn't a polygon
     try:
-        roi = GEOSGeometry(request_roi)
-    except ValueError:
-        errmsg = "roi could not be converted to a valid GEOS geometry."
-        raise ValidationError(errmsg)
-
-    # try to create a polygon from our region of interest.
-    # and  Raise a TypeError if roi is not a valid Linear Ring or Polygon
-    if roi.geom_type not in ("Polygon", "MultiPolygon"):
-        try:
-            roi = Polygon(roi)
-        except TypeError:
-            errmsg = "roi is not a valid polygon."
-            raise ValidationError(errmsg)
+        roi = normalize_roi(request_roi)
+    except InvalidROI as err:
+        raise ValidationError(str(err))
 
     if how == "points_in":
-        # return all of the sample points in the roi
+        # we just want the points in the ROI, regardless of project (or
+        # whether the project has a multipoint).
         sample_points = SamplePoint.objects.filter(geom__within=roi).order_by(
             "-project__year", "label"
         )
-
     elif how == "contained":
-        # return only points from projects that are completely contained within the roi
+        # return only points from projects that are completely contained
+        # within the roi.  The contained and overlapping projects are
+        # cached for each roi so they are only found once for the calls
+        # made by the results page.
+        project_ids = get_roi_project_ids(roi)
         sample_points = SamplePoint.objects.filter(
-            project__multipoints__geom__within=roi
+            project_id__in=project_ids["contained"]
         ).order_by("-project__year", "label")
     else:
-        project_ids = (
-            Project.objects.filter(multipoints__geom__intersects=roi)
-            .exclude(multipoints__geom__within=roi)
-            .values_list("id")
-            .distinct()
-        )
+        project_ids = get_roi_project_ids(roi)
         sample_points = SamplePoint.objects.filter(
-            project__pk__in=project_ids
+            project_id__in=project_ids["overlapping"]
         ).order_by("-project__year", "label")
         # If we want to clip our points to just those in the region, do it here:
         # sample_points = sample_points.filter(geom__within=roi)
@@ -185,9 +294,7 @@ def points_roi(request, how="contained"):
     if last_year:
         sample_points = sample_points.filter(project__year__lte=last_year)
 
-    serializer = ProjectPointSerializer(
-        sample_points, many=True, context={"request": request}
-    )
+    points = serialize_project_points(sample_points)
 
     # if how == "points_in":
     #     # we just want the points in the ROI, regardless of project.
@@ -226,4 +333,4 @@ def points_roi(request, how="contained"):
     #         points[how], many=True, context={"request": request}
     #     )
 
-    return Response(serializer.data)
+    return Response(points)
@@ -2,7 +2,7 @@ from django import forms
 from django.db import models
 import django_filters
 
-from pjtk2.models import Project, ProjectType, SamplePoint
+from pjtk2.models import Project, ProjectPolygon, ProjectType, SamplePoint
 from common.models import Lake
 
 # from crispy_forms.helper import FormHelper
@@ -113,11 +113,12 @@ class ProjectFilter(django_filters.FilterSet):
 class SamplePointFilter(django_filters.FilterSet):
     """A filter for sample points lists"""
 
-    year = django_filters.NumberFilter()
+    year = django_filters.NumberFilter("project__year")
     first_year = django_filters.NumberFilter("project__year", lookup_expr="gte")
     last_year = django_filters.NumberFilter("project__year", lookup_expr="lte")
 
     lake = ValueInFilter(field_name="project__lake__abbrev", lookup_expr="in")
+    prj_cd = ValueInFilter(field_name="project__prj_cd", lookup_expr="in")
 
     project_type = django_filters.ModelMultipleChoiceFilter(
         "project__project_type",
@@ -129,3 +130,26 @@ class SamplePointFilter(django_filters.FilterSet):
     class Meta:
         model = SamplePoint
         fields = ["project__year", "project__project_type", "project__lake__abbrev"]
+
+
+class ProjectPolygonFilter(django_filters.FilterSet):
+    """A filter for project polygons - the same filters as sample
+    points so that both layers of a map can be filtered the same way."""
+
+    year = django_filters.NumberFilter("project__year")
+    first_year = django_filters.NumberFilter("project__year", lookup_expr="gte")
+    last_year = django_filters.NumberFilter("project__year", lookup_expr="lte")
+
+    lake = ValueInFilter(field_name="project__lake__abbrev", lookup_expr="in")
+    prj_cd = ValueInFilter(field_name="project__prj_cd", lookup_expr="in")
+
+    project_type = django_filters.ModelMultipleChoiceFilter(
+        "project__project_type",
+        to_field_name="id",
+        lookup_expr="in",
+        queryset=ProjectType.objects.all(),
+    )
+
+    class Meta:
+        model = ProjectPolygon
+        fields = ["project__year", "project__project_type", "project__lake__abbrev"]
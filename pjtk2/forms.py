@@ -2,10 +2,8 @@
 # E1120 - No value passed for parameter 'cls' in function call
 # pylint: disable=E1101, E1120
 
-import csv
 import datetime
 import hashlib
-import io
 import re
 from itertools import chain
 
@@ -15,10 +13,10 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import ButtonHolder, Div, Field, Fieldset, Layout, Submit
 
 # from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.gis import forms
 from django.contrib.gis.forms.fields import PolygonField
-from django.contrib.gis.geos import Point
 from django.core.validators import FileExtensionValidator
 from django.db.models.aggregates import Max, Min
 from django.forms import (
@@ -38,13 +36,11 @@ from django.forms.widgets import (
 
 # from django.utils.encoding import force_unicode
 from django.urls import reverse
-from django.utils import timezone
 from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
 
 # from olwidget.fields import MapField, EditableLayerField
 from leaflet.forms.widgets import LeafletWidget
-from openpyxl import load_workbook
 from taggit.forms import *
 
 from .models import (
@@ -61,7 +57,14 @@ from .models import (
     ProjectProtocol,
     ProjectType,
     Report,
-    SamplePoint,
+)
+from .utils.helpers import approve_projects
+from .utils.point_upload import upload_sample_points
+from .utils.points_file import (
+    PointsFileError,
+    outside_extent,
+    parse_points,
+    read_rows,
 )
 
 User = get_user_model()
@@ -436,23 +439,31 @@ class ApproveProjectsForm2(forms.Form):
         return self.initial.get("prj_ldr_label", "")
 
     def save(self, commit=True):
+        """Approve or un-approve the project if the approved checkbox has
+        changed.  The same as submitting a formset containing only this
+        form (see get_approval_changes() and approve_projects())."""
 
-        # approved_now = self.cleaned_data["approved"]
-        # approved_before = self.initial["approved"]
+        approved, unapproved = get_approval_changes([self])
+        approve_projects(approved, unapproved)
+        return None
 
-        # if approved_now is not approved_before:
-        if self.has_changed():
-            id = self.cleaned_data["id"]
-            pms = ProjectMilestones.objects.get(id=id)
-            if self.cleaned_data["approved"]:
-                now = timezone.now()
-            else:
-                now = None
-            pms.completed = now
-            # need to call save to send signals:
-            pms.save()
 
-        return None
+def get_approval_changes(*formsets):
+    """Given one or more validated formsets of ApproveProjectsForm2
+    forms, return two lists - the ids of the project milestones that
+    have been approved and the ids of those that have been
+    un-approved.  Forms where the approved checkbox was not changed are
+    ignored."""
+
+    approved = []
+    unapproved = []
+    for form in chain(*formsets):
+        if "approved" in form.changed_data:
+            if form.cleaned_data["approved"]:
+                approved.append(form.cleaned_data["id"])
+            else:
+                unapproved.append(form.cleaned_data["id"])
+    return approved, unapproved
 
 
 class ReportsForm(forms.Form):
@@ -1268,112 +1279,51 @@ class SpatialPointUploadForm(forms.Form):
         self.fields["points_file"].widget.attrs["class"] = "fileinput"
         self.fields["points_file"].widget.attrs["accept"] = ".csv,.txt,.xlsx"
 
-    def handle_csv_data(self, csv_file):
-        # encoding catches the byte-order-mark that can cause issues:
-        csv_file = io.TextIOWrapper(csv_file, encoding="utf-8-sig")
-        reader = csv.reader(csv_file, delimiter=",", quotechar='"')
-        pts = [x for x in list(reader) if x != []]
-        for i, row in enumerate(pts):
-            pts[i] = [x.replace('"', "") for x in row]
-
-        return pts
-
-    def handle_xlsx_data(self, xlsx_file):
-        wb = load_workbook(filename=xlsx_file)
-        pts = []
-
-        for row in wb.worksheets[0]:
-            pts.append([cell.value for cell in row])
-        return pts
-
     def clean_points_file(self):
         """verify that our file can be parsed, contains the data we think it
         contains, and that the points are actually in the bounding box of the
-        lake assoicated with this project.
+        lake assoicated with this project.  The points are checked against
+        the lake polygon itself when they are saved.
+
+        The file is streamed and parsed in chunks (see
+        pjtk2.utils.points_file) so large files can be uploaded, and each
+        problem is reported with the rows of the file it occurs in.
         """
-        validation_errors = []
-        geoPoints = None
 
         points_file = self.cleaned_data.get("points_file", False)
-        if points_file:
-            if points_file.size > 0.5 * 1024 * 1024:
-                raise ValidationError("Points_File file way too large ( > 0.5mb )")
-
-            if points_file.name.endswith("xlsx"):
-                pts = self.handle_xlsx_data(points_file.file)
-            else:
-                pts = self.handle_csv_data(points_file.file)
-
-            MAX_UPLOAD_POINTS = 1000
-            if len(pts) > MAX_UPLOAD_POINTS:
-                error_msg = (
-                    "The points file contains more than {} points! ".format(
-                        MAX_UPLOAD_POINTS
-                    )
-                    + "Reduce the number of points and try again."
-                )
-                raise ValidationError(error_msg)
-
-            expected_header = ["POINT_LABEL", "DD_LAT", "DD_LON"]
-            recieved_header = [x for x in pts.pop(0) if x is not None]
-
-            if not recieved_header == expected_header:
-                validation_errors.append(
-                    "Malformed header in submitted file."
-                    "The header must contain the fields: 'POINT_LABEL', 'DD_LAT' and 'DD_LON'."
-                    "The uploaded header is {}".format(
-                        ", ".join([f"'{x}'" for x in recieved_header])
-                    )
-                )
-
-            if not len(pts):
-                raise ValidationError(
-                    "Points_File does not appear to contain any data!"
-                )
-
-            empty_labels = [x for x in pts if x[0] == "" or x[0] is None]
-            if len(empty_labels):
-                validation_errors.append("At least one point is missing a label")
+        if not points_file:
+            raise ValidationError("Couldn't read uploaded points_file")
 
-            try:
-                geoPoints = [[x[0], Point(float(x[2]), float(x[1]))] for x in pts]
-            except (ValueError, TypeError, IndexError):
-                validation_errors.append(
-                    "At least one point has an invalid latitude or longitude."
+        max_points = getattr(settings, "MAX_UPLOAD_POINTS", 500000)
+        try:
+            rows = read_rows(points_file.file, points_file.name)
+            points = parse_points(rows, max_points=max_points)
+        except PointsFileError as err:
+            raise ValidationError(str(err))
+
+        if self.lake_geom:
+            # points inside the extent are checked against the lake
+            # polygon itself when they are saved (see point_upload)
+            outside = outside_extent(points, self.lake_geom.extent)
+            if outside.any():
+                points.add_error(
+                    "{} of the supplied points are not within the bounds of the "
+                    "lake associated with this project.".format(outside.sum()),
+                    points.row_numbers[outside],
                 )
 
-            if geoPoints and self.lake_geom:
-                envelope = self.lake_geom.envelope
-                out_of_bounds = [x for x in geoPoints if not envelope.contains(x[1])]
-                if len(out_of_bounds):
-                    msg = """{} of the supplied points are not within the bounds of the lake
-                    associated with this project.""".format(
-                        len(out_of_bounds)
-                    )
-                    validation_errors.append(msg)
-
-            if len(validation_errors):
-                raise ValidationError(" ".join(validation_errors))
-            else:
-                return geoPoints
-        else:
-            raise ValidationError("Couldn't read uploaded points_file")
+        if points.errors:
+            raise ValidationError(" ".join(points.error_messages()))
+        return points
 
     def save(self):
         """when we save the form - we need to create a bunch of project sample
         points, and either append them to our project or replace the
-        existing ones.
+        existing ones.  The points are copied into the database and the
+        project multipoints and polygon are updated in a single
+        transaction (see pjtk2.utils.point_upload).
 
         """
-        sample_points = []
-        project = self.project
-        for pt in self.cleaned_data["points_file"]:
-            sample_points.append(SamplePoint(project=project, label=pt[0], geom=pt[1]))
-
-        if self.cleaned_data["replace"] == "replace":
-            SamplePoint.objects.filter(project=project).delete()
-
-        SamplePoint.objects.bulk_create(sample_points)
-
-        project.update_multipoints()
-        project.update_convex_hull()
+        points = self.cleaned_data["points_file"]
+        replace = self.cleaned_data["replace"] == "replace"
+        return upload_sample_points(self.project, points, replace=replace)
@@ -0,0 +1,197 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/management/commands/benchmark_spatial_queries.py
+Created: 18 Oct 2026 16:31:47
+
+
+DESCRIPTION:
+
+Run the spatial queries used by the roi search and the roi api
+endpoints with EXPLAIN ANALYZE and report how long each one took and
+how the tables were scanned.  Sequential scans of the spatial tables
+are flagged - they mean that a spatial index is missing or isn't
+being used.  With --fail-on-seq-scan the command exits with an error
+if there are any, so it can be used to catch index regressions.
+
+The region of interest defaults to the middle of the extent of all of
+the sample points (so it selects something in any database), or can be
+given as wkt with --roi.
+
+--cluster physically reorders the sample point table by its GiST
+index (and analyzes it) before the queries are run - points that are
+close together end up on the same pages, so spatial queries read far
+fewer pages.  CLUSTER takes an exclusive lock on the table, so only
+use it during maintenance.
+
+  python manage.py benchmark_spatial_queries
+  python manage.py benchmark_spatial_queries --roi "POLYGON((...))" --repeat 5
+  python manage.py benchmark_spatial_queries --cluster
+
+Note: postgres will (correctly) use sequential scans on small tables,
+so seq scans are only meaningful on a database with real data.
+
+A. Cottrill
+=============================================================
+"""
+
+import json
+
+from django.contrib.gis.db.models import Extent
+from django.contrib.gis.geos import Polygon
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pjtk2.models import ProjectMultiPoints, ProjectPolygon, SamplePoint
+from pjtk2.utils.roi import InvalidROI, normalize_roi
+from pjtk2.utils.spatial_utils import roi_candidates
+
+SPATIAL_TABLES = [
+    x._meta.db_table for x in (SamplePoint, ProjectMultiPoints, ProjectPolygon)
+]
+
+
+def get_benchmark_queries(roi):
+    """The (name, queryset) of each of the representative roi queries."""
+    return [
+        ("points in roi", SamplePoint.objects.filter(geom__within=roi)),
+        (
+            "classify roi projects",
+            roi_candidates(roi).values_list("id", "roi_within"),
+        ),
+        (
+            "points of contained projects",
+            SamplePoint.objects.filter(project__multipoints__geom__within=roi),
+        ),
+        (
+            "polygons overlapping roi",
+            ProjectPolygon.objects.filter(geom__intersects=roi),
+        ),
+        (
+            "points in roi bounding box",
+            SamplePoint.objects.filter(geom__bboverlaps=roi.envelope),
+        ),
+    ]
+
+
+def explain_analyze(queryset):
+    """Run the queryset with EXPLAIN ANALYZE and return the plan (as a
+    dictionary)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def plan_nodes(node):
+    """Yield every node in the plan tree."""
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def describe_node(node):
+    """A short description of a scan node, e.g. 'Index Scan on
+    pjtk2_samplepoint using pjtk2_samplepoint_geom_id'."""
+    description = node["Node Type"]
+    if "Relation Name" in node:
+        description += " on {}".format(node["Relation Name"])
+    if "Index Name" in node:
+        description += " using {}".format(node["Index Name"])
+    return description
+
+
+def get_default_roi():
+    """The middle quarter of the extent of all of the sample points."""
+    extent = SamplePoint.objects.aggregate(extent=Extent("geom"))["extent"]
+    if extent is None:
+        raise CommandError("There aren't any sample points to query.")
+    xmin, ymin, xmax, ymax = extent
+    dx = (xmax - xmin) / 4
+    dy = (ymax - ymin) / 4
+    roi = Polygon.from_bbox((xmin + dx, ymin + dy, xmax - dx, ymax - dy))
+    roi.srid = 4326
+    return roi
+
+
+class Command(BaseCommand):
+    help = "Report the plans and timings of the spatial roi queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--roi", help="The region of interest as wkt (or geojson)."
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="The number of times each query is run - the fastest is reported.",
+        )
+        parser.add_argument(
+            "--cluster",
+            action="store_true",
+            help="Cluster the sample points on their GiST index first.",
+        )
+        parser.add_argument(
+            "--fail-on-seq-scan",
+            action="store_true",
+            help="Exit with an error if any spatial table is scanned sequentially.",
+        )
+
+    def handle(self, *args, **options):
+
+        if options["cluster"]:
+            table = SamplePoint._meta.db_table
+            self.stdout.write("Clustering {}...".format(table))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "CLUSTER {0} USING {0}_geom_id; ANALYZE {0};".format(table)
+                )
+
+        if options["roi"]:
+            try:
+                roi = normalize_roi(options["roi"])
+            except InvalidROI as err:
+                raise CommandError(str(err))
+        else:
+            roi = get_default_roi()
+        self.stdout.write("ROI: {}".format(roi.wkt))
+
+        seq_scans = []
+        for name, queryset in get_benchmark_queries(roi):
+            repeat = max(options["repeat"], 1)
+            plans = [explain_analyze(queryset) for x in range(repeat)]
+            plan = min(plans, key=lambda x: x["Execution Time"])
+            root = plan["Plan"]
+
+            self.stdout.write(
+                "\n{}: {:.2f} ms (planning {:.2f} ms), {} rows".format(
+                    name,
+                    plan["Execution Time"],
+                    plan["Planning Time"],
+                    root.get("Actual Rows", 0),
+                )
+            )
+            for node in plan_nodes(root):
+                if "Scan" not in node["Node Type"]:
+                    continue
+                self.stdout.write("    " + describe_node(node))
+                if (
+                    node["Node Type"] == "Seq Scan"
+                    and node.get("Relation Name") in SPATIAL_TABLES
+                ):
+                    seq_scans.append((name, node["Relation Name"]))
+                    self.stdout.write(
+                        self.style.WARNING(
+                            "    sequential scan on {}".format(node["Relation Name"])
+                        )
+                    )
+
+        if seq_scans and options["fail_on_seq_scan"]:
+            tables = sorted(set(x[1] for x in seq_scans))
+            raise CommandError(
+                "Sequential scans on spatial tables: {}".format(", ".join(tables))
+            )
+        self.stdout.write(self.style.SUCCESS("\nDone."))
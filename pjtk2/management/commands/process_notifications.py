@@ -0,0 +1,66 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/management/commands/process_notifications.py
+Created: 18 Oct 2026 10:34:52
+
+
+DESCRIPTION:
+
+Send the messages for the milestone notifications waiting in the
+notification outbox.  By default, all of the pending events are
+processed and the command exits (suitable for a scheduled task).  With
+--loop, the command keeps running and checks for new events every
+--sleep seconds.
+
+  python manage.py process_notifications
+  python manage.py process_notifications --loop --sleep 30
+
+A. Cottrill
+=============================================================
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from pjtk2.models import process_notification_events
+
+
+class Command(BaseCommand):
+    help = "Send the messages for pending milestone notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The maximum number of events to process in each transaction.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and check for new events periodically.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=10,
+            help="Seconds to wait between checks when --loop is used.",
+        )
+
+    def handle(self, *args, **options):
+
+        batch_size = options["batch_size"]
+        total = 0
+        while True:
+            count = process_notification_events(batch_size=batch_size)
+            total += count
+            if count:
+                self.stdout.write("Processed {} notification events.".format(count))
+            if count < batch_size:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+
+        msg = "Done. {} events processed.".format(total)
+        self.stdout.write(self.style.SUCCESS(msg))
@@ -0,0 +1,107 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/management/commands/rebuild_project_geometries.py
+Created: 18 Oct 2026 18:21:36
+
+
+DESCRIPTION:
+
+Rebuild the multipoints (ProjectMultiPoints) and convex hulls
+(ProjectPolygon) of projects from their sample points.  The derived
+tables can drift from the sample points after they are loaded or
+updated directly in the database (e.g. by the data migration
+scripts), and Project.update_multipoints() and
+Project.update_convex_hull() only rebuild one project at a time.
+
+The geometries are rebuilt with the set based statements used by the
+points upload (pjtk2.utils.point_upload) - two statements for each
+chunk of --chunk-size projects, each chunk in its own transaction.
+Projects without any sample points lose their multipoint and polygon.
+
+  python manage.py rebuild_project_geometries
+  python manage.py rebuild_project_geometries --lake HU --year 2019
+  python manage.py rebuild_project_geometries --project LHA_IA19_002 LHA_IA19_003
+
+A. Cottrill
+=============================================================
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from pjtk2.models import Project, bump_cache_version
+from pjtk2.utils.point_upload import update_project_geometries
+from pjtk2.utils.roi import clear_roi_cache
+from pjtk2.utils.vector_tiles import clear_vector_tiles
+
+
+def get_project_ids(prj_cds=None, lakes=None, years=None):
+    """The ids of the (optionally filtered) projects, in order."""
+    projects = Project.all_objects.all()
+    if prj_cds:
+        projects = projects.filter(prj_cd__in=prj_cds)
+    if lakes:
+        projects = projects.filter(lake__abbrev__in=lakes)
+    if years:
+        projects = projects.filter(year__in=years)
+    return list(projects.order_by("id").values_list("id", flat=True))
+
+
+class Command(BaseCommand):
+    help = "Rebuild the multipoints and convex hulls of projects."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            nargs="+",
+            dest="prj_cds",
+            help="Only rebuild the projects with these project codes.",
+        )
+        parser.add_argument(
+            "--lake",
+            nargs="+",
+            dest="lakes",
+            help="Only rebuild the projects in these lakes (abbreviations).",
+        )
+        parser.add_argument(
+            "--year",
+            nargs="+",
+            dest="years",
+            help="Only rebuild the projects from these years.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="The number of projects rebuilt in each transaction.",
+        )
+
+    def handle(self, *args, **options):
+
+        project_ids = get_project_ids(
+            options["prj_cds"], options["lakes"], options["years"]
+        )
+        total = len(project_ids)
+        chunk_size = max(options["chunk_size"], 1)
+        start = time.time()
+
+        for i in range(0, total, chunk_size):
+            chunk = project_ids[i : i + chunk_size]
+            with transaction.atomic(), connection.cursor() as cursor:
+                update_project_geometries(cursor, chunk)
+                bump_cache_version(chunk)
+            self.stdout.write(
+                "Rebuilt {} of {} projects ({:.1f} s)".format(
+                    i + len(chunk), total, time.time() - start
+                )
+            )
+
+        if total:
+            # the signals that usually clear these aren't sent by raw sql
+            clear_vector_tiles()
+            clear_roi_cache()
+
+        msg = "Done. {} projects rebuilt.".format(total)
+        self.stdout.write(self.style.SUCCESS(msg))
@@ -0,0 +1,32 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/middleware.py
+Created: 18 Oct 2026 13:18:09
+
+
+DESCRIPTION:
+
+Middleware used by project tracker.
+
+  + PermissionMiddleware - attaches a PermissionContext for the
+    current user to each request as request.permissions.  Must come
+    after django's AuthenticationMiddleware.
+
+A. Cottrill
+=============================================================
+"""
+
+from django.utils.functional import SimpleLazyObject
+
+from .utils.permissions import PermissionContext
+
+
+class PermissionMiddleware(object):
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, "user", None)
+        # nothing is evaluated until a view or template asks.
+        request.permissions = SimpleLazyObject(lambda: PermissionContext(user))
+        return self.get_response(request)
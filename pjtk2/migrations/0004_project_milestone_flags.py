@@ -0,0 +1,45 @@
+# Generated by Django 2.2.18 on 2026-10-18 09:12
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+def populate_milestone_flags(apps, schema_editor):
+    """Build the milestone_flags of every existing project.  Must match
+    pjtk2.models.get_milestone_flags()."""
+
+    Project = apps.get_model("pjtk2", "Project")
+    ProjectMilestones = apps.get_model("pjtk2", "ProjectMilestones")
+
+    flags = {}
+    project_milestones = ProjectMilestones.objects.values_list(
+        "project_id", "milestone__label", "milestone__category", "required", "completed"
+    )
+    for project_id, label, category, required, completed in project_milestones.iterator():
+        value = 0
+        if required:
+            value |= 1
+        if completed is not None:
+            value |= 2
+        if category == "custom":
+            value |= 4
+        flags.setdefault(project_id, {})[label] = value
+
+    for project_id, project_flags in flags.items():
+        Project.objects.filter(pk=project_id).update(milestone_flags=project_flags)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pjtk2', '0003_auto_20200602_1655'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='milestone_flags',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(populate_milestone_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.18 on 2026-10-18 10:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pjtk2', '0004_project_milestone_flags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('msgtxt', models.CharField(max_length=100)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('processed', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('milestone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pjtk2.Milestone')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pjtk2.Project')),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pjtk2', '0005_notificationevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.18 on 2026-10-18 12:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Replace the tsvector_update_trigger (which weights the abstract,
+    comment and project name equally) with a trigger that builds a
+    weighted tsvector - project name and code A, abstract B and
+    comment C.  Project codes are indexed with the simple configuration
+    so that they are not stemmed."""
+
+    dependencies = [
+        ('pjtk2', '0006_project_cache_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+            CREATE OR REPLACE FUNCTION pjtk2_project_content_search()
+            RETURNS trigger AS $$
+            BEGIN
+              NEW.content_search :=
+                setweight(to_tsvector('pg_catalog.english', coalesce(NEW.prj_nm, '')), 'A') ||
+                setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.prj_cd, '')), 'A') ||
+                setweight(to_tsvector('pg_catalog.english', coalesce(NEW.abstract, '')), 'B') ||
+                setweight(to_tsvector('pg_catalog.english', coalesce(NEW.comment, '')), 'C');
+              RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS project_update_trigger
+            ON pjtk2_project;
+
+            CREATE TRIGGER project_update_trigger
+            BEFORE INSERT OR UPDATE OF abstract, comment, prj_nm, prj_cd, content_search
+            ON pjtk2_project
+            FOR EACH ROW EXECUTE PROCEDURE
+            pjtk2_project_content_search();
+
+            UPDATE pjtk2_project SET content_search = NULL;
+            """,
+            reverse_sql="""
+            DROP TRIGGER IF EXISTS project_update_trigger
+            ON pjtk2_project;
+
+            DROP FUNCTION IF EXISTS pjtk2_project_content_search();
+
+            CREATE TRIGGER project_update_trigger
+            BEFORE INSERT OR UPDATE OF abstract, comment, prj_nm, content_search
+            ON pjtk2_project
+            FOR EACH ROW EXECUTE PROCEDURE
+            tsvector_update_trigger(
+              content_search, 'pg_catalog.english', abstract, comment, prj_nm);
+
+            UPDATE pjtk2_project SET content_search = NULL;
+            """,
+        )
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.18 on 2026-10-18 13:05
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Trigram indexes on the project code and name.  The indexes are on
+    UPPER(column::text) - the same expression django uses for
+    icontains/istartswith lookups - so they are used by the project
+    lookup endpoint and by the prj_cd filter on the project lists.
+    Django 2.2 can't declare expression indexes in Meta.indexes, so
+    they are created here."""
+
+    dependencies = [
+        ('pjtk2', '0007_weighted_content_search'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            sql="""
+            CREATE INDEX pjtk2_project_prj_cd_trgm
+            ON pjtk2_project USING gin (UPPER(prj_cd::text) gin_trgm_ops);
+
+            CREATE INDEX pjtk2_project_prj_nm_trgm
+            ON pjtk2_project USING gin (UPPER(prj_nm::text) gin_trgm_ops);
+            """,
+            reverse_sql="""
+            DROP INDEX IF EXISTS pjtk2_project_prj_cd_trgm;
+            DROP INDEX IF EXISTS pjtk2_project_prj_nm_trgm;
+            """,
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.18 on 2026-10-18 16:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Spatial index audit.  The composite B-tree on (project, geom) can't
+    be used by any spatial lookup (and project already has its own
+    foreign key index), so it is dropped.  The GiST indexes that
+    GeoDjango creates for each geometry field are the ones used by the
+    roi queries and the vector tiles - they are created here if they
+    are missing (e.g. tables restored or loaded outside of the
+    migrations) and the tables are analyzed so the planner uses them."""
+
+    dependencies = [
+        ('pjtk2', '0008_project_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='samplepoint',
+            name='pjtk2_sampl_project_9b5b67_idx',
+        ),
+        migrations.RunSQL(
+            sql="""
+            CREATE INDEX IF NOT EXISTS pjtk2_samplepoint_geom_id
+            ON pjtk2_samplepoint USING gist (geom);
+
+            CREATE INDEX IF NOT EXISTS pjtk2_projectmultipoints_geom_id
+            ON pjtk2_projectmultipoints USING gist (geom);
+
+            CREATE INDEX IF NOT EXISTS pjtk2_projectpolygon_geom_id
+            ON pjtk2_projectpolygon USING gist (geom);
+
+            ANALYZE pjtk2_samplepoint;
+            ANALYZE pjtk2_projectmultipoints;
+            ANALYZE pjtk2_projectpolygon;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
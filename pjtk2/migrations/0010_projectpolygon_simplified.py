@@ -0,0 +1,35 @@
+# Generated by Django 2.2.18 on 2026-10-18 18:52
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Simplified versions of each project polygon for the maps.  The
+    polygons that already exist are simplified here with the same
+    tolerances as POLYGON_RESOLUTIONS."""
+
+    dependencies = [
+        ('pjtk2', '0009_spatial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectpolygon',
+            name='geom_low',
+            field=django.contrib.gis.db.models.fields.PolygonField(blank=True, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='projectpolygon',
+            name='geom_medium',
+            field=django.contrib.gis.db.models.fields.PolygonField(blank=True, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE pjtk2_projectpolygon
+               SET geom_low = ST_SimplifyPreserveTopology(geom, 0.01),
+                   geom_medium = ST_SimplifyPreserveTopology(geom, 0.001);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -9,12 +9,22 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 
 from django.contrib.gis.db.models import Collect, Union
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Cast
 from django.contrib.gis.geos import MultiPoint
+from django.contrib.postgres.fields import JSONField
 from django.contrib.postgres.search import SearchVectorField, SearchVector
 from django.contrib.postgres.indexes import GinIndex
 
 from django.urls import reverse
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 from django.template.defaultfilters import slugify
 from django.contrib.gis.db import models
@@ -25,10 +35,15 @@ from markdown2 import markdown
 from common.models import Lake
 
 import datetime
+import json
 import os
 import pytz
 
 from .utils.helpers import get_supervisors, replace_links, strip_carriage_returns
+from .utils.facets import clear_project_facets
+from .utils.hierarchy import clear_hierarchy_cache, get_supervisor_ids
+from .utils.roi import clear_roi_cache
+from .utils.vector_tiles import clear_vector_tiles
 
 User = get_user_model()
 
@@ -176,6 +191,28 @@ class Messages2UsersManager(models.Manager):
         )
 
 
+class ProjectMilestonesQuerySet(models.QuerySet):
+    """Bulk updates and inserts bypass the ProjectMilestones signals -
+    make sure that milestone_flags of the affected projects are kept
+    current."""
+
+    def update(self, **kwargs):
+        project_ids = set(self.values_list("project_id", flat=True))
+        rows = super(ProjectMilestonesQuerySet, self).update(**kwargs)
+        if project_ids:
+            update_milestone_flags(project_ids)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super(ProjectMilestonesQuerySet, self).bulk_create(
+            objs, *args, **kwargs
+        )
+        project_ids = set([x.project_id for x in objs])
+        if project_ids:
+            update_milestone_flags(project_ids)
+        return objs
+
+
 class Milestone(models.Model):
     """
     Look-up table of reporting milestone and their attributes.  Not all
@@ -346,6 +383,11 @@ class Project(models.Model):
     Class to hold a record for each project
     """
 
+    # bit flags used in milestone_flags
+    MILESTONE_REQUIRED = 1
+    MILESTONE_COMPLETED = 2
+    MILESTONE_CUSTOM = 4
+
     PROJECT_STATUS_CHOICES = [
         ("submitted", "Submitted"),
         ("ongoing", "Ongoing"),
@@ -407,6 +449,15 @@ class Project(models.Model):
 
     content_search = SearchVectorField(null=True)
 
+    # a compact copy of the state of each project milestone keyed by
+    # milestone label - maintained by signals on ProjectMilestones so
+    # that the status helpers don't need to query the database.
+    milestone_flags = JSONField(default=dict, blank=True, editable=False)
+
+    # incremented whenever the project or anything displayed on its
+    # detail page changes - used to version the cached page fragments.
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
+
     master_database = models.ForeignKey(
         "Database", on_delete=models.CASCADE, null=True, blank=True
     )
@@ -483,7 +534,34 @@ class Project(models.Model):
                 self.risk, extras={"demote-headers": DEMOTE_HEADERS}
             )
             self.risk_html = replace_links(self.risk_html, link_patterns=LINK_PATTERNS)
+
+        # milestone_flags are maintained by update_milestone_flags() -
+        # don't overwrite them with the values held by this instance.
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                x.name
+                for x in self._meta.concrete_fields
+                if not x.primary_key
+                and x.name != "milestone_flags"
+                and x.attname not in deferred
+            ]
+
+        bump_version = self.pk is not None and not self._state.adding
+        if bump_version:
+            # increment the version in the database - the version
+            # held by this instance may already be out of date.
+            self.cache_version = F("cache_version") + 1
+
         super(Project, self).save(*args, **kwargs)
+        if bump_version:
+            # defer the new version - it is read from the database if
+            # it is needed.
+            del self.cache_version
         if new:
             self.initialize_milestones()
 
@@ -574,19 +652,48 @@ class Project(models.Model):
         self.cancelled_by = None
         self.save()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Project, cls).from_db(db, field_names, values)
+        instance._flags_version = _milestone_flag_updates[instance.pk]
+        return instance
+
+    def get_milestone_flags(self):
+        """Return the milestone_flags of this project.  If the flags have
+        been updated since this instance was retrieved (e.g. a project
+        milestone was saved through another instance), they are read
+        from the database again first."""
+
+        version = _milestone_flag_updates[self.pk]
+        if getattr(self, "_flags_version", None) != version:
+            if self.pk is not None:
+                self.milestone_flags = get_milestone_flags([self.pk])[self.pk]
+            self._flags_version = version
+        return self.milestone_flags or {}
+
+    def get_milestone_flag(self, label, flag, iexact=False):
+        """Return True if the flag (one of MILESTONE_REQUIRED,
+        MILESTONE_COMPLETED or MILESTONE_CUSTOM) is set for the project
+        milestone with the given label, False if it isn't, and None if
+        the milestone has not been assigned to this project.  Reads the
+        denormalized milestone_flags - no queries are required unless
+        they have changed since the project was retrieved."""
+
+        flags = self.get_milestone_flags()
+        if iexact:
+            label = label.lower()
+            value = next((v for k, v in flags.items() if k.lower() == label), None)
+        else:
+            value = flags.get(label)
+        if value is None:
+            return None
+        return bool(value & flag)
+
     def is_approved(self):
         """Is the current project approved?  Returns true if it is, otherwise
         false."""
-        approved = ProjectMilestones.objects.filter(
-            project=self, milestone__label="Approved"
-        ).first()
-        if approved is None:
-            return False
-
-        if approved.completed is not None:
-            return True
-        else:
-            return False
+        approved = self.get_milestone_flag("Approved", self.MILESTONE_COMPLETED)
+        return approved is True
 
     def signoff(self, user):
         """A helper function to make it easier to sign off a project"""
@@ -623,17 +730,10 @@ class Project(models.Model):
         """Is the current project completed (ie. signoff=True)?  Returns true
         if it is, otherwise false.
         """
-        try:
-            completed = ProjectMilestones.objects.get(
-                project=self, milestone__label__iexact="Sign Off"
-            )
-        except ProjectMilestones.DoesNotExist:
-            return False
-
-        if completed.completed is not None:
-            return True
-        else:
-            return False
+        completed = self.get_milestone_flag(
+            "Sign Off", self.MILESTONE_COMPLETED, iexact=True
+        )
+        return completed is True
 
     def _get_status(self):
         """
@@ -756,7 +856,7 @@ class Project(models.Model):
             )
         return assignments
 
-    def get_milestone_status_dict(self):
+    def get_milestone_status_dict(self, core_milestones=None):
         """
         In order to impoved the performance of the myProjects view we
         need a function that will take a project return a dictionary of
@@ -773,6 +873,10 @@ class Project(models.Model):
         the ordered dictionary and reflects the status of all required
         additional reporting requirements.
 
+        The status of each milestone is read from milestone_flags.  List
+        views can pass in the core milestones so that they are only
+        retrieved once.
+
         """
 
         milestone_status = collections.OrderedDict()
@@ -782,47 +886,32 @@ class Project(models.Model):
         # project (and in the same order) - without this, some of our
         # rows will have different lengths.
 
-        all_milestones = (
-            Milestone.objects.filter(category="Core").order_by("order").all()
-        )
-        for ms in all_milestones:
-            key = ms.label_abbrev.lower().replace(" ", "-")
-            milestone_status[key] = {
-                "status": None,
-                "type": "report" if ms.report else "milestone",
-            }
+        if core_milestones is None:
+            core_milestones = (
+                Milestone.objects.filter(category="Core").order_by("order").all()
+            )
 
-        milestones = (
-            self.projectmilestones.filter(milestone__category="Core")
-            .exclude(milestone__label="Submitted")
-            .select_related("milestone")
-            .order_by("milestone__order")
-            .all()
-        )
+        flags = self.get_milestone_flags()
 
-        for ms in milestones:
-            key = ms.milestone.label_abbrev.lower().replace(" ", "-")
-            if ms.required:
-                value = {
-                    "status": ("required-done" if ms.completed else "required-notDone"),
-                    "type": "report" if ms.milestone.report else "milestone",
-                }
+        for ms in core_milestones:
+            key = ms.label_abbrev.lower().replace(" ", "-")
+            ms_type = "report" if ms.report else "milestone"
+            value = flags.get(ms.label)
+            if value is None or ms.label == "Submitted":
+                status = None
             else:
-                value = {
-                    "status": (
-                        "notRequired-done" if ms.completed else "notRequired-notDone"
-                    ),
-                    "type": "report" if ms.milestone.report else "milestone",
-                }
-
-            milestone_status[key] = value
+                required = value & self.MILESTONE_REQUIRED
+                completed = value & self.MILESTONE_COMPLETED
+                if required:
+                    status = "required-done" if completed else "required-notDone"
+                else:
+                    status = "notRequired-done" if completed else "notRequired-notDone"
+            milestone_status[key] = {"status": status, "type": ms_type}
 
         # finally for each project, we need to know if this project has any
         # custom reporting requirements and their status:
-        milestones = self.projectmilestones.select_related("milestone").filter(
-            milestone__category="custom"
-        )
-        if not milestones:
+        custom = [x for x in flags.values() if x & self.MILESTONE_CUSTOM]
+        if not custom:
             milestone_status["custom"] = {
                 "status": "notRequired-notDone",
                 "type": "report",
@@ -830,8 +919,12 @@ class Project(models.Model):
         else:
             # if the status of all custom milestones are complete then
             # required-done else 'required-notDone'
-            done = [x.completed is not None for x in milestones if x.required == True]
-            if all(x == True for x in done):
+            done = [
+                bool(x & self.MILESTONE_COMPLETED)
+                for x in custom
+                if x & self.MILESTONE_REQUIRED
+            ]
+            if all(done):
                 milestone_status["custom"] = {
                     "status": "required-done",
                     "type": "report",
@@ -923,19 +1016,19 @@ class Project(models.Model):
 
         """
 
-        try:
-            pms = ProjectMilestones.objects.get(project=self, milestone=milestone)
-            if pms.completed:
-                # - requested, done = True
-                # - not requested, done anyway = True
-                return True
-            elif pms.required:
-                # -requested, not done = False
-                return False
-            else:
-                # -not requested, not done - None
-                return None
-        except (ProjectMilestones.DoesNotExist, ValueError) as e:
+        label = getattr(milestone, "label", None)
+        if label is None:
+            return None
+        completed = self.get_milestone_flag(label, self.MILESTONE_COMPLETED)
+        if completed:
+            # - requested, done = True
+            # - not requested, done anyway = True
+            return True
+        elif self.get_milestone_flag(label, self.MILESTONE_REQUIRED):
+            # -requested, not done = False
+            return False
+        else:
+            # -not requested, not done - None
             return None
 
     def initialize_milestones(self):
@@ -1242,9 +1335,6 @@ class SamplePoint(models.Model):
 
     objects = models.Manager()
 
-    class Meta:
-        indexes = [models.Index(fields=["project", "geom"])]
-
     @property
     def dd_lat(self):
         return self.geom.y
@@ -1333,6 +1423,25 @@ class ProjectMultiPoints(models.Model):
         return "<{}>".format(self.project.prj_cd)
 
 
+# the simplified versions of each project polygon that are served to
+# the maps at lower zoom levels: (resolution, simplify tolerance in
+# degrees, decimal places of the coordinates, highest zoom level).
+# The full polygon is used above the highest zoom level.
+POLYGON_RESOLUTIONS = [
+    ("low", 0.01, 3, 8),
+    ("medium", 0.001, 4, 12),
+]
+
+
+def get_zoom_resolution(zoom):
+    """Return the entry of POLYGON_RESOLUTIONS used for maps at the zoom
+    level, or None if the full polygon should be used."""
+    for resolution in POLYGON_RESOLUTIONS:
+        if zoom <= resolution[3]:
+            return resolution
+    return None
+
+
 class ProjectPolygon(models.Model):
     """
     A class to hold the convex hull derived from the sampling locations
@@ -1340,12 +1449,22 @@ class ProjectPolygon(models.Model):
     project tracker.  Makes spatial queries much faster - query few
     polygons instead of lots and lots of individual points.
 
+    Simplified versions of the hull (see POLYGON_RESOLUTIONS) are
+    stored with it so the maps don't have to download the full polygon
+    of every project.
+
     """
 
     project = models.OneToOneField(
         Project, on_delete=models.CASCADE, related_name="convex_hull"
     )
     geom = models.PolygonField(srid=4326)
+    geom_low = models.PolygonField(
+        srid=4326, spatial_index=False, blank=True, null=True
+    )
+    geom_medium = models.PolygonField(
+        srid=4326, spatial_index=False, blank=True, null=True
+    )
 
     objects = models.Manager()
 
@@ -1355,6 +1474,21 @@ class ProjectPolygon(models.Model):
         """
         return "<{}>".format(self.project.prj_cd)
 
+    def save(self, *args, **kwargs):
+        """Update the simplified polygons before saving."""
+        self.update_simplified()
+        super(ProjectPolygon, self).save(*args, **kwargs)
+
+    def update_simplified(self):
+        """Simplify the polygon for each of the POLYGON_RESOLUTIONS.  The
+        topology is preserved so each one is still a valid polygon."""
+        for resolution, tolerance, precision, zoom in POLYGON_RESOLUTIONS:
+            simplified = None
+            if self.geom:
+                simplified = self.geom.simplify(tolerance, preserve_topology=True)
+                simplified.srid = self.geom.srid
+            setattr(self, "geom_" + resolution, simplified)
+
 
 class ProjectMilestones(models.Model):
     """
@@ -1372,6 +1506,8 @@ class ProjectMilestones(models.Model):
     required = models.BooleanField(default=True, db_index=True)
     completed = models.DateTimeField(blank=True, null=True, db_index=True)
 
+    objects = ProjectMilestonesQuerySet.as_manager()
+
     class Meta:
         # unique_together = ("project", "report_type",)
         unique_together = ("project", "milestone")
@@ -1618,6 +1754,102 @@ class Messages2Users(models.Model):
         self.save()
 
 
+class NotificationEvent(models.Model):
+    """A local outbox of notifications waiting to be sent.  The
+    ProjectMilestones signals only add a compact event to this table
+    (after the transaction has been committed) - the recipients are
+    compiled and the messages are created later by the
+    process_notifications management command."""
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    milestone = models.ForeignKey(Milestone, on_delete=models.CASCADE)
+    msgtxt = models.CharField(max_length=100)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    processed = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        ordering = ["created"]
+
+    def __str__(self):
+        """return the project code and the messsage."""
+        return "%s - %s" % (self.project.prj_cd, self.msgtxt)
+
+
+# =========================
+#   Milestone flags
+
+
+def get_milestone_flags(project_ids):
+    """Return a dictionary keyed by project id containing the
+    milestone_flags of each project - a dictionary keyed by milestone
+    label with the required, completed and custom bits of each project
+    milestone.  All of the projects are handled in a single query.
+    """
+
+    flags = {x: {} for x in project_ids}
+
+    project_milestones = ProjectMilestones.objects.filter(
+        project_id__in=project_ids
+    ).values_list(
+        "project_id", "milestone__label", "milestone__category", "required", "completed"
+    )
+
+    for project_id, label, category, required, completed in project_milestones:
+        value = 0
+        if required:
+            value |= Project.MILESTONE_REQUIRED
+        if completed is not None:
+            value |= Project.MILESTONE_COMPLETED
+        if category == "custom":
+            value |= Project.MILESTONE_CUSTOM
+        flags[project_id][label] = value
+
+    return flags
+
+
+# the number of times the milestone_flags of each project have been
+# updated by this process - Project instances retrieved before an
+# update re-read their flags (see Project.get_milestone_flags()).
+_milestone_flag_updates = collections.Counter()
+
+
+def update_milestone_flags(project_ids):
+    """Recalculate and save the milestone_flags of each project in
+    project_ids.  Uses queryset.update() so that Project.save() (and
+    the markdown rendering) is not called.  Returns the dictionary of
+    flags keyed by project id."""
+
+    flags = get_milestone_flags(project_ids)
+    _milestone_flag_updates.update(flags.keys())
+    if len(flags) == 1:
+        project_id, project_flags = list(flags.items())[0]
+        Project.all_objects.filter(pk=project_id).update(
+            milestone_flags=project_flags, cache_version=F("cache_version") + 1
+        )
+    elif flags:
+        # update all of the projects in a single query
+        whens = [
+            When(pk=project_id, then=Cast(Value(json.dumps(x)), JSONField()))
+            for project_id, x in flags.items()
+        ]
+        Project.all_objects.filter(pk__in=flags.keys()).update(
+            milestone_flags=Case(*whens, output_field=JSONField()),
+            cache_version=F("cache_version") + 1,
+        )
+    return flags
+
+
+def bump_cache_version(project_ids):
+    """Increment the cache_version of each project in project_ids (a
+    list of ids or a queryset returning a single column of ids) so that
+    the cached fragments of their detail pages are no longer used.  All
+    of the projects are updated in a single query."""
+
+    Project.all_objects.filter(pk__in=project_ids).update(
+        cache_version=F("cache_version") + 1
+    )
+
+
 # =========================
 #   Message functions
 
@@ -1634,8 +1866,7 @@ def build_msg_recipients(project, level=None, dba=True, ops=True):
     The function returns a list of unique user instances.
     """
 
-    prj_owner = project.owner
-    prj_owner = Employee.objects.get(user__id=prj_owner.id)
+    prj_owner = Employee.objects.get(user__id=project.owner_id)
     recipients = get_supervisors(prj_owner)
     # convert the employees to user objects
     recipients = [x.user for x in recipients]
@@ -1644,10 +1875,9 @@ def build_msg_recipients(project, level=None, dba=True, ops=True):
         # trim the list of supervisors here (if appropriate)
         recipients = recipients[: -(level - 1)]
     # Find out who is watching this project and add them to the list too
-    bookmarks = Bookmark.objects.filter(project=project)
-    if bookmarks.exists():
-        for watcher in bookmarks:
-            recipients.append(watcher.user)
+    bookmarks = Bookmark.objects.filter(project=project).select_related("user")
+    for watcher in bookmarks:
+        recipients.append(watcher.user)
     # send notice to dba too
     if dba:
         recipients.append(project.dba)
@@ -1659,30 +1889,247 @@ def build_msg_recipients(project, level=None, dba=True, ops=True):
     return recipients
 
 
+def build_msg_recipient_ids(projects, level=None, dba=True, ops=True):
+    """A bulk version of build_msg_recipients() that compiles the
+    recipients of many projects at once.  Returns a dictionary keyed by
+    project id containing a list of unique user ids for each project.
+    level, dba and ops have the same meaning as in
+    build_msg_recipients() (ops is not yet implemented there either).
+
+    The employee record of every project owner, the users of every
+    supervisor and all of the bookmarks are each retrieved in a single
+    query.  The supervisor chain is resolved once for each owner, not
+    once for each project.
+    """
+
+    projects = list(projects)
+    owner_ids = set([x.owner_id for x in projects])
+
+    owners = dict(
+        Employee.objects.filter(user_id__in=owner_ids).values_list("user_id", "id")
+    )
+    chains = {x: get_supervisor_ids(owners[x]) for x in owner_ids if x in owners}
+    employee_ids = set([x for chain in chains.values() for x in chain])
+    employee_users = dict(
+        Employee.all_objects.filter(id__in=employee_ids).values_list("id", "user_id")
+    )
+
+    watchers = collections.defaultdict(list)
+    bookmarks = Bookmark.objects.filter(
+        project_id__in=[x.id for x in projects]
+    ).values_list("project_id", "user_id")
+    for project_id, user_id in bookmarks:
+        watchers[project_id].append(user_id)
+
+    recipients = {}
+    for project in projects:
+        chain = chains.get(project.owner_id)
+        if chain is None:
+            user_ids = [project.owner_id]
+        else:
+            user_ids = [employee_users[x] for x in chain if x in employee_users]
+        if level and level < len(user_ids):
+            # trim the list of supervisors the same way build_msg_recipients does
+            user_ids = user_ids[: -(level - 1)]
+        user_ids.extend(watchers.get(project.id, []))
+        if dba:
+            user_ids.append(project.dba_id)
+        if ops:
+            # user_ids.append(project.ops_id)
+            pass
+        recipients[project.id] = get_recipient_ids(user_ids)
+    return recipients
+
+
+def get_recipient_ids(recipients):
+    """A little helper function that returns a list of unique user ids
+    from recipients - which can be a single user, a list of users or a
+    list of user ids."""
+
+    if recipients is None:
+        return []
+    if isinstance(recipients, User) or isinstance(recipients, int):
+        recipients = [recipients]
+    user_ids = [x if isinstance(x, int) else x.id for x in recipients if x is not None]
+    return list(collections.OrderedDict.fromkeys(user_ids))
+
+
 def send_message(msgtxt, recipients, project, milestone):
     """Create a record in the message database and send it to each user in
     recipients by appending a record to Messages2Users for each one."""
 
-    # if the Project Milestone doesn't exist for this project and
-    # milestone create it
-    prjms, created = ProjectMilestones.objects.get_or_create(
-        project=project, milestone=milestone
+    send_messages([(project, milestone, msgtxt)], recipients)
+
+
+def send_messages(messages, recipients=None):
+    """Send a number of messages at once.  messages is a list of
+    (project, milestone, msgtxt) tuples.  If recipients is provided (a
+    user, a list of users or a list of user ids), every message is sent
+    to each of them, otherwise the recipients for each project are
+    compiled using build_msg_recipient_ids().
+
+    Rather than saving one record at a time, the missing project
+    milestones, the messages and the Messages2Users records are each
+    inserted with a single bulk_create(), regardless of how many
+    messages or recipients there are.
+    """
+
+    messages = list(messages)
+    if not messages:
+        return []
+
+    # get (or create) the project-milestones for all of the messages
+    project_ids = set([x[0].id for x in messages])
+    milestone_ids = set([x[1].id for x in messages])
+    prjms = {
+        (x.project_id, x.milestone_id): x
+        for x in ProjectMilestones.objects.filter(
+            project_id__in=project_ids, milestone_id__in=milestone_ids
+        )
+    }
+    missing = collections.OrderedDict()
+    for project, milestone, msgtxt in messages:
+        key = (project.id, milestone.id)
+        if key not in prjms and key not in missing:
+            missing[key] = ProjectMilestones(project=project, milestone=milestone)
+    if missing:
+        created = ProjectMilestones.objects.bulk_create(missing.values())
+        prjms.update({(x.project_id, x.milestone_id): x for x in created})
+
+    # create the message objects
+    msgs = Message.objects.bulk_create(
+        [
+            Message(msgtxt=msgtxt, project_milestone=prjms[(project.id, milestone.id)])
+            for project, milestone, msgtxt in messages
+        ]
     )
 
-    # create a message object using the message text and the project-milestone
-    message = Message.objects.create(msgtxt=msgtxt, project_milestone=prjms)
-    # then loop through the list of recipients and add one record to
-    # Messages2Users for each one:
-    try:
-        for recipient in recipients:
-            # user = User.objects.get(Employee=emp)
-            # Messages2Users.objects.create(user=recipient, msg=message)
-            msg4u = Messages2Users(user=recipient, message=message)
-            msg4u.save()
-    except TypeError:
-        # Messages2Users.objects.create(user=recipients, msg=message)
-        msg4u = Messages2Users(user=recipients, message=message)
-        msg4u.save()
+    # and finally the distribution list of each message
+    if recipients is None:
+        projects = {x[0].id: x[0] for x in messages}
+        project_recipients = build_msg_recipient_ids(projects.values())
+    else:
+        user_ids = get_recipient_ids(recipients)
+    msgs4u = []
+    for (project, milestone, msgtxt), message in zip(messages, msgs):
+        if recipients is None:
+            user_ids = project_recipients[project.id]
+        msgs4u.extend(
+            [Messages2Users(user_id=user_id, message=message) for user_id in user_ids]
+        )
+    Messages2Users.objects.bulk_create(msgs4u, ignore_conflicts=True)
+
+    return msgs
+
+
+def coalesce_events(events, key=lambda x: x):
+    """Drop the events that repeat the previous event of the same
+    project milestone (e.g. approve, approve).  Events are never
+    reordered and only consecutive repeats are dropped, so approve,
+    revoke, approve still ends with 'approve'.  events is a list of
+    items in the order they happened, key returns the (project_id,
+    milestone_id, msgtxt) of an item."""
+
+    last = {}
+    coalesced = []
+    for event in events:
+        project_id, milestone_id, msgtxt = key(event)
+        if last.get((project_id, milestone_id)) == msgtxt:
+            continue
+        last[(project_id, milestone_id)] = msgtxt
+        coalesced.append(event)
+    return coalesced
+
+
+def queue_notification(msgtxt, project, milestone):
+    """Notify everyone associated with project that something has
+    happened to one of its milestones.  See queue_notifications().
+    """
+
+    queue_notifications([(project, milestone, msgtxt)])
+
+
+def queue_notifications(messages):
+    """Notify everyone associated with each project that something has
+    happened to one of its milestones.  messages is a list of
+    (project, milestone, msgtxt) tuples.
+
+    If settings.DEFER_NOTIFICATIONS is True, the events are added to
+    the notification outbox once the current transaction has been
+    committed, otherwise the messages are sent immediately.  Repeated
+    events for the same milestone are only queued once (see
+    coalesce_events()).
+    """
+
+    messages = list(messages)
+    if not messages:
+        return
+
+    if not settings.DEFER_NOTIFICATIONS:
+        send_messages(messages)
+        return
+
+    events = coalesce_events([(x[0].id, x[1].id, x[2]) for x in messages])
+
+    def enqueue():
+        NotificationEvent.objects.bulk_create(
+            [
+                NotificationEvent(project_id=x[0], milestone_id=x[1], msgtxt=x[2])
+                for x in events
+            ]
+        )
+
+    transaction.on_commit(enqueue)
+
+
+def notify_milestones_changed(project_milestones):
+    """A bulk version of the send_notice_prjms_changed signal.  Given a
+    list of project milestones that have just been completed (or had
+    their completed date cleared), queue one notification for each of
+    them with the same message the signal would have sent.  The
+    project and milestone of each object should be select_related."""
+
+    messages = []
+    for prjms in project_milestones:
+        if prjms.completed:
+            msgtxt = prjms.milestone.label
+        else:
+            msgtxt = "The milestone '%s' has been revoked" % prjms.milestone.label
+        messages.append((prjms.project, prjms.milestone, msgtxt))
+    queue_notifications(messages)
+
+
+def process_notification_events(batch_size=500):
+    """Send the messages for a batch of pending notification events
+    and mark them as processed.  Consecutive repeats of the same event
+    for a milestone are coalesced into a single message (see
+    coalesce_events()).
+    Pending events are locked with 'skip locked' so that more than one
+    worker can run at the same time.  Returns the number of events
+    that were processed.
+    """
+
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.filter(processed__isnull=True)
+            .select_related("project", "milestone")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("created")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        events_to_send = coalesce_events(
+            events, key=lambda x: (x.project_id, x.milestone_id, x.msgtxt)
+        )
+        send_messages([(x.project, x.milestone, x.msgtxt) for x in events_to_send])
+
+        now = datetime.datetime.now(pytz.utc)
+        NotificationEvent.objects.filter(pk__in=[x.pk for x in events]).update(
+            processed=now
+        )
+
+    return len(events)
 
 
 # =====================================
@@ -1721,10 +2168,8 @@ def send_notice_prjms_changed(sender, instance, **kwargs):
             # this milestone has been 'un-approved'
             msgtxt = "The milestone '%s' has been revoked" % instance.milestone.label
     if msgtxt:
-        # build the list of people we will be sending the message to
-        recipients = build_msg_recipients(instance.project)
-        send_message(
-            msgtxt, recipients, project=instance.project, milestone=instance.milestone
+        queue_notification(
+            msgtxt, project=instance.project, milestone=instance.milestone
         )
 
 
@@ -1741,7 +2186,174 @@ def send_notice_project_submitted(sender, instance, **kwargs):
 
     if instance.milestone.label == "Submitted":
         msgtxt = "Submitted"
-        recipients = build_msg_recipients(instance.project)
-        send_message(
-            msgtxt, recipients, project=instance.project, milestone=instance.milestone
+        queue_notification(
+            msgtxt, project=instance.project, milestone=instance.milestone
+        )
+
+
+@receiver(post_save, sender=ProjectMilestones)
+@receiver(post_delete, sender=ProjectMilestones)
+def update_project_milestone_flags(sender, instance, **kwargs):
+    """Keep the milestone_flags of the associated project current
+    whenever a project milestone is saved or deleted.  If the project
+    has already been retrieved for this project milestone, update it
+    too."""
+
+    flags = update_milestone_flags([instance.project_id])
+    if ProjectMilestones.project.is_cached(instance):
+        instance.project.milestone_flags = flags.get(instance.project_id, {})
+        instance.project._flags_version = _milestone_flag_updates[instance.project_id]
+
+
+@receiver(post_save, sender=Milestone)
+def update_milestone_label_flags(sender, instance, created, **kwargs):
+    """milestone_flags are keyed by label and include the category of
+    each milestone - refresh them for every project using this milestone
+    when a milestone is changed."""
+
+    if not created:
+        project_ids = set(
+            ProjectMilestones.objects.filter(milestone=instance).values_list(
+                "project_id", flat=True
+            )
+        )
+        if project_ids:
+            update_milestone_flags(project_ids)
+
+
+@receiver(post_save, sender=Project)
+def bump_sister_cache_version(sender, instance, created, **kwargs):
+    """The detail page of each sister project includes the project code
+    and name of this project.  (The cache_version of the project itself
+    is incremented in Project.save())"""
+
+    if not created:
+        bump_cache_version(
+            ProjectSisters.objects.filter(family__projectsisters__project=instance)
+            .exclude(project=instance)
+            .values("project_id")
+        )
+
+
+@receiver(post_save, sender=AssociatedFile)
+@receiver(post_delete, sender=AssociatedFile)
+@receiver(post_save, sender=ProjectImage)
+@receiver(post_delete, sender=ProjectImage)
+@receiver(post_save, sender=ProjectFunding)
+@receiver(post_delete, sender=ProjectFunding)
+def bump_project_cache_version(sender, instance, **kwargs):
+    """Files, images and funding sources are all displayed on the
+    project detail page - invalidate its cached fragments."""
+    bump_cache_version([instance.project_id])
+
+
+@receiver(post_save, sender=ProjectSisters)
+@receiver(post_delete, sender=ProjectSisters)
+def bump_family_cache_version(sender, instance, **kwargs):
+    """Every project in the family lists its sisters, so all of them
+    must be updated when a project joins or leaves the family."""
+
+    project_ids = set(
+        ProjectSisters.objects.filter(family_id=instance.family_id).values_list(
+            "project_id", flat=True
         )
+    )
+    project_ids.add(instance.project_id)
+    bump_cache_version(project_ids)
+
+
+@receiver(post_save, sender=Report)
+@receiver(pre_delete, sender=Report)
+def bump_report_cache_version(sender, instance, **kwargs):
+    """Update every project that the report is associated with.  The
+    links to the project milestones are removed before post_delete is
+    sent, so deletions are handled in pre_delete."""
+
+    if not kwargs.get("created"):
+        bump_cache_version(
+            ProjectMilestones.objects.filter(report=instance).values("project_id")
+        )
+
+
+@receiver(m2m_changed, sender=Report.projectreport.through)
+def bump_report_link_cache_version(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Reports are associated with projects (through their project
+    milestones) after they are saved."""
+
+    if action not in ("pre_clear", "post_add", "post_remove"):
+        return
+    if reverse:
+        # instance is a project milestone
+        bump_cache_version([instance.project_id])
+    elif action == "pre_clear":
+        bump_report_cache_version(sender, instance)
+    elif pk_set:
+        bump_cache_version(
+            ProjectMilestones.objects.filter(pk__in=pk_set).values("project_id")
+        )
+
+
+@receiver(m2m_changed, sender=Project.project_team.through)
+@receiver(m2m_changed, sender=Project.tags.through)
+def bump_m2m_cache_version(sender, instance, action, reverse, pk_set, **kwargs):
+    """The project team and keywords are displayed on the project
+    detail page.  Taggit sends m2m_changed for every tagged model, so
+    make sure that instance is actually a project."""
+
+    if reverse:
+        # instance is a user - pk_set contains project ids, but the
+        # projects must be found before they are cleared.
+        if action == "pre_clear":
+            bump_cache_version(instance.project_set.values("pk"))
+        elif action in ("post_add", "post_remove") and pk_set:
+            bump_cache_version(pk_set)
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if isinstance(instance, Project):
+            bump_cache_version([instance.pk])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=ProjectType)
+@receiver(post_delete, sender=ProjectType)
+@receiver(post_save, sender=ProjectProtocol)
+@receiver(post_delete, sender=ProjectProtocol)
+def clear_search_facets(sender, instance, **kwargs):
+    """The cached facet counts of the project search page may no longer
+    be correct."""
+    clear_project_facets()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=ProjectType)
+@receiver(post_delete, sender=ProjectType)
+@receiver(post_save, sender=ProjectPolygon)
+@receiver(post_delete, sender=ProjectPolygon)
+@receiver(post_save, sender=ProjectMultiPoints)
+@receiver(post_delete, sender=ProjectMultiPoints)
+def clear_map_tiles(sender, instance, **kwargs):
+    """The cached vector tiles may contain points or polygons that have
+    moved, or have been filtered by a year or project type that has
+    changed.  The project multipoints (and polygon) are recalculated
+    every time sample points are uploaded, so they cover changes to the
+    points too."""
+    clear_vector_tiles()
+
+
+@receiver(post_save, sender=ProjectMultiPoints)
+@receiver(post_delete, sender=ProjectMultiPoints)
+def clear_roi_results(sender, instance, **kwargs):
+    """The projects that are contained in or overlap each region of
+    interest are calculated from the project multipoints."""
+    clear_roi_cache()
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def clear_employee_hierarchy_cache(sender, instance, **kwargs):
+    """The supervisor of an employee may have changed - clear the cached
+    employee hierarchy."""
+    clear_hierarchy_cache()
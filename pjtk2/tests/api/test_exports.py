@@ -0,0 +1,99 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/api/test_exports.py
+ Created: 18 Oct 2026 14:24:03
+
+ DESCRIPTION:
+
+  The export endpoints stream projects and sample points as csv or
+  ndjson.  The responses should be streamed, contain a row for every
+  (filtered) record and respect the same filters as the api.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+import csv
+import io
+import json
+
+import pytest
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.urls import reverse
+
+from pjtk2.api.exports import stream_rows
+from pjtk2.tests.factories import ProjectFactory, SamplePointFactory
+
+
+@pytest.fixture()
+def sample_points(db):
+    """two projects with a few sample points each."""
+
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111", prj_nm="Parry Sound")
+    project2 = ProjectFactory.create(prj_cd="LHA_IA14_222", prj_nm="Owen Sound")
+
+    points = []
+    for i, project in enumerate([project1, project2]):
+        for j in range(3):
+            geom = GEOSGeometry("POINT(-82.{0}{1} 44.{0}{1})".format(i, j), srid=4326)
+            points.append(
+                SamplePointFactory.create(project=project, label=str(j), geom=geom)
+            )
+    return points
+
+
+def test_stream_rows_chunks():
+    """The csv header and the first row should be yielded on their own
+    so that the client gets something right away - the rest of the rows
+    are yielded in chunks."""
+
+    rows = [(x, "label {}".format(x)) for x in range(5)]
+    chunks = list(stream_rows(["id", "label"], rows, "csv", chunk_size=2))
+    assert chunks[0] == "id,label\r\n"
+    assert chunks[1] == "0,label 0\r\n"
+    assert len(chunks) == 4
+
+    chunks = list(stream_rows(["id", "label"], rows, "ndjson", chunk_size=10))
+    assert chunks[0] == '{"id":0,"label":"label 0"}\n'
+    assert len(chunks) == 2
+
+
+@pytest.mark.django_db
+def test_export_projects_ndjson(client, sample_points):
+    """Each line of the ndjson response should contain a project."""
+
+    url = reverse("api:export_projects", kwargs={"fmt": "ndjson"})
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "application/x-ndjson"
+
+    content = b"".join(response.streaming_content).decode("utf-8")
+    projects = [json.loads(x) for x in content.splitlines()]
+    assert [x["prj_cd"] for x in projects] == ["LHA_IA14_222", "LHA_IA12_111"]
+    assert projects[0]["prj_nm"] == "Owen Sound"
+    assert projects[0]["year"] == "2014"
+
+
+@pytest.mark.django_db
+def test_export_sample_points_csv(client, sample_points):
+    """The csv export should have a header and a row (with the
+    coordinates) for every sample point that matches the filters."""
+
+    url = reverse("api:export_sample_points", kwargs={"fmt": "csv"})
+    response = client.get(url, {"first_year": 2014})
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/csv"
+    assert "sample_points.csv" in response["Content-Disposition"]
+
+    content = b"".join(response.streaming_content).decode("utf-8")
+    rows = list(csv.DictReader(io.StringIO(content)))
+    assert len(rows) == 3
+    assert {x["prj_cd"] for x in rows} == {"LHA_IA14_222"}
+
+    row = rows[0]
+    point = sample_points[3]
+    assert row["label"] == point.label
+    assert float(row["dd_lat"]) == pytest.approx(point.geom.y)
+    assert float(row["dd_lon"]) == pytest.approx(point.geom.x)
@@ -0,0 +1,130 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/api/test_keyset_pagination.py
+ Created: 18 Oct 2026 13:51:27
+
+ DESCRIPTION:
+
+  The project, project abstract and project lead endpoints use page
+  number pagination by default, but clients can opt in to keyset
+  (cursor) pagination by adding ?pagination=cursor and following the
+  'next' links.  Walking all of the pages with a cursor should return
+  every record exactly once, in the same order as the default
+  pagination, without counting the records.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+
+from pjtk2.tests.factories import ProjectFactory, ProjTypeFactory
+
+
+@pytest.fixture()
+def projects(db):
+    """nine projects spread over three years and two project types (and
+    one without a project type) - several share the same year, type and
+    name so that the unique tie breaker is required."""
+
+    offshore = ProjTypeFactory(project_type="Offshore Index")
+    nearshore = ProjTypeFactory(project_type="Nearshore Index")
+
+    projects = []
+    prj_cds = ["LHA_IA10_{}", "LHA_IA12_{}", "LHA_IA14_{}"]
+    for i, prj_cd in enumerate(prj_cds):
+        for j, project_type in enumerate([offshore, nearshore]):
+            for k in range(2):
+                project = ProjectFactory.create(
+                    prj_cd=prj_cd.format(100 + j * 10 + k),
+                    prj_nm="Index Netting" if k else "Another Project",
+                    project_type=project_type,
+                )
+                projects.append(project)
+    project = ProjectFactory.create(prj_cd="LHA_IA12_999", prj_nm="Index Netting")
+    project.project_type = None
+    project.save()
+    projects.append(project)
+
+    return projects
+
+
+def walk_pages(client, url, params):
+    """follow the next links from url and return the results of every
+    page along with the sql of every query that was executed."""
+    results = []
+    queries = []
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        payload = response.json()
+        results.extend(payload["results"])
+        if payload["next"] is None:
+            break
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(payload["next"])
+        queries.extend(x["sql"] for x in ctx.captured_queries)
+    return results, queries
+
+
+@pytest.mark.django_db
+def test_project_abstracts_keyset_pagination(client, projects):
+    """walking the project abstracts with a cursor should return the
+    same projects, in the same order, as the page number pagination."""
+
+    url = reverse("api:project_abstract-list")
+
+    response = client.get(url, {"page_size": 100})
+    expected = [x["slug"] for x in response.json()["results"]]
+    assert len(expected) == len(projects)
+
+    results, queries = walk_pages(
+        client, url, {"pagination": "cursor", "page_size": 2}
+    )
+    assert [x["slug"] for x in results] == expected
+    assert not any("COUNT(" in sql for sql in queries)
+
+
+@pytest.mark.django_db
+def test_projects_keyset_pagination(client, projects):
+    """the project endpoint is ordered by end date (and id)."""
+
+    url = reverse("api:project-list")
+    results, queries = walk_pages(
+        client, url, {"pagination": "cursor", "page_size": 4}
+    )
+
+    slugs = [x["slug"] for x in results]
+    assert len(slugs) == len(projects)
+    assert len(set(slugs)) == len(projects)
+    assert not any("COUNT(" in sql for sql in queries)
+
+
+@pytest.mark.django_db
+def test_project_leads_keyset_pagination(client, projects):
+    """the users are ordered by id."""
+
+    url = reverse("api:project_lead-list")
+
+    response = client.get(url, {"page_size": 1000})
+    expected = [x["username"] for x in response.json()["results"]]
+
+    results, queries = walk_pages(
+        client, url, {"pagination": "cursor", "page_size": 5}
+    )
+    assert [x["username"] for x in results] == expected
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_invalid_cursor(client, projects):
+    """a cursor that can't be decoded should return a 404."""
+
+    url = reverse("api:project_abstract-list")
+    response = client.get(url, {"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,88 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/api/test_project_lookup.py
+ Created: 18 Oct 2026 13:14:40
+
+ DESCRIPTION:
+
+  The project lookup endpoint is used by typeahead widgets.  It should
+  return the project code, name and slug of the projects with a project
+  code or name that contains the search string - project codes that
+  start with the string first - and should be cacheable.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+import pytest
+
+from django.urls import reverse
+
+from rest_framework import status
+
+from pjtk2.tests.factories import ProjectFactory
+
+
+@pytest.fixture()
+def projects(db):
+    """four projects - one has a name that starts with 'lha' and one
+    is not active."""
+
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111", prj_nm="Parry Sound")
+    project2 = ProjectFactory.create(prj_cd="LHA_IA14_222", prj_nm="Owen Sound")
+    project3 = ProjectFactory.create(prj_cd="LSA_IA14_333", prj_nm="Lhasa Sound")
+    project4 = ProjectFactory.create(
+        prj_cd="LHA_IA16_444", prj_nm="Inactive Project", active=False
+    )
+    return [project1, project2, project3, project4]
+
+
+@pytest.mark.django_db
+def test_project_lookup(client, projects):
+    """Project codes that start with the search string should be
+    returned first (newest first), followed by names that start with
+    it.  Inactive projects are not returned."""
+
+    url = reverse("api:project_lookup")
+    response = client.get(url, {"q": "lha"})
+    assert response.status_code == status.HTTP_200_OK
+
+    assert response.json() == [
+        {"prj_cd": "LHA_IA14_222", "prj_nm": "Owen Sound", "slug": "lha_ia14_222"},
+        {"prj_cd": "LHA_IA12_111", "prj_nm": "Parry Sound", "slug": "lha_ia12_111"},
+        {"prj_cd": "LSA_IA14_333", "prj_nm": "Lhasa Sound", "slug": "lsa_ia14_333"},
+    ]
+
+    cache_control = response["Cache-Control"]
+    assert "public" in cache_control
+    assert "max-age" in cache_control
+
+
+@pytest.mark.django_db
+def test_project_lookup_name_and_limit(client, projects):
+    """The search string can match any part of the name and the number
+    of projects returned is controlled by limit."""
+
+    url = reverse("api:project_lookup")
+    response = client.get(url, {"q": "sound", "limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
+
+
+@pytest.mark.django_db
+def test_project_lookup_short_string(client, projects):
+    """Search strings that are too short should return an empty list."""
+
+    url = reverse("api:project_lookup")
+    response = client.get(url, {"q": "lh"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+
+@pytest.mark.django_db
+def test_project_lookup_bad_limit(client, projects):
+    """A limit that isn't a number should return an error."""
+
+    url = reverse("api:project_lookup")
+    response = client.get(url, {"q": "lha", "limit": "lots"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
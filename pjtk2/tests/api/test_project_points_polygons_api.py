@@ -5,7 +5,11 @@ from django.urls import reverse
 from rest_framework import status
 
 from pjtk2.models import SamplePoint, ProjectPolygon
-from pjtk2.api.serializers import ProjectPolygonSerializer, ProjectPointSerializer
+from pjtk2.api.serializers import (
+    ProjectPolygonSerializer,
+    ProjectPointSerializer,
+    serialize_project_points,
+)
 from pjtk2.tests.factories import ProjectFactory, SamplePointFactory
 
 from rest_framework.test import APITestCase
@@ -63,6 +67,30 @@ class ProjectAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
+    def test_serialize_project_points(self):
+        """serialize_project_points() should return exactly the same data
+        as ProjectPointSerializer - including points without a label and
+        projects without a project type - in a single query."""
+
+        project = ProjectFactory.create(prj_cd="LHA_IA16_222", prj_nm="No Type")
+        project.project_type = None
+        project.save()
+        SamplePointFactory.create(
+            project=project, label=None, geom=GEOSGeometry("POINT(-82.05 44.05)")
+        )
+
+        points = SamplePoint.objects.select_related(
+            "project", "project__project_type"
+        ).order_by("project__prj_cd", "id")
+        serializer = ProjectPointSerializer(points, many=True)
+
+        with self.assertNumQueries(1):
+            data = serialize_project_points(points)
+
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data, [dict(x) for x in serializer.data])
+        self.assertEqual(list(data[0].keys()), list(serializer.data[0].keys()))
+
     def test_project_points_api_get_bad_project_code(self):
         """If we try to access the project points api with a malformed project
         code it will return an error.
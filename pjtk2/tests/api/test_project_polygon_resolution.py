@@ -0,0 +1,103 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/api/test_project_polygon_resolution.py
+ Created: 18 Oct 2026 19:04:37
+
+ DESCRIPTION:
+
+  Simplified versions of each project polygon are saved with it, and
+  the project polygon endpoint returns the one requested with
+  ?resolution= (or suited to the map's ?zoom=) with the coordinates
+  rounded.  Without either, the full polygon is returned as before.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+import math
+
+import pytest
+
+from django.contrib.gis.geos import GEOSGeometry, Polygon
+from django.urls import reverse
+
+from pjtk2.models import ProjectPolygon
+from pjtk2.tests.factories import ProjectFactory
+
+
+@pytest.fixture()
+def polygon(db):
+    """a project with a polygon that has lots of vertices (a circle with
+    a radius of 0.2 degrees and 500 vertices)."""
+
+    project = ProjectFactory.create(prj_cd="LHA_IA12_111")
+    angles = [x * math.pi / 250 for x in range(500)]
+    coords = [(-82 + 0.2 * math.cos(x), 44 + 0.2 * math.sin(x)) for x in angles]
+    coords.append(coords[0])
+    return ProjectPolygon.objects.create(
+        project=project, geom=Polygon(coords, srid=4326)
+    )
+
+
+def get_polygons(client, project, **params):
+    url = reverse("api:project_polygon", kwargs={"slug": project.slug})
+    return client.get(url, params)
+
+
+@pytest.mark.django_db
+def test_simplified_polygons_saved(polygon):
+    """The simplified polygons should have fewer vertices than the full
+    polygon and the low resolution polygon the fewest."""
+
+    polygon.refresh_from_db()
+    full = polygon.geom.num_coords
+    assert polygon.geom_medium.num_coords < full
+    assert polygon.geom_low.num_coords < polygon.geom_medium.num_coords
+    assert polygon.geom_low.area == pytest.approx(polygon.geom.area, rel=0.1)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "params,decimals",
+    [({"resolution": "low"}, 3), ({"zoom": "6"}, 3), ({"zoom": "10"}, 4)],
+)
+def test_project_polygon_resolution(client, polygon, params, decimals):
+    """A simplified polygon should be returned with the coordinates
+    rounded to the decimal places of its resolution."""
+
+    response = get_polygons(client, polygon.project, **params)
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["prj_cd"] == "LHA_IA12_111"
+
+    geom = GEOSGeometry(data[0]["geom"])
+    assert geom.srid == 4326
+    assert geom.num_coords < polygon.geom.num_coords
+    for x, y in geom.coords[0]:
+        assert round(x, decimals) == x
+        assert round(y, decimals) == y
+
+
+@pytest.mark.django_db
+def test_project_polygon_full_resolution(client, polygon):
+    """The full polygon should be returned at high zoom levels or without
+    a resolution, and the simplified polygons should be much smaller."""
+
+    full = get_polygons(client, polygon.project).json()
+    assert GEOSGeometry(full[0]["geom"]).num_coords == polygon.geom.num_coords
+
+    zoomed = get_polygons(client, polygon.project, zoom="15").json()
+    assert GEOSGeometry(zoomed[0]["geom"]).num_coords == polygon.geom.num_coords
+
+    low = get_polygons(client, polygon.project, resolution="low").json()
+    assert len(low[0]["geom"]) * 10 < len(full[0]["geom"])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("params", [{"resolution": "tiny"}, {"zoom": "foo"}])
+def test_project_polygon_bad_resolution(client, polygon, params):
+    """An unknown resolution or a zoom that isn't a number should return
+    a 400."""
+
+    response = get_polygons(client, polygon.project, **params)
+    assert response.status_code == 400
@@ -1,6 +1,6 @@
 from django.contrib.gis.geos import GEOSGeometry
 from django.db.models import Q
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 
 
@@ -140,6 +140,28 @@ class ProjectAPITest(APITestCase):
         self.assertEqual(len(response.data), len(serializer.data))
         self.assertEqual(response.data, serializer.data)
 
+    def test_points_in_roi_api_includes_projects_without_multipoints(self):
+        """Every sample point in the roi should be returned by the points
+        api, even if its project doesn't have a multipoint (e.g. the
+        points were loaded directly into the database).
+
+        """
+
+        project = ProjectFactory(prj_cd="LHA_IA16_NMP", prj_nm="No Multipoint")
+        SamplePointFactory(
+            project=project,
+            label="nmp-0",
+            geom=GEOSGeometry("POINT(-82.024922507764 44.0171801372301)"),
+        )
+
+        url = reverse("api:get_points_in_roi")
+        response = self.client.post(url, {"roi": self.roi.wkt})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        labels = [x["label"] for x in response.data]
+        self.assertIn("nmp-0", labels)
+        self.assertEqual(len(labels), 7)
+
     def test_points_in_roi_api_post_good_roi_json(self):
         """If we pass in a valid roi as json, the api should return a
         list of sample points contained in the roi.  It will not
@@ -461,3 +483,24 @@ class ProjectAPITest(APITestCase):
         data = {}
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_roi_api_calls_share_project_ids(self):
+        """The contained and overlapping projects are only found once for
+        each roi - later calls with the same roi (even if it is formatted
+        differently) only have to retrieve the points.
+
+        """
+
+        url = reverse("api:get_project_points_contained_in_roi")
+        response = self.client.post(url, {"roi": self.roi.wkt})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        url = reverse("api:get_project_points_overlapping_roi")
+        with self.assertNumQueries(1):
+            response = self.client.post(url, {"roi": self.roi.geojson})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        prj_cds = set([x["prj_cd"] for x in response.data])
+        self.assertEqual(prj_cds, set(["LHA_IA16_LAP"]))
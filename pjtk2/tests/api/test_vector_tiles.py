@@ -0,0 +1,193 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/api/test_vector_tiles.py
+ Created: 18 Oct 2026 15:14:52
+
+ DESCRIPTION:
+
+  The vector tile endpoint returns Mapbox Vector Tiles of the sample
+  points and project polygons that fall in each tile.  Tiles that don't
+  contain anything are returned with a 204, tiles that don't exist
+  return a 404, and the tiles respect the same year and project type
+  filters as the sample point endpoints.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+import pytest
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.urls import reverse
+
+from pjtk2.models import ProjectPolygon
+from pjtk2.utils.vector_tiles import ORIGIN_SHIFT, tile_bbox, tile_bounds
+from pjtk2.tests.factories import (
+    ProjectFactory,
+    ProjTypeFactory,
+    SamplePointFactory,
+)
+
+# the zoom 8 tile that contains the default sample point in
+# SamplePointFactory (Lake Huron) and one that doesn't
+HURON_TILE = {"z": 8, "x": 69, "y": 93}
+EMPTY_TILE = {"z": 8, "x": 0, "y": 0}
+
+
+@pytest.fixture()
+def sample_points(db):
+    """two projects of different types and years, each with a couple of
+    sample points near the default sample point and a project polygon."""
+
+    offshore = ProjTypeFactory(project_type="Offshore Index")
+    nearshore = ProjTypeFactory(project_type="Nearshore Index")
+
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111", project_type=offshore)
+    project2 = ProjectFactory.create(prj_cd="LHA_IA14_222", project_type=nearshore)
+
+    points = []
+    for project in [project1, project2]:
+        for j in range(2):
+            geom = GEOSGeometry("POINT(-82.0{0} 44.0{0})".format(j + 1), srid=4326)
+            points.append(
+                SamplePointFactory.create(project=project, label=str(j), geom=geom)
+            )
+        hull = GEOSGeometry(
+            "POLYGON((-82.1 44.0, -82.0 44.0, -82.0 44.1, -82.1 44.0))", srid=4326
+        )
+        ProjectPolygon.objects.create(project=project, geom=hull)
+    return points
+
+
+def test_tile_bounds():
+    """The only tile at zoom 0 is the whole world, the first tile at
+    zoom 1 is the top left quarter of it."""
+
+    assert tile_bounds(0, 0, 0) == pytest.approx(
+        (-ORIGIN_SHIFT, -ORIGIN_SHIFT, ORIGIN_SHIFT, ORIGIN_SHIFT)
+    )
+    assert tile_bounds(1, 0, 0) == pytest.approx((-ORIGIN_SHIFT, 0, 0, ORIGIN_SHIFT))
+
+    with pytest.raises(ValueError):
+        tile_bounds(1, 2, 0)
+
+
+def test_tile_bbox():
+    """The bounding box of a tile (in lat-lon) should contain the points
+    in the tile and not the points outside it."""
+
+    bbox = tile_bbox(**HURON_TILE)
+    assert bbox.srid == 4326
+    assert bbox.contains(GEOSGeometry("POINT(-82.04 44.04)"))
+    assert not bbox.contains(GEOSGeometry("POINT(-80.0 44.04)"))
+
+
+@pytest.mark.django_db
+def test_vector_tile(client, sample_points):
+    """A tile that contains sample points should be returned as a
+    (cacheable) mapbox vector tile with both layers."""
+
+    url = reverse("api:vector_tile", kwargs=HURON_TILE)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/vnd.mapbox-vector-tile"
+    assert "max-age" in response["Cache-Control"]
+    assert b"sample_points" in response.content
+    assert b"project_polygons" in response.content
+    assert b"LHA_IA12_111" in response.content
+
+
+@pytest.mark.django_db
+def test_vector_tile_filters(client, sample_points):
+    """Only the points and polygons of the projects that match the
+    filters should be included in the tile."""
+
+    project_type = sample_points[0].project.project_type
+
+    url = reverse("api:vector_tile", kwargs=HURON_TILE)
+    response = client.get(url, {"project_type": project_type.id})
+    assert response.status_code == 200
+    assert b"LHA_IA12_111" in response.content
+    assert b"LHA_IA14_222" not in response.content
+
+    response = client.get(url, {"year": 2014})
+    assert response.status_code == 200
+    assert b"LHA_IA12_111" not in response.content
+    assert b"LHA_IA14_222" in response.content
+
+    response = client.get(url, {"year": 2010})
+    assert response.status_code == 204
+
+
+@pytest.mark.django_db
+def test_vector_tile_prj_cd_filter(client, sample_points):
+    """The roi results map asks for the tiles of a list of projects - only
+    their points and polygons should be included in the tile."""
+
+    url = reverse("api:vector_tile", kwargs=HURON_TILE)
+    response = client.get(url, {"prj_cd": "LHA_IA14_222,LHA_IA99_999"})
+    assert response.status_code == 200
+    assert b"LHA_IA12_111" not in response.content
+    assert b"LHA_IA14_222" in response.content
+
+    response = client.get(url, {"prj_cd": "LHA_IA99_999"})
+    assert response.status_code == 204
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "z,x,y,column",
+    [(6, 17, 23, "geom_low"), (10, 279, 374, "geom_medium"), (14, 4473, 5989, "geom")],
+)
+def test_vector_tile_polygon_resolution(client, monkeypatch, z, x, y, column):
+    """The simplified project polygons should be drawn at lower zoom
+    levels and the full polygons when the map is zoomed in."""
+
+    columns = []
+
+    def fake_get_vector_tile(*args):
+        columns.append(args[-1])
+        return b""
+
+    monkeypatch.setattr("pjtk2.api.tiles.get_vector_tile", fake_get_vector_tile)
+    url = reverse("api:vector_tile", kwargs={"z": z, "x": x, "y": y})
+    assert client.get(url).status_code == 204
+    assert columns == [column]
+
+
+@pytest.mark.django_db
+def test_vector_tile_cached(client, sample_points, settings):
+    """The tiles are cached by filters until a project polygon (or
+    project) is saved."""
+
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+    url = reverse("api:vector_tile", kwargs=HURON_TILE)
+    first = client.get(url, {"year": 2012}).content
+    assert b"LHA_IA12_111" in first
+
+    project = sample_points[0].project
+    ProjectPolygon.objects.filter(project=project).update(
+        geom=GEOSGeometry("POLYGON((0 0, 1 0, 1 1, 0 0))", srid=4326)
+    )
+    # update() doesn't send any signals - the cached tile is returned
+    assert client.get(url, {"year": 2012}).content == first
+
+    ProjectPolygon.objects.get(project=project).save()
+    assert client.get(url, {"year": 2012}).content != first
+
+
+@pytest.mark.django_db
+def test_vector_tile_empty_and_missing(client, sample_points):
+    """Tiles without any points return a 204 and tiles that don't exist
+    a 404."""
+
+    url = reverse("api:vector_tile", kwargs=EMPTY_TILE)
+    response = client.get(url)
+    assert response.status_code == 204
+
+    url = reverse("api:vector_tile", kwargs={"z": 2, "x": 4, "y": 0})
+    response = client.get(url)
+    assert response.status_code == 404
@@ -496,3 +496,126 @@ def test_sister_message_in_detail_response(client):
     content = str(response.content)
     msg = "<p><em>* denotes reports shared across sister projects </em></p>"
     assert msg in content
+
+
+@pytest.mark.django_db
+def test_project_detail_query_count(client, project, manager):
+    """The number of queries required to render the project detail page
+    should not depend on the number of reports, funding sources, images
+    or sister projects associated with the project."""
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    def add_report(order):
+        milestone = MilestoneFactory.create(
+            label="Report {}".format(order), category="Core", report=True, order=order
+        )
+        prjms = ProjectMilestonesFactory.create(project=project, milestone=milestone)
+        report = ReportFactory.create(uploaded_by=manager)
+        report.projectreport.add(prjms)
+
+    def add_funding(abbrev):
+        source = FundingSourceFactory.create(name=abbrev, abbrev=abbrev)
+        ProjectFundingFactory.create(project=project, source=source)
+
+    add_report(10)
+    add_funding("spa")
+    ProjectImageFactory.create(project=project)
+
+    login = client.login(username=manager.username, password="Abcd1234")
+    assert login is True
+    url = reverse("project_detail", kwargs={"slug": project.slug})
+
+    with CaptureQueriesContext(connection) as before:
+        response = client.get(url)
+    assert response.status_code == 200
+
+    # add a bunch more of everything - including a sister project
+    for order in range(11, 16):
+        add_report(order)
+    add_funding("cofa")
+    add_funding("nsf")
+    for i in range(3):
+        ProjectImageFactory.create(project=project)
+    sister = ProjectFactory.create(prj_cd="LHA_IA12_222", owner=project.owner)
+    project.add_sister(sister.slug)
+
+    with CaptureQueriesContext(connection) as after:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.context["detail"]["Core"]) == 6
+    assert len(response.context["detail"]["sisters"]) == 1
+
+    assert len(after) == len(before)
+
+
+@pytest.mark.django_db
+def test_project_detail_fragments_cached(client, project, manager, settings):
+    """The cached project detail fragments should be used until
+    something on the page changes, but the per-user elements (like the
+    bookmark button) must always be current."""
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils.functional import empty
+
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test_project_detail",
+        }
+    }
+
+    login = client.login(username=manager.username, password="Abcd1234")
+    assert login is True
+    url = reverse("project_detail", kwargs={"slug": project.slug})
+
+    with CaptureQueriesContext(connection) as first:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert "Bookmark Project" in str(response.content)
+
+    Bookmark.objects.create(project=project, user=manager)
+
+    with CaptureQueriesContext(connection) as second:
+        response = client.get(url)
+    content = str(response.content)
+    assert response.context["detail"]._wrapped is empty
+    assert len(second) < len(first)
+    assert project.prj_nm in content
+    assert "Remove Bookmark" in content
+
+    # uploading a report should invalidate the cached fragments
+    milestone = MilestoneFactory.create(
+        label="Fancy Report", category="Core", report=True, order=10
+    )
+    prjms = ProjectMilestonesFactory.create(project=project, milestone=milestone)
+    report = ReportFactory.create(uploaded_by=manager, report_path="fancy/report.pdf")
+    report.projectreport.add(prjms)
+
+    response = client.get(url)
+    assert response.context["detail"]._wrapped is not empty
+    assert "fancy/report.pdf" in str(response.content)
+
+    # and so should changing the project
+    project = Project.objects.get(pk=project.pk)
+    project.prj_nm = "A Brand New Name"
+    project.save()
+
+    response = client.get(url)
+    assert "A Brand New Name" in str(response.content)
+
+
+@pytest.mark.django_db
+def test_project_lead_can_load_report_upload(client, project, user):
+    """The upload reports link on the project detail page should render
+    the report upload form for the project lead."""
+
+    login = client.login(username=user.username, password="Abcd1234")
+    assert login == True
+    response = client.get(reverse("ReportUpload", kwargs={"slug": project.slug}))
+
+    assert response.status_code == 200
+    assert "pjtk2/UploadReports.html" in [x.name for x in response.templates]
+    assert project.prj_cd in response.content.decode("utf-8")
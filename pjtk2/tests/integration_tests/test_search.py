@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.db.models.signals import pre_save
 
 from django_webtest import WebTest
+import pytest
 
 from pjtk2.models import ProjectMilestones, send_notice_prjms_changed
 from pjtk2.tests.factories import ProjectFactory, ProjTypeFactory, UserFactory
@@ -216,3 +219,39 @@ class CanUseSearchForm(WebTest):
         self.project2.delete()
         self.project3.delete()
         self.ProjType.delete()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("page,expected", [("foo", 1), ("99", 2), ("2", 2)])
+def test_project_search_bad_page(client, page, expected):
+    """A page that isn't a number should return the first page of the
+    search results and a page that is out of range the last page,
+    rather than a 404."""
+
+    user = UserFactory(username="hsimpson", first_name="Homer", last_name="Simpson")
+    client.force_login(user)
+    for i in range(55):
+        ProjectFactory(prj_cd="LHA_IA12_{:03d}".format(i + 100), owner=user)
+
+    response = client.get(reverse("project_search"), {"page": page})
+    assert response.status_code == 200
+    assert response.context["page_obj"].number == expected
+
+
+@pytest.mark.django_db
+def test_project_search_paginator_uses_facet_count(client):
+    """The paginator should use the project count calculated with the
+    facets rather than running its own count query."""
+
+    user = UserFactory(username="hsimpson", first_name="Homer", last_name="Simpson")
+    client.force_login(user)
+    for i in range(55):
+        ProjectFactory(prj_cd="LHA_IA12_{:03d}".format(i + 100), owner=user)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse("project_search"), {"page": "2"})
+    assert response.status_code == 200
+    assert response.context["paginator"].count == 55
+    assert response.context["project_count"] == 55
+    assert len(response.context["object_list"]) == 5
+    assert not [x for x in queries.captured_queries if '"__count"' in x["sql"]]
@@ -49,6 +49,7 @@ from pjtk2.tests.pytest_fixtures import user, joe_user, dba, manager
 
 
 from pjtk2.models import ProjectPolygon
+from pjtk2.utils.point_upload import PointUploadError
 
 from ..factories import (
     LakeFactory,
@@ -369,6 +370,42 @@ def test_point_out_of_bounds(client, user, project, pts):
         assert msg in content
 
 
+@pytest.mark.django_db
+def test_point_in_extent_but_outside_lake(client, user, project, pts):
+    """Points inside the bounding box of the lake but outside of the lake
+    polygon itself (here, the missing corner of an L shaped lake) should
+    be rejected with the rows they are in, and nothing should be saved.
+
+    """
+
+    lake = project.lake
+    lake.geom = GEOSGeometry(
+        "MULTIPOLYGON(((-84 44, -83 44, -83 44.5, -83.5 44.5, -83.5 45, -84 45, "
+        "-84 44)))",
+        srid=4326,
+    )
+    lake.save()
+    points_prior = project.samplepoint_set.count()
+
+    # the first point is in the missing (north east) corner
+    pts[1] = ["1", "44.8", "-83.2"]
+
+    points_file = csv_file_upload(pts)
+    form_data = {"replace": "replace", "points_file": points_file}
+    url = reverse("spatial_point_upload", kwargs={"slug": project.slug})
+
+    login = client.login(username=user.username, password="Abcd1234")
+    assert login is True
+    response = client.post(url, form_data, follow=True)
+    assert response.status_code == 200
+    content = response.content.decode("utf-8")
+
+    msg = "1 of the supplied points are not within the bounds of the lake"
+    assert msg in content
+    assert "Row: 2." in content
+    assert project.samplepoint_set.count() == points_prior
+
+
 def test_points_missing_label(client, project, user, pts):
     """Every point must have label - it labels are missing or empty
     strings, raise an error.
@@ -606,12 +643,13 @@ def test_project_polygon_updated(client, project, user, pts):
     assert geom_after != geom_prior
 
 
-def test_project_maximum_upload_size(client, project, user, pts):
+def test_project_maximum_upload_size(client, project, user, pts, settings):
     """We should have a limit on the number of rows/points that can be
     uploaded at one time.  If the user tries to upload more than that, a
     warning should be returned to the user.
 
     """
+    settings.MAX_UPLOAD_POINTS = 1000
     # grab the points without the header and add a bunch of copies
     pts.extend(pts[1:] * 500)
     points_file = csv_file_upload(pts)
@@ -635,6 +673,81 @@ def test_project_maximum_upload_size(client, project, user, pts):
     assert msg in content
 
 
+@pytest.mark.django_db
+def test_upload_large_points_file(client, project, user, pts):
+    """Files with many more points than the old limit of 1000 points
+    (or 0.5 mb) should be accepted and all of the points saved.
+
+    """
+    header = pts.pop(0)
+    rows = [header]
+    for i in range(20000):
+        rows.append([str(i), "{:.5f}".format(44.1 + (i % 800) / 1000), "-83.5"])
+    points_file = csv_file_upload(rows)
+
+    form_data = {"replace": "replace", "points_file": points_file}
+    url = reverse("spatial_point_upload", kwargs={"slug": project.slug})
+
+    login = client.login(username=user.username, password="Abcd1234")
+    assert login is True
+    response = client.post(url, form_data, follow=True)
+    assert response.status_code == 200
+
+    assert project.samplepoint_set.count() == 20000
+
+
+def test_upload_errors_include_row_numbers(client, project, user, pts):
+    """The validation errors should include the rows of the file that
+    contain the problem (the header is row 1).
+
+    """
+    pts[2][2] = "FOO"
+
+    points_file = csv_file_upload(pts)
+    form_data = {"replace": "replace", "points_file": points_file}
+    url = reverse("spatial_point_upload", kwargs={"slug": project.slug})
+
+    login = client.login(username=user.username, password="Abcd1234")
+    assert login is True
+    response = client.post(url, form_data, follow=True)
+    assert response.status_code == 200
+    content = response.content.decode("utf-8")
+
+    msg = "At least one point has an invalid latitude or longitude. Row: 3."
+    assert msg in content
+
+
+def test_upload_rejected_when_saved(client, project, user, pts, monkeypatch):
+    """If the points are rejected when they are saved (after the form has
+    been validated), the form should be returned with the error and the
+    rows of the file the offending points came from.
+
+    """
+
+    def reject_points(project, points, replace=False):
+        raise PointUploadError(
+            "2 of the supplied points are not within the bounds of the "
+            "lake associated with this project.",
+            [0, 2],
+        )
+
+    monkeypatch.setattr("pjtk2.forms.upload_sample_points", reject_points)
+
+    points_file = csv_file_upload(pts)
+    form_data = {"replace": "replace", "points_file": points_file}
+    url = reverse("spatial_point_upload", kwargs={"slug": project.slug})
+
+    login = client.login(username=user.username, password="Abcd1234")
+    assert login is True
+    response = client.post(url, form_data, follow=True)
+    assert response.status_code == 200
+    assert "pjtk2/UploadSpatialPoints.html" in [t.name for t in response.templates]
+    content = response.content.decode("utf-8")
+
+    msg = "lake associated with this project. Rows: 2, 4."
+    assert msg in content
+
+
 def test_upload_no_data(client, project, user, pts):
     """We should have a limit on the number of rows/points that can be
     uploaded at one time.  If the user tries to upload more than that, a
@@ -31,6 +31,7 @@ from pjtk2.tests.factories import (
 
 from pjtk2.views import can_edit
 from pjtk2.utils.helpers import is_manager, is_dba
+from pjtk2.utils.permissions import PermissionContext
 
 # from pjtk2.functions import can_edit
 
@@ -111,6 +112,27 @@ class TestCanEditFunction(TestCase):
         # but Barney Can edit project2 since he is the field leader:
         self.assertEqual(can_edit(self.user3, self.project2), True)
 
+    def test_permission_context(self):
+        """The permission context should return the same answers as
+        can_edit() and is_manager(), but the employee role should only
+        be retrieved once and nothing else should require a query."""
+
+        burns = User.objects.get(pk=self.user2.id)
+        with self.assertNumQueries(1):
+            permissions = PermissionContext(burns)
+            self.assertTrue(permissions.is_manager)
+            self.assertFalse(permissions.is_dba)
+            self.assertTrue(permissions.can_edit(self.project1))
+            self.assertTrue(permissions.can_edit(self.project2))
+            self.assertTrue(permissions.can_edit(self.project1))
+
+        barney = User.objects.get(pk=self.user3.id)
+        with self.assertNumQueries(1):
+            permissions = PermissionContext(barney)
+            self.assertFalse(permissions.can_edit(self.project1))
+            self.assertTrue(permissions.can_edit(self.project2))
+            self.assertFalse(permissions.is_manager)
+
     def tearDown(self):
         """Clean up"""
         self.project2.delete()
@@ -62,3 +62,41 @@ def test_anon_user_cannot_signoff_project(client, project):
     assert url in response["Location"]
 
     assert project.is_complete() == False
+
+
+@pytest.mark.django_db
+def test_approve_projects_in_bulk(user):
+    """approve_projects() should approve and un-approve a number of
+    projects at once, update the status of each project, and ignore
+    project milestones that are already in the requested state."""
+
+    from pjtk2.models import Project, ProjectMilestones
+    from pjtk2.utils.helpers import approve_projects
+
+    MilestoneFactory.create(label="Approved", category="Core", order=1)
+
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111", owner=user)
+    project2 = ProjectFactory.create(prj_cd="LHA_IA12_222", owner=user)
+    project3 = ProjectFactory.create(prj_cd="LHA_IA12_333", owner=user)
+    project3.approve()
+
+    def get_id(project):
+        return ProjectMilestones.objects.get(
+            project=project, milestone__label="Approved"
+        ).id
+
+    changed = approve_projects(
+        approved=[get_id(project1), get_id(project2)], unapproved=[get_id(project3)]
+    )
+    assert len(changed) == 3
+
+    project1 = Project.objects.get(pk=project1.pk)
+    project3 = Project.objects.get(pk=project3.pk)
+    assert project1.is_approved() is True
+    assert project1.status == "ongoing"
+    assert project3.is_approved() is False
+    assert project3.status == "submitted"
+
+    # nothing to do if we try to approve them again
+    changed = approve_projects(approved=[get_id(project1)], unapproved=[])
+    assert changed == []
@@ -0,0 +1,68 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/test_benchmark_spatial_queries.py
+ Created: 18 Oct 2026 16:48:13
+
+ DESCRIPTION:
+
+  The benchmark_spatial_queries command runs the roi queries with
+  EXPLAIN ANALYZE and reports the timing and scans of each one.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from pjtk2.management.commands.benchmark_spatial_queries import (
+    describe_node,
+    plan_nodes,
+)
+from pjtk2.tests.factories import SamplePointFactory
+
+
+def test_plan_nodes():
+    """every node in the plan tree should be returned and the scan nodes
+    described with their table and index."""
+
+    plan = {
+        "Node Type": "Bitmap Heap Scan",
+        "Relation Name": "pjtk2_samplepoint",
+        "Plans": [
+            {
+                "Node Type": "Bitmap Index Scan",
+                "Index Name": "pjtk2_samplepoint_geom_id",
+            }
+        ],
+    }
+    nodes = [describe_node(x) for x in plan_nodes(plan)]
+    assert nodes == [
+        "Bitmap Heap Scan on pjtk2_samplepoint",
+        "Bitmap Index Scan using pjtk2_samplepoint_geom_id",
+    ]
+
+
+@pytest.mark.django_db
+def test_benchmark_spatial_queries():
+    """The command should report the timing of each query."""
+
+    SamplePointFactory.create()
+    out = StringIO()
+    call_command("benchmark_spatial_queries", "--repeat=1", stdout=out)
+    output = out.getvalue()
+    assert "points in roi:" in output
+    assert "classify roi projects:" in output
+    assert " ms " in output
+
+
+@pytest.mark.django_db
+def test_benchmark_spatial_queries_bad_roi():
+    """A roi that isn't a polygon should raise an error."""
+
+    with pytest.raises(CommandError):
+        call_command("benchmark_spatial_queries", roi="POINT(-82 44)")
@@ -0,0 +1,150 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/test_facets.py
+ Created: 18 Oct 2026 12:08:51
+
+ DESCRIPTION:
+
+  pjtk2.utils.facets calculates the number of projects in each lake,
+  project type, scope and protocol (and the total number of projects)
+  for the project search page in a single query and caches them by the
+  normalized query string.
+
+ A. Cottrill
+=============================================================
+
+"""
+import pytest
+
+from django.http import QueryDict
+
+from pjtk2.models import Project
+from pjtk2.filters import ProjectFilter
+from pjtk2.utils.facets import (
+    calculate_project_facets,
+    get_project_facets,
+    normalize_query,
+)
+from .factories import ProjectFactory, LakeFactory, ProjProtocolFactory, ProjTypeFactory
+
+
+@pytest.fixture()
+def projects(db):
+    """three projects in different lakes with two different project
+    types and protocols."""
+
+    projtype1 = ProjTypeFactory(
+        project_type="Recreataional Fishery Monitoring", scope="FD"
+    )
+    projtype2 = ProjTypeFactory(project_type="Independent Assessment", scope="FI")
+
+    protocol1 = ProjProtocolFactory(
+        protocol="Broad Scale Monitoring", abbrev="BSM", project_type=projtype1
+    )
+    protocol2 = ProjProtocolFactory(
+        protocol="Roving Sport Creel", abbrev="RSC", project_type=projtype2
+    )
+
+    lake1 = LakeFactory(abbrev="SU", lake_name="Lake Superior")
+    lake2 = LakeFactory(abbrev="HU", lake_name="Lake Huron")
+    lake3 = LakeFactory(abbrev="ER", lake_name="Lake Erie")
+
+    project1 = ProjectFactory.create(
+        prj_cd="LSA_IA10_111",
+        protocol=protocol1,
+        lake=lake1,
+        year=2010,
+        project_type=projtype1,
+    )
+
+    project2 = ProjectFactory.create(
+        prj_cd="LHA_SC14_111",
+        protocol=protocol2,
+        lake=lake2,
+        year=2014,
+        project_type=projtype2,
+    )
+
+    project3 = ProjectFactory.create(
+        prj_cd="LEU_IA18_111",
+        protocol=protocol1,
+        lake=lake3,
+        year=2018,
+        project_type=projtype1,
+    )
+
+    return [project1, project2, project3]
+
+
+@pytest.fixture()
+def locmem_cache(settings):
+    """use a real cache for the tests that need one."""
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test_facets",
+        }
+    }
+
+
+def test_normalize_query():
+    """The page number and empty parameters should be dropped and the
+    remaining parameters sorted so that the same search always has the
+    same key."""
+
+    query = QueryDict("page=2&year=2010&lake=SU&prj_cd=&lake=HU")
+    assert normalize_query(query) == "lake=HU&lake=SU&year=2010"
+
+    query = QueryDict("lake=SU&lake=HU&year=2010")
+    assert normalize_query(query) == "lake=HU&lake=SU&year=2010"
+
+
+@pytest.mark.django_db
+def test_project_facets(projects, django_assert_num_queries):
+    """All of the facets and the total should be calculated from the
+    filtered queryset in a single query."""
+
+    queryset = ProjectFilter({"first_year": 2014}, Project.objects.all()).qs
+
+    with django_assert_num_queries(1):
+        facets = calculate_project_facets(queryset)
+
+    assert facets["project_count"] == 2
+
+    lakes = [(x["lakeAbbrev"], x["lakeName"], x["N"]) for x in facets["lakes"]]
+    assert lakes == [("HU", "Lake Huron", 1), ("ER", "Lake Erie", 1)]
+
+    project_types = {x["projType"]: x["N"] for x in facets["project_types"]}
+    assert project_types == {
+        "Recreataional Fishery Monitoring": 1,
+        "Independent Assessment": 1,
+    }
+
+    scope = {x["projScope"]: x["N"] for x in facets["project_scope"]}
+    assert scope == {"FD": 1, "FI": 1}
+
+    protocols = {x["protocolAbbrev"]: x["N"] for x in facets["protocols"]}
+    assert protocols == {"BSM": 1, "RSC": 1}
+
+
+@pytest.mark.django_db
+def test_project_facets_cached(projects, locmem_cache, django_assert_num_queries):
+    """The facets of each search should be cached and the cached facets
+    should be discarded when a project is changed."""
+
+    queryset = ProjectFilter({"scope": "FD"}, Project.objects.all()).qs
+    query = QueryDict("scope=FD&page=3")
+
+    facets = get_project_facets(queryset, query)
+    assert facets["project_count"] == 2
+
+    with django_assert_num_queries(0):
+        facets = get_project_facets(queryset, QueryDict("scope=FD"))
+    assert facets["project_count"] == 2
+
+    project = projects[1]
+    project.project_type = projects[0].project_type
+    project.save()
+
+    queryset = ProjectFilter({"scope": "FD"}, Project.objects.all()).qs
+    facets = get_project_facets(queryset, query)
+    assert facets["project_count"] == 3
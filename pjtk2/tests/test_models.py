@@ -4,7 +4,7 @@ import sys
 import pytest
 import pytz
 from django.db.models.signals import post_save, pre_save
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from pjtk2.models import (
     Bookmark,
     Family,
@@ -27,7 +27,8 @@ from pjtk2.tests.factories import (
     UserFactory,
 )
 
-from ..utils.helpers import get_minions, get_supervisors
+from ..utils.helpers import get_minions, get_supervisors, update_milestones
+from ..utils.hierarchy import clear_hierarchy_cache, get_subordinate_ids
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -584,6 +585,125 @@ def test_milestone_status_dict_custom_reports_both_done():
     assert tmp["status"] == "required-done"
 
 
+@pytest.mark.django_db
+def test_milestone_flags_kept_current():
+    """The milestone flags stored on the project should be updated when
+    project milestones are saved, updated in bulk or deleted - even if
+    the project milestones are retrieved separately from the project.
+    A project instance retrieved earlier should reflect the changes
+    without being refreshed.
+    """
+
+    milestone = MilestoneFactory.create(
+        label="Approved", label_abbrev="approved", category="Core", order=1
+    )
+
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111")
+    assert project1.milestone_flags == {"Approved": Project.MILESTONE_REQUIRED}
+    assert project1.is_approved() is False
+
+    # a single project milestone saved behind our back
+    pms = ProjectMilestones.objects.get(project=project1, milestone=milestone)
+    pms.completed = datetime.datetime.now(pytz.utc)
+    pms.save()
+    assert project1.is_approved() is True
+
+    # bulk update - not required, not done
+    ProjectMilestones.objects.filter(project=project1).update(
+        required=False, completed=None
+    )
+    assert Project.objects.get(pk=project1.pk).milestone_flags == {"Approved": 0}
+    assert project1.milestone_complete(milestone) is None
+
+    # saving a stale project instance should not clobber the flags
+    stale = Project.objects.get(pk=project1.pk)
+    ProjectMilestones.objects.filter(project=project1).update(required=True)
+    stale.save()
+    flags = Project.objects.get(pk=project1.pk).milestone_flags
+    assert flags == {"Approved": Project.MILESTONE_REQUIRED}
+    assert stale.milestone_complete(milestone) is False
+
+    # deleted milestones are removed from the flags too
+    ProjectMilestones.objects.filter(project=project1).delete()
+    assert Project.objects.get(pk=project1.pk).milestone_flags == {}
+    assert project1.is_approved() is False
+
+
+@pytest.mark.django_db
+def test_project_status_kept_current():
+    """_get_status() should reflect project milestones that were
+    completed through another instance of the project."""
+
+    MilestoneFactory.create(label="Approved", category="Core", order=1)
+    MilestoneFactory.create(label="Sign off", category="Core", order=2)
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111")
+    assert project1._get_status() == "Submitted"
+
+    Project.objects.get(pk=project1.pk).approve()
+    assert project1._get_status() == "Ongoing"
+
+    ProjectMilestones.objects.filter(
+        project=project1, milestone__label="Sign off"
+    ).update(completed=datetime.datetime.now(pytz.utc))
+    assert project1._get_status() == "Complete"
+
+
+@pytest.mark.django_db
+def test_milestone_status_dict_skips_submitted():
+    """The status of the Submitted milestone is not reported - it is
+    completed when every project is created."""
+
+    submitted = MilestoneFactory.create(
+        label="Submitted", label_abbrev="submitted", category="Core", order=0
+    )
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111")
+    status_dict = project1.get_milestone_status_dict(core_milestones=[submitted])
+    assert status_dict["submitted"]["status"] is None
+
+
+@pytest.mark.django_db
+def test_update_milestones():
+    """update_milestones() should complete the project milestones that
+    were checked, clear the ones that were unchecked, leave the others
+    alone, and return the ones that changed."""
+
+    field_work = MilestoneFactory.create(
+        label="Field Work Complete", category="Core", order=1, report=False
+    )
+    aging = MilestoneFactory.create(
+        label="Aging Complete", category="Core", order=2, report=False
+    )
+    data_scrubbed = MilestoneFactory.create(
+        label="Data Scrubbed", category="Core", order=3, report=False
+    )
+
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111")
+    timestamp = datetime.datetime(2012, 6, 1, tzinfo=pytz.utc)
+    ProjectMilestones.objects.filter(project=project1, milestone=aging).update(
+        completed=timestamp
+    )
+    ProjectMilestones.objects.filter(project=project1, milestone=data_scrubbed).update(
+        completed=timestamp
+    )
+
+    def get_pms(milestone):
+        return ProjectMilestones.objects.get(project=project1, milestone=milestone)
+
+    # field work is now done, aging is not, data scrubbed is unchanged.
+    form_ms = [str(get_pms(field_work).id), str(get_pms(data_scrubbed).id)]
+    changed = update_milestones(form_ms, project1.get_milestones())
+
+    assert set([x.milestone.label for x in changed]) == set(
+        ["Field Work Complete", "Aging Complete"]
+    )
+    assert get_pms(field_work).completed is not None
+    assert get_pms(aging).completed is None
+    assert get_pms(data_scrubbed).completed == timestamp
+
+    # nothing has changed this time
+    assert update_milestones(form_ms, project1.get_milestones()) == []
+
+
 # @pytest.mark.django_db
 # def test_project_total_cost():
 #    """the total_cost() method should return the sum of salary and odoe
@@ -1443,6 +1563,40 @@ class TestEmployeeFunctions(TestCase):
 
         self.assertListEqual(minions, shouldbe)
 
+    def test_hierarchy_queries(self):
+        """get_minions and get_supervisors should each resolve the
+        hierarchy in one query and retrieve the employees in another,
+        regardless of how deep the hierarchy is."""
+
+        with self.assertNumQueries(2):
+            minions = get_minions(self.employee1)
+            self.assertEqual(len(minions), 6)
+
+        with self.assertNumQueries(2):
+            bosses = get_supervisors(self.employee6)
+            self.assertEqual([str(x) for x in bosses][-1], "jseinfield")
+
+    @override_settings(EMPLOYEE_HIERARCHY_CACHE=True)
+    def test_hierarchy_cache_cleared_when_supervisor_changes(self):
+        """If the hierarchy cache is enabled, it should be cleared when
+        an employee is assigned a new supervisor."""
+
+        clear_hierarchy_cache()
+        self.assertEqual(get_subordinate_ids(self.employee2.id), [self.employee2.id])
+        # cached
+        with self.assertNumQueries(0):
+            get_subordinate_ids(self.employee2.id)
+
+        # Newman now reports to George
+        self.employee6.supervisor = self.employee2
+        self.employee6.save()
+
+        self.assertEqual(
+            get_subordinate_ids(self.employee2.id),
+            [self.employee2.id, self.employee6.id],
+        )
+        clear_hierarchy_cache()
+
     def tearDown(self):
 
         self.employee1.delete()
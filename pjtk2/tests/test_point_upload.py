@@ -0,0 +1,131 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/test_point_upload.py
+ Created: 18 Oct 2026 17:21:05
+
+ DESCRIPTION:
+
+  pjtk2.utils.point_upload copies uploaded points into a staging
+  table, checks them against the lake, replaces or appends them to the
+  project's sample points and rebuilds the project multipoints and
+  polygon - all in one transaction and without saving the project.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+import pytest
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.db.models.signals import post_save
+
+from pjtk2.models import Project, ProjectMultiPoints, ProjectPolygon, SamplePoint
+from pjtk2.utils.point_upload import PointUploadError, upload_sample_points
+from pjtk2.tests.factories import LakeFactory, ProjectFactory, SamplePointFactory
+
+
+@pytest.fixture()
+def project(db):
+    """a project in a lake with a simple rectangular geometry and two
+    existing sample points."""
+
+    geom = GEOSGeometry(
+        "MULTIPOLYGON(((-83 44, -84 44, -84 45, -83 45, -83 44)))", srid=4326
+    )
+    lake = LakeFactory(lake_name="Lake Huron", abbrev="HU", geom=geom)
+    project = ProjectFactory.create(prj_cd="LHA_IA12_111", lake=lake)
+
+    for label, pt in [("A", "POINT(-83.04 44.04)"), ("B", "POINT(-83.44 44.44)")]:
+        SamplePointFactory(project=project, label=label, geom=GEOSGeometry(pt))
+    project.update_multipoints()
+    return project
+
+
+POINTS = [("1", 44.608, -83.580), ("10", 44.718, -83.636), ("11", 44.692, -83.629)]
+
+
+@pytest.mark.django_db
+def test_upload_sample_points_append(project):
+    """Appended points should be added to the existing ones, and the
+    multipoint and polygon should include all of them."""
+
+    count = upload_sample_points(project, POINTS)
+    assert count == 3
+
+    labels = SamplePoint.objects.filter(project=project).values_list("label", flat=True)
+    assert set(labels) == {"A", "B", "1", "10", "11"}
+
+    multipoints = ProjectMultiPoints.objects.get(project=project)
+    assert len(multipoints.geom) == 5
+    polygon = ProjectPolygon.objects.get(project=project)
+    assert polygon.geom.contains(GEOSGeometry("POINT(-83.6 44.65)", srid=4326))
+
+
+@pytest.mark.django_db
+def test_upload_sample_points_replace(project):
+    """Replaced points should be the only points of the project and a
+    project with fewer than three points shouldn't have a polygon."""
+
+    upload_sample_points(project, POINTS, replace=True)
+    labels = SamplePoint.objects.filter(project=project).values_list("label", flat=True)
+    assert set(labels) == {"1", "10", "11"}
+    assert ProjectPolygon.objects.filter(project=project).exists()
+
+    upload_sample_points(project, POINTS[:2], replace=True)
+    assert SamplePoint.objects.filter(project=project).count() == 2
+    assert len(ProjectMultiPoints.objects.get(project=project).geom) == 2
+    assert not ProjectPolygon.objects.filter(project=project).exists()
+
+
+@pytest.mark.django_db
+def test_upload_sample_points_outside_lake(project):
+    """If any of the points are outside the lake, an error with their
+    row numbers should be raised and nothing should be saved."""
+
+    points = POINTS + [("12", 41.0, -83.6)]
+    with pytest.raises(PointUploadError) as excinfo:
+        upload_sample_points(project, points, replace=True)
+    assert excinfo.value.row_numbers == [3]
+
+    labels = SamplePoint.objects.filter(project=project).values_list("label", flat=True)
+    assert set(labels) == {"A", "B"}
+
+
+@pytest.mark.django_db
+def test_upload_sample_points_outside_lake_polygon(project):
+    """Points inside the extent of the lake but outside of the lake
+    polygon itself should be rejected too."""
+
+    lake = project.lake
+    lake.geom = GEOSGeometry(
+        "MULTIPOLYGON(((-84 44, -83 44, -83 44.5, -83.5 44.5, -83.5 45, -84 45, "
+        "-84 44)))",
+        srid=4326,
+    )
+    lake.save()
+
+    points = [("1", 44.2, -83.2), ("2", 44.8, -83.2), ("3", 44.8, -83.8)]
+    with pytest.raises(PointUploadError) as excinfo:
+        upload_sample_points(project, points)
+    assert excinfo.value.row_numbers == [1]
+
+
+@pytest.mark.django_db
+def test_upload_sample_points_does_not_save_project(project):
+    """The project shouldn't be saved, but the cached fragments of its
+    detail page should be invalidated."""
+
+    cache_version = Project.objects.get(pk=project.pk).cache_version
+    saved = []
+
+    def receiver(sender, instance, **kwargs):
+        saved.append(instance)
+
+    post_save.connect(receiver, sender=Project)
+    try:
+        upload_sample_points(project, POINTS)
+    finally:
+        post_save.disconnect(receiver, sender=Project)
+
+    assert saved == []
+    assert Project.objects.get(pk=project.pk).cache_version == cache_version + 1
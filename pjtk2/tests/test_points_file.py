@@ -0,0 +1,150 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/test_points_file.py
+ Created: 18 Oct 2026 17:58:40
+
+ DESCRIPTION:
+
+  pjtk2.utils.points_file parses the rows of an uploaded points file
+  in chunks into labels and arrays of coordinates, records the rows
+  with missing labels or bad coordinates, and checks the points
+  against the extent of the lake all at once.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+from io import BytesIO
+
+import pytest
+
+from openpyxl import Workbook
+
+from pjtk2.utils.points_file import (
+    PointsFileError,
+    outside_extent,
+    parse_points,
+    read_csv_rows,
+    read_xlsx_rows,
+)
+
+
+HEADER = ["POINT_LABEL", "DD_LAT", "DD_LON"]
+
+ROWS = [
+    HEADER,
+    ["1", "44.608", "-83.580"],
+    ["10", "44.718", "-83.636"],
+    ["11", "44.692", "-83.629"],
+]
+
+
+def numbered(rows):
+    """the rows numbered the way read_rows() numbers them."""
+    return list(enumerate(rows, 1))
+
+
+def test_parse_points():
+    """The labels and coordinates should be returned in the order they
+    appear in the file, with the file row number of each point."""
+
+    points = parse_points(numbered(ROWS), chunk_size=2)
+    assert len(points) == 3
+    assert list(points) == [
+        ("1", 44.608, -83.58),
+        ("10", 44.718, -83.636),
+        ("11", 44.692, -83.629),
+    ]
+    assert points.row_numbers.tolist() == [2, 3, 4]
+    assert points.errors == {}
+
+
+def test_parse_points_errors_include_rows():
+    """Missing labels and bad coordinates should be reported with the
+    rows of the file they occur in."""
+
+    rows = ROWS + [["", "44.1", "-83.1"], ["13", "FOO", "-83.1"], ["14", "44.1"]]
+    points = parse_points(numbered(rows), chunk_size=2)
+    assert points.errors == {
+        "At least one point is missing a label.": [5],
+        "At least one point has an invalid latitude or longitude.": [6, 7],
+    }
+    assert points.error_messages() == [
+        "At least one point is missing a label. Row: 5.",
+        "At least one point has an invalid latitude or longitude. Rows: 6, 7.",
+    ]
+
+
+def test_parse_points_bad_header():
+    """A file without the expected header should raise an error."""
+
+    with pytest.raises(PointsFileError) as excinfo:
+        parse_points(numbered(ROWS[1:]))
+    assert str(excinfo.value).startswith("Malformed header in submitted file.")
+
+
+def test_parse_points_no_data():
+    """A file with only a header should raise an error."""
+
+    with pytest.raises(PointsFileError) as excinfo:
+        parse_points(numbered([HEADER]))
+    assert str(excinfo.value) == "Points_File does not appear to contain any data!"
+
+
+def test_parse_points_max_points():
+    """Files with more than max_points points should raise an error."""
+
+    rows = [HEADER] + [["1", "44.6", "-83.5"]] * 101
+    assert len(parse_points(numbered(rows), max_points=101, chunk_size=25)) == 101
+    with pytest.raises(PointsFileError) as excinfo:
+        parse_points(numbered(rows), max_points=100, chunk_size=25)
+    assert "more than 100 points!" in str(excinfo.value)
+
+
+def test_outside_extent():
+    """Points on or outside the edge of the extent should be flagged,
+    points with invalid coordinates should not."""
+
+    rows = ROWS + [["12", "41.0", "-83.5"], ["13", "44.5", "-83.0"], ["14", "", ""]]
+    points = parse_points(numbered(rows))
+    outside = outside_extent(points, (-84.0, 44.0, -83.0, 45.0))
+    assert points.row_numbers[outside].tolist() == [5, 6]
+
+
+def test_read_csv_rows():
+    """Empty rows, quotes and the byte order mark should be removed, and
+    the rows numbered as they appear in the file."""
+
+    data = '\ufeffPOINT_LABEL,DD_LAT,DD_LON\r\n\r\n"""1""",44.608,-83.580\r\n'
+    rows = list(read_csv_rows(BytesIO(data.encode("utf-8"))))
+    assert rows == [(1, HEADER), (3, ["1", "44.608", "-83.580"])]
+
+
+def test_parse_points_blank_rows():
+    """The errors in a file with blank rows should be reported with the
+    rows of the file they occur in."""
+
+    data = "POINT_LABEL,DD_LAT,DD_LON\n\n1,44.608,-83.580\n\n\n2,FOO,-83.580\n"
+    points = parse_points(read_csv_rows(BytesIO(data.encode("utf-8"))))
+    assert points.row_numbers.tolist() == [3, 6]
+    assert points.error_messages() == [
+        "At least one point has an invalid latitude or longitude. Row: 6."
+    ]
+
+
+def test_read_xlsx_rows():
+    """The non-empty rows of the first worksheet should be returned as
+    lists, numbered as they appear in the sheet."""
+
+    wb = Workbook()
+    wb.active.append(ROWS[0])
+    wb.active.append([None, None, None])
+    for row in ROWS[1:]:
+        wb.active.append(row)
+    wb.active.append([None, None, None])
+    xlsx_file = BytesIO()
+    wb.save(xlsx_file)
+    xlsx_file.seek(0)
+
+    expected = [(1, ROWS[0])] + [(i + 3, row) for i, row in enumerate(ROWS[1:])]
+    assert list(read_xlsx_rows(xlsx_file)) == expected
@@ -0,0 +1,95 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/test_rebuild_project_geometries.py
+ Created: 18 Oct 2026 18:34:02
+
+ DESCRIPTION:
+
+  The rebuild_project_geometries command rebuilds the multipoints and
+  convex hulls of all (or some) of the projects from their sample
+  points in chunked, set based transactions.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+from io import StringIO
+
+import pytest
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.management import call_command
+
+from pjtk2.models import ProjectMultiPoints, ProjectPolygon
+from pjtk2.tests.factories import LakeFactory, ProjectFactory, SamplePointFactory
+
+
+POINTS = ["POINT(-83.04 44.04)", "POINT(-83.44 44.44)", "POINT(-83.74 44.04)"]
+
+
+@pytest.fixture()
+def projects(db):
+    """Three projects - two in Lake Huron with sample points but without
+    derived geometries, and one in Lake Erie with a stale multipoint
+    and polygon but no sample points."""
+
+    huron = LakeFactory(lake_name="Lake Huron", abbrev="HU")
+    erie = LakeFactory(lake_name="Lake Erie", abbrev="ER")
+
+    project1 = ProjectFactory.create(prj_cd="LHA_IA12_111", lake=huron)
+    project2 = ProjectFactory.create(prj_cd="LHA_IA12_222", lake=huron)
+    project3 = ProjectFactory.create(prj_cd="LEA_IA12_333", lake=erie)
+
+    for project, points in [(project1, POINTS), (project2, POINTS[:2])]:
+        for i, pt in enumerate(points):
+            SamplePointFactory(project=project, label=str(i), geom=GEOSGeometry(pt))
+
+    for pt in POINTS:
+        SamplePointFactory(project=project3, geom=GEOSGeometry(pt))
+    project3.update_multipoints()
+    project3.update_convex_hull()
+    project3.samplepoint_set.all().delete()
+
+    ProjectMultiPoints.objects.filter(project__in=[project1, project2]).delete()
+    ProjectPolygon.objects.filter(project__in=[project1, project2]).delete()
+
+    return project1, project2, project3
+
+
+@pytest.mark.django_db
+def test_rebuild_project_geometries(projects):
+    """Every project should have a multipoint of its points, a polygon if
+    its points form one, and neither if it doesn't have any points."""
+
+    project1, project2, project3 = projects
+
+    out = StringIO()
+    call_command("rebuild_project_geometries", "--chunk-size=2", stdout=out)
+    output = out.getvalue()
+    assert "Rebuilt 2 of 3 projects" in output
+    assert "Done. 3 projects rebuilt." in output
+
+    assert len(ProjectMultiPoints.objects.get(project=project1).geom) == 3
+    assert len(ProjectMultiPoints.objects.get(project=project2).geom) == 2
+    assert not ProjectMultiPoints.objects.filter(project=project3).exists()
+
+    assert ProjectPolygon.objects.filter(project=project1).exists()
+    assert not ProjectPolygon.objects.filter(project=project2).exists()
+    assert not ProjectPolygon.objects.filter(project=project3).exists()
+
+
+@pytest.mark.django_db
+def test_rebuild_project_geometries_filters(projects):
+    """Only the selected projects should be rebuilt."""
+
+    project1, project2, project3 = projects
+
+    out = StringIO()
+    call_command("rebuild_project_geometries", "--lake", "ER", stdout=out)
+    assert "Done. 1 projects rebuilt." in out.getvalue()
+    assert not ProjectMultiPoints.objects.filter(project=project3).exists()
+    assert not ProjectMultiPoints.objects.filter(project=project1).exists()
+
+    call_command("rebuild_project_geometries", "--project", "LHA_IA12_111", stdout=out)
+    assert ProjectMultiPoints.objects.filter(project=project1).exists()
+    assert not ProjectMultiPoints.objects.filter(project=project2).exists()
@@ -0,0 +1,99 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/test_roi.py
+ Created: 18 Oct 2026 16:02:25
+
+ DESCRIPTION:
+
+  pjtk2.utils.roi validates and normalizes the regions of interest
+  drawn on the project maps - rings are converted to polygons, invalid
+  polygons are repaired, polygons with lots of vertices are simplified
+  and the coordinates are rounded so the same region always produces
+  the same cache key.
+
+ A. Cottrill
+=============================================================
+
+"""
+
+import math
+
+import pytest
+
+from django.contrib.gis.geos import GEOSGeometry, Polygon
+
+from pjtk2.utils.roi import InvalidROI, normalize_roi, roi_key
+
+
+ROI_WKT = (
+    "POLYGON((-82.000000033378 43.9999999705306,"
+    + "-82.0833359084557 43.9999999705305,"
+    + "-82.0833359084557 44.0833320331081,"
+    + "-82.000000033378 44.0833320331082,"
+    + "-82.000000033378 43.9999999705306))"
+)
+
+
+def test_normalize_roi_polygon():
+    """A polygon should be returned with srid=4326, rounded coordinates
+    and the same key regardless of how it was submitted."""
+
+    roi = normalize_roi(ROI_WKT)
+    assert roi.geom_type == "Polygon"
+    assert roi.srid == 4326
+    assert roi.coords[0][0] == (-82.0, 44.0)
+
+    geom = GEOSGeometry(ROI_WKT, srid=4326)
+    assert roi_key(normalize_roi(geom)) == roi_key(roi)
+    assert roi_key(normalize_roi(roi.ewkt)) == roi_key(roi)
+
+
+def test_normalize_roi_linear_ring():
+    """A closed linear ring should be converted to a polygon."""
+
+    roi = normalize_roi("LINEARRING(-82 44, -82.1 44, -82.1 44.1, -82 44)")
+    assert roi.geom_type == "Polygon"
+
+
+def test_normalize_roi_repairs_bow_tie():
+    """A self-intersecting polygon should be repaired."""
+
+    roi = normalize_roi("POLYGON((-82 44, -81 45, -81 44, -82 45, -82 44))")
+    assert roi.valid
+    assert roi.geom_type in ("Polygon", "MultiPolygon")
+
+
+def test_normalize_roi_simplifies_large_polygons(settings):
+    """Polygons with more than ROI_SIMPLIFY_MIN_COORDS vertices should be
+    simplified, smaller polygons are not."""
+
+    settings.ROI_SIMPLIFY_TOLERANCE = 0.001
+    settings.ROI_SIMPLIFY_MIN_COORDS = 100
+
+    # a circle with a radius of 0.1 degrees and 1000 vertices
+    angles = [x * math.pi / 500 for x in range(1000)]
+    coords = [(-82 + 0.1 * math.cos(x), 44 + 0.1 * math.sin(x)) for x in angles]
+    coords.append(coords[0])
+    circle = Polygon(coords, srid=4326)
+
+    roi = normalize_roi(circle)
+    assert roi.num_coords < 100
+    assert roi.area == pytest.approx(circle.area, rel=0.05)
+
+    square = normalize_roi(ROI_WKT)
+    assert square.num_coords == 5
+
+
+@pytest.mark.parametrize(
+    "roi,errmsg",
+    [
+        ("some random string", "roi could not be converted to a valid GEOS geometry."),
+        ("POINT(-82.0249 44.0171)", "roi is not a valid polygon."),
+        ("LINESTRING(-83.08 43.99, -83.08 44.08)", "roi is not a valid polygon."),
+    ],
+)
+def test_normalize_roi_invalid(roi, errmsg):
+    """Rois that aren't polygons should raise an InvalidROI error."""
+
+    with pytest.raises(InvalidROI) as excinfo:
+        normalize_roi(roi)
+    assert str(excinfo.value) == errmsg
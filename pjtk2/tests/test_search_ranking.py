@@ -0,0 +1,109 @@
+"""=============================================================
+ ~/pjtk2/pjtk2/tests/test_search_ranking.py
+ Created: 18 Oct 2026 12:52:16
+
+ DESCRIPTION:
+
+  pjtk2.utils.search contains the functions used by the project search
+  page to find projects that match the search terms, order them by
+  relevance and highlight the matched words in their abstracts.  The
+  project name and code are weighted more heavily than the abstract,
+  which is weighted more heavily than the comment.
+
+ A. Cottrill
+=============================================================
+
+"""
+import pytest
+
+from pjtk2.models import Project
+from pjtk2.utils.search import (
+    add_search_snippets,
+    build_search_query,
+    format_snippet,
+    rank_projects,
+)
+from .factories import ProjectFactory
+
+
+@pytest.fixture()
+def projects(db):
+    """three projects that mention lake trout in their comment,
+    abstract and name respectively."""
+
+    project1 = ProjectFactory.create(
+        prj_cd="LHA_IA12_111",
+        prj_nm="Parry Sound Index",
+        abstract="An index netting project.",
+        comment="Lake trout were caught.",
+    )
+    project2 = ProjectFactory.create(
+        prj_cd="LHA_IA12_222",
+        prj_nm="Nearshore Index",
+        abstract="An assessment of lake trout and lake whitefish.",
+    )
+    project3 = ProjectFactory.create(
+        prj_cd="LHA_IA12_333",
+        prj_nm="Lake Trout Assessment",
+        abstract="Another index netting project.",
+    )
+    return [project1, project2, project3]
+
+
+def test_build_search_query():
+    """every word should be required and matched as a prefix.  Anything
+    other than letters and digits is dropped."""
+
+    query = build_search_query("Lake  tro")
+    assert query.value == "lake:* & tro:*"
+    assert query.search_type == "raw"
+
+    query = build_search_query("LHA_IA12 & !(foo)")
+    assert query.value == "lha:* & ia12:* & foo:*"
+
+    assert build_search_query("  &! ") is None
+    assert build_search_query(None) is None
+
+
+def test_format_snippet():
+    """the snippet should be escaped before the matched words are
+    highlighted."""
+
+    snippet = format_snippet("<b>lake</b> [[hl]]trout[[/hl]]")
+    assert snippet == "&lt;b&gt;lake&lt;/b&gt; <mark>trout</mark>"
+
+
+@pytest.mark.django_db
+def test_rank_projects(projects):
+    """matches in the project name should rank ahead of matches in the
+    abstract, which should rank ahead of matches in the comment."""
+
+    ranked = rank_projects(Project.objects.all(), "lake trout")
+    assert [x.prj_cd for x in ranked] == [
+        "LHA_IA12_333",
+        "LHA_IA12_222",
+        "LHA_IA12_111",
+    ]
+
+
+@pytest.mark.django_db
+def test_rank_projects_prefix(projects):
+    """partial words should match the start of longer words."""
+
+    ranked = rank_projects(Project.objects.all(), "whitef")
+    assert [x.prj_cd for x in ranked] == ["LHA_IA12_222"]
+
+    ranked = rank_projects(Project.objects.all(), "LHA_IA12_3")
+    assert [x.prj_cd for x in ranked] == ["LHA_IA12_333"]
+
+
+@pytest.mark.django_db
+def test_add_search_snippets(projects, django_assert_num_queries):
+    """The snippets of all of the projects should be created in one
+    query and the matched words should be highlighted."""
+
+    ranked = list(rank_projects(Project.objects.all(), "whitefish"))
+    with django_assert_num_queries(1):
+        ranked = add_search_snippets(ranked, "whitefish")
+
+    assert "<mark>whitefish</mark>" in ranked[0].snippet
@@ -267,3 +267,18 @@ def test_find_project_roi_filter_first_last_year(roi, four_projects):
     projects = find_roi_projects(roi, first_year=1995, last_year=2000)
     prj_cds = [x.prj_cd for x in projects["contained"]]
     assert sorted(prj_cds) == sorted(["LHA_CF95_555", "LHA_IA00_002"])
+
+
+@pytest.mark.django_db
+def test_find_project_roi_single_query(
+    roi, project_some_in, project_all_in, project_disjoint, django_assert_num_queries
+):
+    """The contained and overlapping projects should be found with a
+    single query - the projects are classified in python, not by a
+    second spatial query."""
+
+    with django_assert_num_queries(1):
+        projects = find_roi_projects(roi)
+        assert projects["contained"] == [project_all_in]
+        assert projects["overlapping"] == [project_some_in]
+        assert projects["contained"][0].project_type.project_type
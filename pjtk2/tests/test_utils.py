@@ -1,6 +1,13 @@
+import datetime
+from collections import namedtuple
+
 import pytest
 
-from ..utils.helpers import strip_carriage_returns, make_possessive
+from ..utils.helpers import (
+    strip_carriage_returns,
+    make_possessive,
+    make_proj_ms_matrix,
+)
 
 
 def test_strip_carriage_returns():
@@ -41,3 +48,104 @@ def test_make_posssive():
     """
     assert make_possessive("Bob") == "Bob's"
     assert make_possessive("Chris") == "Chris'"
+
+
+def make_proj_ms_row(prj_cd, label, report=False, required=True, completed=None,
+                     cancelled=False):
+    """A little helper to build the dictionaries returned by
+    get_proj_ms_matrix()."""
+
+    return {
+        "prj_cd": prj_cd,
+        "prj_nm": "Project {}".format(prj_cd),
+        "year": "20" + prj_cd[6:8],
+        "slug": prj_cd.lower(),
+        "cancelled": cancelled,
+        "prj_ldr__first_name": "Homer",
+        "prj_ldr__last_name": "Simpson",
+        "prj_ldr__username": "hsimpson",
+        "project_type__project_type": "Offshore Index",
+        "projectmilestones__milestone__report": report,
+        "projectmilestones__milestone__label": label,
+        "projectmilestones__required": required,
+        "projectmilestones__completed": completed,
+    }
+
+
+def test_make_proj_ms_matrix():
+    """make_proj_ms_matrix() should sort each project into the
+    appropriate bucket based on its approved and sign off milestones and
+    the status of the remaining milestones should be reported for every
+    project, including the first milestone row of each project.
+    """
+
+    Milestone = namedtuple("Milestone", "label report")
+    milestones = [Milestone("Field Work", False), Milestone("Protocol", True)]
+    now = datetime.datetime(2020, 1, 1)
+
+    rows = [
+        # submitted
+        make_proj_ms_row("LHA_IA20_111", "Approved"),
+        make_proj_ms_row("LHA_IA20_111", "Field Work", completed=now),
+        make_proj_ms_row("LHA_IA20_111", "Sign off"),
+        # approved
+        make_proj_ms_row("LHA_IA20_222", "Approved", completed=now),
+        make_proj_ms_row("LHA_IA20_222", "Protocol", report=True, required=False),
+        make_proj_ms_row("LHA_IA20_222", "Sign off"),
+        # cancelled, but never approved
+        make_proj_ms_row("LHA_IA20_333", "Approved", cancelled=True),
+        make_proj_ms_row("LHA_IA20_333", "Sign off", cancelled=True),
+        # complete, but too old to be included in the other buckets
+        make_proj_ms_row("LHA_IA08_444", "Approved", completed=now),
+        make_proj_ms_row("LHA_IA08_444", "Sign off", completed=now),
+    ]
+
+    buckets = make_proj_ms_matrix(rows, milestones, 2015, 2005)
+
+    assert list(buckets["submitted"].keys()) == ["LHA_IA20_111", "LHA_IA20_333"]
+    assert list(buckets["approved"].keys()) == ["LHA_IA20_222"]
+    assert list(buckets["cancelled"].keys()) == ["LHA_IA20_333"]
+    assert list(buckets["complete"].keys()) == ["LHA_IA08_444"]
+
+    project = buckets["submitted"]["LHA_IA20_111"]
+    assert project["attrs"]["slug"] == "lha_ia20_111"
+    assert list(project["milestones"].keys()) == ["Field Work", "Protocol", "custom"]
+    assert project["milestones"]["Field Work"] == {
+        "type": "milestone",
+        "status": "required-done",
+    }
+    assert project["milestones"]["Protocol"] == {
+        "type": "report",
+        "status": "notRequired-notDone",
+    }
+
+    project = buckets["approved"]["LHA_IA20_222"]
+    assert project["milestones"]["Field Work"]["status"] == "notRequired-notDone"
+    assert project["milestones"]["Protocol"]["status"] == "notRequired-notDone"
+
+
+def test_make_proj_ms_matrix_cancelled_without_milestones():
+    """A cancelled project should be in the cancelled bucket even if it
+    doesn't have any project milestones (a single row with a milestone
+    label of None from the left join) or milestones other than the
+    ones in the matrix."""
+
+    Milestone = namedtuple("Milestone", "label report")
+    milestones = [Milestone("Field Work", False)]
+
+    rows = [
+        make_proj_ms_row("LHA_IA20_111", None, required=None, cancelled=True),
+        make_proj_ms_row("LHA_IA20_222", "Some Other Milestone", cancelled=True),
+        make_proj_ms_row("LHA_IA20_333", None, required=None),
+    ]
+
+    buckets = make_proj_ms_matrix(rows, milestones, 2015, 2005)
+
+    assert list(buckets["cancelled"].keys()) == ["LHA_IA20_111", "LHA_IA20_222"]
+    assert list(buckets["submitted"].keys()) == []
+    assert list(buckets["approved"].keys()) == []
+    assert list(buckets["complete"].keys()) == []
+
+    project = buckets["cancelled"]["LHA_IA20_222"]
+    assert list(project["milestones"].keys()) == ["Field Work", "custom"]
+    assert project["milestones"]["Field Work"]["status"] == "notRequired-notDone"
@@ -775,6 +775,51 @@ class TestSendMessages(TestCase):
         messages2users = Messages2Users.objects.all()
         self.assertEqual(messages2users.count(), 3)
 
+    def test_send_many_messages(self):
+        """send_messages() should accept a list of (project, milestone,
+        msgtxt) tuples and create all of the messages and their
+        recipients with a constant number of queries.  Duplicate
+        recipients should only receive each message once."""
+
+        milestone2 = MilestoneFactory.create(
+            label="Sign off", category="Core", order=2, report=False
+        )
+        ProjectMilestonesFactory.create(project=self.project1, milestone=milestone2)
+        messages = [
+            (self.project1, self.milestone1, "message 1"),
+            (self.project1, milestone2, "message 2"),
+            (self.project1, self.milestone1, "message 3"),
+        ]
+        send_to = [self.user1, self.user2, self.user2.id, self.user3]
+
+        # one to get project-milestones, one for the messages and one
+        # for the distribution lists
+        with self.assertNumQueries(3):
+            send_messages(messages, send_to)
+
+        self.assertEqual(Message.objects.all().count(), 3)
+        self.assertEqual(Messages2Users.objects.all().count(), 9)
+        self.assertEqual(Messages2Users.objects.filter(user=self.user2).count(), 3)
+
+    def test_send_many_messages_default_recipients(self):
+        """If recipients are not provided, each message should be sent to
+        the recipients returned by build_msg_recipients()."""
+
+        send_messages([(self.project1, self.milestone1, "a fake message.")])
+
+        shouldbe = build_msg_recipients(self.project1)
+        msg4u = Messages2Users.objects.filter(message__msgtxt="a fake message.")
+        self.assertCountEqual([x.user for x in msg4u], shouldbe)
+
+    def test_build_msg_recipient_ids_options(self):
+        """The bulk version of build_msg_recipients() should accept the
+        same level and dba options and return the same users."""
+
+        for kwargs in [{}, {"level": 2}, {"dba": False}, {"level": 2, "dba": False}]:
+            shouldbe = [x.id for x in build_msg_recipients(self.project1, **kwargs)]
+            recipients = build_msg_recipient_ids([self.project1], **kwargs)
+            self.assertCountEqual(recipients[self.project1.id], shouldbe)
+
     def tearDown(self):
         self.project1.delete()
         self.milestone1.delete()
@@ -0,0 +1,152 @@
+"""These tests verify that milestone notifications are added to the
+notification outbox when DEFER_NOTIFICATIONS is True, that repeated
+events are coalesced (without changing their order), and that the process_notifications command
+sends the messages and marks the events as processed.
+
+The tests use transactional databases so that the transaction.on_commit
+callbacks are actually run.
+"""
+
+import pytest
+
+from django.core.management import call_command
+from django.db.models.signals import pre_save
+
+from pjtk2.models import (
+    Message,
+    Messages2Users,
+    Milestone,
+    NotificationEvent,
+    ProjectMilestones,
+    queue_notification,
+    queue_notifications,
+    send_notice_prjms_changed,
+)
+from pjtk2.tests.factories import (
+    EmployeeFactory,
+    MilestoneFactory,
+    ProjectFactory,
+    UserFactory,
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def connect_signals():
+    """make sure to connect the signals before each test - they are needed
+    here"""
+    pre_save.connect(send_notice_prjms_changed, sender=ProjectMilestones)
+
+
+@pytest.fixture
+def project(db):
+    """a project owned by homer, who reports to mr. burns."""
+
+    burns = UserFactory.create(username="mburns", first_name="Monty", last_name="Burns")
+    homer = UserFactory.create(
+        username="hsimpson", first_name="Homer", last_name="Simpson"
+    )
+    boss = EmployeeFactory.create(user=burns)
+    EmployeeFactory.create(user=homer, supervisor=boss)
+
+    MilestoneFactory.create(label="Approved", category="Core", order=1, report=False)
+
+    return ProjectFactory.create(prj_cd="LHA_IA12_111", owner=homer)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_milestone_changes_are_queued(settings, project):
+    """When notifications are deferred, approving a project should add
+    an event to the outbox rather than sending messages.  Approving,
+    revoking and re-approving a project should queue all three events
+    in order."""
+
+    settings.DEFER_NOTIFICATIONS = True
+
+    project.approve()
+    project.unapprove()
+    project.approve()
+
+    assert Message.objects.count() == 0
+    assert Messages2Users.objects.count() == 0
+
+    events = NotificationEvent.objects.filter(processed__isnull=True)
+    msgtxt = [x.msgtxt for x in events.order_by("created", "id")]
+    assert msgtxt == [
+        "Approved",
+        "The milestone 'Approved' has been revoked",
+        "Approved",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_repeated_events_are_coalesced(settings, project):
+    """Consecutive repeats of the same event for a milestone should only
+    be queued and sent once."""
+
+    settings.DEFER_NOTIFICATIONS = True
+    milestone = Milestone.objects.get(label="Approved")
+
+    queue_notifications([(project, milestone, "Approved")] * 2)
+    queue_notification("Approved", project, milestone)
+    assert NotificationEvent.objects.count() == 2
+
+    call_command("process_notifications")
+    assert Message.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_process_notifications_last_message_is_latest(settings, project):
+    """If a project is approved, revoked and approved again before the
+    events are processed, the last message should be the approval."""
+
+    settings.DEFER_NOTIFICATIONS = True
+
+    project.approve()
+    project.unapprove()
+    project.approve()
+
+    call_command("process_notifications")
+
+    msgtxt = list(Message.objects.order_by("id").values_list("msgtxt", flat=True))
+    assert msgtxt == [
+        "Approved",
+        "The milestone 'Approved' has been revoked",
+        "Approved",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_process_notifications(settings, project):
+    """The process_notifications command should create a message for
+    each pending event, send it to the project's recipients and mark the
+    events as processed."""
+
+    settings.DEFER_NOTIFICATIONS = True
+
+    project.approve()
+    project.unapprove()
+
+    call_command("process_notifications")
+
+    assert NotificationEvent.objects.filter(processed__isnull=True).count() == 0
+    assert Message.objects.count() == 2
+
+    usernames = set(Messages2Users.objects.values_list("user__username", flat=True))
+    assert {"hsimpson", "mburns"}.issubset(usernames)
+
+    # running it again does nothing.
+    call_command("process_notifications")
+    assert Message.objects.count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_messages_sent_immediately_if_not_deferred(settings, project):
+    """If DEFER_NOTIFICATIONS is False, the messages should be sent when
+    the milestone is saved and nothing is added to the outbox."""
+
+    settings.DEFER_NOTIFICATIONS = False
+
+    project.approve()
+
+    assert NotificationEvent.objects.count() == 0
+    assert Message.objects.filter(msgtxt="Approved").count() == 1
@@ -0,0 +1,199 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/facets.py
+Created: 18 Oct 2026 11:42:37
+
+
+DESCRIPTION:
+
+The facet engine used by the project search page.  The number of
+projects in each lake, project type, scope and protocol, and the total
+number of projects, are all calculated from the filtered project
+queryset in a single GROUPING SETS query rather than with a separate
+GROUP BY (and a separate scan of pjtk2_project) for each facet.
+
+The facets are cached by the normalized query string (the GET
+parameters, sorted, without the page number).  A generation number
+stored in the cache is included in every key and is incremented by
+signals in models.py whenever a project, project type or protocol is
+saved or deleted, so the cached facets are discarded when the
+projects change.  They also expire after
+settings.PROJECT_FACET_CACHE_TIMEOUT seconds.
+
+A. Cottrill
+=============================================================
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F
+from django.utils.http import urlencode
+
+
+FACET_GENERATION_KEY = "pjtk2:project_facets:generation"
+
+# the columns of each facet (in the order they are grouped) and the
+# column counted for it.  The counted columns are the same ones counted
+# by the old GROUP BY queries, so projects without a project type or
+# protocol are reported with N=0.
+FACETS = {
+    "lakes": (["lakeId", "lakeName", "lakeAbbrev"], "lakeId"),
+    "project_types": (["projTypeId", "projType"], "projTypeId"),
+    "project_scope": (["projScope"], "projScope"),
+    "protocols": (["protocolId", "projProtocol", "protocolAbbrev"], "protocolId"),
+}
+
+FACET_SQL = """
+SELECT {groupings}, {columns}, COUNT(*), {counts}
+  FROM ({subquery}) AS facets
+ GROUP BY GROUPING SETS ({grouping_sets}, ())
+"""
+
+
+def normalize_query(query_dict, exclude=("page",)):
+    """Return a canonical version of the query string - the parameters
+    (less the excluded ones and any empty values) sorted by name and
+    value, so that the same search always produces the same cache key
+    regardless of the order of the parameters in the url.
+
+    Arguments:
+    - `query_dict`: a QueryDict (usually request.GET)
+    - `exclude`: the names of parameters that do not change the facets
+
+    """
+    params = []
+    for key in sorted(query_dict.keys()):
+        if key in exclude:
+            continue
+        params.extend(
+            (key, value) for value in sorted(query_dict.getlist(key)) if value
+        )
+    return urlencode(params)
+
+
+def get_facet_generation():
+    """Return the current facet generation, creating it if needed."""
+    cache.add(FACET_GENERATION_KEY, 1, None)
+    return cache.get(FACET_GENERATION_KEY, 1)
+
+
+def clear_project_facets():
+    """Increment the facet generation so that all of the cached facets
+    are ignored.  Called by signals in models.py."""
+    try:
+        cache.incr(FACET_GENERATION_KEY)
+    except ValueError:
+        # the generation has been evicted (or never existed)
+        cache.add(FACET_GENERATION_KEY, 1, None)
+
+
+def _facet_queryset(queryset):
+    """The values (with the column aliases used by the template) of
+    each project in the filtered queryset."""
+    return queryset.order_by().values(
+        lakeId=F("lake_id"),
+        lakeName=F("lake__lake_name"),
+        lakeAbbrev=F("lake__abbrev"),
+        projTypeId=F("project_type_id"),
+        projType=F("project_type__project_type"),
+        projScope=F("project_type__scope"),
+        protocolId=F("protocol_id"),
+        projProtocol=F("protocol__protocol"),
+        protocolAbbrev=F("protocol__abbrev"),
+    )
+
+
+def _sort_key(value):
+    """Sort None last - the same order postgres returns them."""
+    return (value is None, value)
+
+
+def calculate_project_facets(queryset):
+    """Calculate the facet histograms and the total number of projects
+    in the queryset with a single query.
+
+    Returns a dictionary with the keys lakes, project_types,
+    project_scope and protocols (each a list of dictionaries with the
+    facet columns and N) and project_count.
+
+    """
+
+    subquery = _facet_queryset(queryset)
+    connection = connections[subquery.db]
+    qn = connection.ops.quote_name
+    sql, params = subquery.query.sql_with_params()
+
+    names = list(FACETS.keys())
+    columns = []
+    for name in names:
+        columns.extend(FACETS[name][0])
+
+    facet_sql = FACET_SQL.format(
+        groupings=", ".join(
+            "GROUPING(facets.{})".format(qn(FACETS[x][0][0])) for x in names
+        ),
+        columns=", ".join("facets.{}".format(qn(x)) for x in columns),
+        counts=", ".join(
+            "COUNT(facets.{})".format(qn(FACETS[x][1])) for x in names
+        ),
+        subquery=sql,
+        grouping_sets=", ".join(
+            "({})".format(", ".join("facets.{}".format(qn(x)) for x in FACETS[y][0]))
+            for y in names
+        ),
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(facet_sql, params)
+        rows = cursor.fetchall()
+
+    facets = {x: [] for x in names}
+    project_count = 0
+    ngroups = len(names)
+    ncolumns = len(columns)
+    for row in rows:
+        grouping = row[:ngroups]
+        values = dict(zip(columns, row[ngroups : ngroups + ncolumns]))
+        total = row[ngroups + ncolumns]
+        counts = row[ngroups + ncolumns + 1 :]
+        if all(grouping):
+            # the empty grouping set - every project
+            project_count = total
+            continue
+        # exactly one facet is grouped (GROUPING() == 0) in each row
+        i = grouping.index(0)
+        item = {x: values[x] for x in FACETS[names[i]][0]}
+        item["N"] = counts[i]
+        facets[names[i]].append(item)
+
+    for name in names:
+        facets[name].sort(key=lambda x, col=FACETS[name][0][0]: _sort_key(x[col]))
+
+    facets["project_count"] = project_count
+    return facets
+
+
+def get_project_facets(queryset, query_dict):
+    """Return the facets of the filtered project queryset, using the
+    cached facets of the same search if they exist.
+
+    Arguments:
+    - `queryset`: the filtered project queryset (built once by the view)
+    - `query_dict`: the parameters that were used to filter the
+      queryset - usually request.GET
+
+    """
+
+    query = normalize_query(query_dict)
+    key = "pjtk2:project_facets:{}:{}".format(
+        get_facet_generation(), hashlib.md5(query.encode("utf-8")).hexdigest()
+    )
+    facets = cache.get(key)
+    if facets is None:
+        facets = calculate_project_facets(queryset)
+        timeout = getattr(settings, "PROJECT_FACET_CACHE_TIMEOUT", 300)
+        cache.set(key, facets, timeout)
+    return facets
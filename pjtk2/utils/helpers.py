@@ -5,16 +5,31 @@ functions are used in views.py,but they are not views themselves.
 """
 
 
+import collections
 import re
 import datetime
 import pytz
 
-from django.db.models import Subquery, Case, When, BooleanField, F, Value
+from django.db import transaction
+from django.db.models import (
+    Subquery,
+    Case,
+    When,
+    BooleanField,
+    CharField,
+    DateTimeField,
+    F,
+    Prefetch,
+    Q,
+    Value,
+)
 from django.db.models.functions import Concat
 
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import get_object_or_404
 
+from .permissions import PermissionContext
+
 
 def make_possessive(string):
     """
@@ -66,27 +81,28 @@ def strip_carriage_returns(my_string):
 def get_supervisors(employee):
     """
     Given an employee object, return a list of supervisors.  the first
-    element of list will be the intial employee.
+    element of list will be the intial employee.  The entire chain of
+    supervisors is retrieved with a single recursive query.
     """
 
-    if employee.supervisor:
-        return [employee] + get_supervisors(employee.supervisor)
-    else:
-        return [employee]
+    from .hierarchy import get_supervisor_ids, get_employees
+
+    ids = get_supervisor_ids(employee.id)
+    return [employee] + get_employees(ids[1:])
 
 
 def get_minions(employee):
     """
     Given an employee objects, return a list of employees under his/her
     supervision.  The first element of list will be the intial
-    employee.
+    employee.  The entire subtree is retrieved with a single recursive
+    query.
     """
 
-    ret = [employee]
-    for minion in employee.employee_set.all():
-        # ret.append(get_minions(minion))
-        ret.extend(get_minions(minion))
-    return ret
+    from .hierarchy import get_subordinate_ids, get_employees
+
+    ids = get_subordinate_ids(employee.id)
+    return [employee] + get_employees(ids[1:])
 
 
 def my_messages(user, all=False):
@@ -202,7 +218,9 @@ def group_required(*group_names):
 def is_manager(user):
     """
     A simple little function to find out if the current user is a
-    project tracker manager.
+    project tracker manager.  Views should use
+    get_permissions(request).is_manager so that the employee role is
+    only retrieved once per request.
     """
     # this code uses Django groups, we want to use roles in Project Tracker Employee:
     # manager = False
@@ -213,10 +231,7 @@ def is_manager(user):
     #     #    manager = False
     # return manager
 
-    manager = False
-    if hasattr(user, "employee"):
-        manager = True if user.employee.role == "manager" else False
-    return manager
+    return PermissionContext(user).is_manager
 
 
 def is_dba(user):
@@ -224,10 +239,7 @@ def is_dba(user):
     A simple little function to find out if the supplied user is a
     project tracker dba.
     """
-    dba = False
-    if hasattr(user, "employee"):
-        dba = True if user.employee.role == "dba" else False
-    return dba
+    return PermissionContext(user).is_dba
 
 
 def can_edit(user, project):
@@ -235,27 +247,11 @@ def can_edit(user, project):
     Another helper function to see if this user should be allowed
     to edit this project.  In order to edit the use must be either the
     project owner or lead, a manager, a superuser, a dba, or the field lead.
+    Views should use get_permissions(request).can_edit(project) so
+    that the answer is only calculated once per request.
     """
 
-    if project.is_complete():
-        return False
-
-    if user:
-        canedit = (
-            # (user.groups.filter(name="manager").count() > 0)
-            (user.is_superuser)
-            or (user == project.owner)
-            or (user == project.field_ldr)
-            or (is_dba(user))
-            or (is_manager(user))
-        )
-    else:
-        canedit = False
-
-    if canedit:
-        return True
-    else:
-        return False
+    return PermissionContext(user).can_edit(project)
 
 
 def get_assignments_with_paths(project, core=True):
@@ -291,6 +287,119 @@ def get_assignments_with_paths(project, core=True):
     return assign_dicts
 
 
+def get_project_detail(slug, permissions):
+    """
+    Assemble everything needed by the project detail page in a fixed
+    number of queries regardless of how many milestones, reports,
+    images, funding sources or sisters the project has.  The project
+    milestones are retrieved once (with their milestones and current
+    reports) and then split into the milestones, core and custom
+    reporting requirements in python - the same records returned by
+    project.get_milestones() and get_assignments_with_paths().
+
+    Arguments:
+    - `slug`: the slug of the project
+    - `permissions`: the PermissionContext of the current user
+
+    Returns a dictionary that can be passed directly to the
+    projectdetail.html template.  Raises Http404 if the project does not
+    exist.
+    """
+
+    from ..models import (
+        AssociatedFile,
+        Project,
+        ProjectFunding,
+        ProjectMilestones,
+        Report,
+    )
+
+    current_reports = Prefetch(
+        "report_set",
+        queryset=Report.objects.filter(current=True).order_by("-uploaded_on"),
+        to_attr="current_reports",
+    )
+    project_milestones = Prefetch(
+        "projectmilestones",
+        queryset=ProjectMilestones.objects.select_related("milestone")
+        .prefetch_related(current_reports)
+        .order_by("milestone__order"),
+        to_attr="all_project_milestones",
+    )
+
+    queryset = Project.all_objects.select_related(
+        "prj_ldr",
+        "field_ldr",
+        "owner",
+        "signoff_by",
+        "project_type",
+        "master_database",
+        "lake",
+    ).prefetch_related(
+        Prefetch(
+            "funding_sources",
+            queryset=ProjectFunding.objects.select_related("source"),
+        ),
+        "images",
+        "project_team",
+        "tags",
+        project_milestones,
+        Prefetch(
+            "associatedfile_set",
+            queryset=AssociatedFile.objects.all(),
+            to_attr="associated_files",
+        ),
+    )
+    project = get_object_or_404(queryset, slug=slug)
+
+    # all of the sisters in one query (the family is found in a subquery)
+    sisters = list(
+        Project.objects.filter(
+            projectsisters__family__projectsisters__project=project
+        )
+        .exclude(pk=project.pk)
+        .order_by("prj_cd")
+    )
+
+    milestones = []
+    core = []
+    custom = []
+    for prjms in project.all_project_milestones:
+        if not prjms.milestone.report:
+            if prjms.required:
+                milestones.append(prjms)
+            continue
+        if prjms.milestone.category != "Core" and not prjms.required:
+            continue
+        reports = prjms.current_reports
+        assignment = dict(
+            required=prjms.required,
+            category=prjms.milestone.category,
+            milestone=prjms.milestone,
+            report=reports[0] if reports else None,
+        )
+        if prjms.milestone.category == "Core":
+            core.append(assignment)
+        else:
+            custom.append(assignment)
+
+    edit = permissions.can_edit(project)
+    if project.cancelled:
+        edit = False
+
+    return {
+        "milestones": milestones,
+        "Core": core,
+        "Custom": custom,
+        "project": project,
+        "sisters": sisters,
+        "associated_files": project.associated_files,
+        "edit": edit,
+        "manager": permissions.is_manager,
+        "has_sister": len(sisters) > 0,
+    }
+
+
 def update_milestones(form_ms, milestones):
     """
     a helper function to update milestones assocaited with a project.
@@ -305,39 +414,108 @@ def update_milestones(form_ms, milestones):
     + forms_ms - list of projectmilestone id numbers generated from
         form.cleaned_data['milestones']
 
+    The completed and cleared milestones are each updated with a
+    single query and the notifications for all of the changed
+    milestones are sent together by notify_milestones_changed().
+    Returns the list of project milestones that were changed.
+
     """
 
-    from ..models import ProjectMilestones
+    from ..models import ProjectMilestones, notify_milestones_changed
 
     # convert the list of milestones from the form to a set of integers:
     form_ms = set([int(x) for x in form_ms])
 
-    old_completed = milestones.filter(completed__isnull=False)
-    old_outstanding = milestones.filter(completed__isnull=True)
+    milestones = list(milestones)
+
+    # these ones are now complete:
+    added_ms = [x for x in milestones if x.completed is None and x.id in form_ms]
+    # these ones were done, but now they aren't
+    removed_ms = [
+        x for x in milestones if x.completed is not None and x.id not in form_ms
+    ]
 
-    old_completed = set([x.id for x in old_completed])
-    old_outstanding = set([x.id for x in old_outstanding])
+    if not (added_ms or removed_ms):
+        return []
 
     now = datetime.datetime.now(pytz.utc)
 
-    # these ones are now complete:
-    added_ms = old_outstanding.intersection(form_ms)
-    # ProjectMilestones.objects.filter(id__in=added_ms).update(completed=now)
+    with transaction.atomic():
+        if added_ms:
+            ProjectMilestones.objects.filter(id__in=[x.id for x in added_ms]).update(
+                completed=now
+            )
+        if removed_ms:
+            ProjectMilestones.objects.filter(
+                id__in=[x.id for x in removed_ms]
+            ).update(completed=None)
 
-    # in order to trigger a signal - we need to loop over each project
-    # milestone, and mannually save them:
-    for prjms_id in added_ms:
-        prjms = ProjectMilestones.objects.get(id=prjms_id)
-        prjms.completed = now
-        prjms.save()
+        for prjms in added_ms:
+            prjms.completed = now
+        for prjms in removed_ms:
+            prjms.completed = None
+        notify_milestones_changed(added_ms + removed_ms)
 
-    # these ones were done, but now they aren't
-    removed_ms = old_completed.difference(form_ms)
-    # ProjectMilestones.objects.filter(id__in=removed_ms).update(completed=None)
-    for prjms_id in removed_ms:
-        prjms = ProjectMilestones.objects.get(id=prjms_id)
-        prjms.completed = None
-        prjms.save()
+    return added_ms + removed_ms
+
+
+def approve_projects(approved, unapproved):
+    """
+    Approve and un-approve a number of projects at once.  approved and
+    unapproved are lists of ids of 'Approved' project milestones (as
+    used by ApproveProjectsForm2).  Rather than saving each project
+    milestone (and sending the messages) one at a time, the completed
+    date of all of the project milestones is updated in a single
+    query, the status of the associated projects is updated in
+    another, and the notifications for all of the projects are sent
+    together.
+
+    Project milestones that are already in the requested state are
+    ignored.  Returns the list of project milestones that were changed.
+
+    """
+
+    from ..models import Project, ProjectMilestones, notify_milestones_changed
+
+    approved = set([int(x) for x in approved])
+    unapproved = set([int(x) for x in unapproved])
+
+    changed = list(
+        ProjectMilestones.objects.filter(milestone__label="Approved")
+        .filter(
+            Q(id__in=approved, completed__isnull=True)
+            | Q(id__in=unapproved, completed__isnull=False)
+        )
+        .select_related("project", "milestone")
+    )
+    if not changed:
+        return []
+
+    now = datetime.datetime.now(pytz.utc)
+    approved = set([x.id for x in changed if x.id in approved])
+    approved_projects = set([x.project_id for x in changed if x.id in approved])
+    for prjms in changed:
+        prjms.completed = now if prjms.id in approved else None
+        prjms.project.status = "ongoing" if prjms.id in approved else "submitted"
+
+    with transaction.atomic():
+        ProjectMilestones.objects.filter(id__in=[x.id for x in changed]).update(
+            completed=Case(
+                When(id__in=approved, then=Value(now)),
+                default=None,
+                output_field=DateTimeField(),
+            )
+        )
+        Project.all_objects.filter(id__in=[x.project_id for x in changed]).update(
+            status=Case(
+                When(id__in=approved_projects, then=Value("ongoing")),
+                default=Value("submitted"),
+                output_field=CharField(),
+            )
+        )
+        notify_milestones_changed(changed)
+
+    return changed
 
 
 def get_sisters_dict(slug):
@@ -383,83 +561,122 @@ def get_sisters_dict(slug):
     return initial
 
 
-def make_proj_ms_dict(proj_ms, milestones):
-    """
-
-    # given a list of dictionaries containing project
-    # milesstones return a dictionary keyed by project code that contains
-    # the status of each milestone (represents a row in 'my projects table')
-
+# the status codes used in the 'my projects' tables - keep logic out
+# of the templates.  Keyed by (required, completed).
+MILESTONE_STATUS = {
+    (True, True): "required-done",
+    (False, True): "notRequired-done",
+    (True, False): "required-notDone",
+    (False, False): "notRequired-notDone",
+}
+
+
+def make_proj_ms_matrix(proj_ms, milestones, first_year, first_year_complete):
+    """Given a list of dictionaries containing each project and its
+    project milestones (all of the rows returned by get_proj_ms_matrix()
+    in views.management), sort each project into its status bucket and
+    return a dictionary of ordered dictionaries - one for each of
+    'submitted', 'approved', 'cancelled' and 'complete'.  Each bucket is
+    keyed by project code and contains the status of each milestone (a
+    row in 'my projects table').
+
+    Cancelled projects are identified by Project.cancelled, so they are
+    included even if they don't have any project milestones.  The rows
+    for the 'Approved' and 'Sign off' milestones are only used to
+    classify the other projects - they are not added to the matrix.
+    The classification mirrors the submitted(), approved(), cancelled()
+    and completed() methods of ProjectsManager - a cancelled project
+    that was never approved will appear in both 'submitted' and
+    'cancelled'.
 
     Arguments:
-    - `proj_ms`:
-    """
-
-    ms_dict = {}
-    for ms in milestones:
-        ms_dict[ms.label] = {
-            "type": "report" if ms.report else "milestone",
-            "required": False,
-            "completed": False,
-            "status": "notRequired-notDone",
-        }
-
-    # add an empty custom report
-    ms_dict["custom"] = {
-        "type": "report",
-        "required": False,
-        "completed": False,
-        "status": "notRequired-notDone",
+    - `proj_ms`: an iterable of dictionaries, ordered by year, project
+      code and milestone order - a project without any milestones has a
+      single row with a milestone label of None
+    - `milestones`: the milestone objects that make up the columns of
+      the matrix
+    - `first_year`: the earliest year to include in the submitted,
+      approved and cancelled buckets
+    - `first_year_complete`: the earliest year to include in the
+      complete bucket
+
+    """
+
+    # the default status of each milestone is shared by every row -
+    # entries are replaced, never modified in place.
+    not_done = {
+        "report": {"type": "report", "status": "notRequired-notDone"},
+        "milestone": {"type": "milestone", "status": "notRequired-notDone"},
     }
+    statuses = {}
+    for ms_type in ("report", "milestone"):
+        for key, status in MILESTONE_STATUS.items():
+            statuses[(ms_type,) + key] = {"type": ms_type, "status": status}
 
-    proj_ms_dict = {}
+    ms_dict = collections.OrderedDict()
+    for ms in milestones:
+        ms_dict[ms.label] = not_done["report" if ms.report else "milestone"]
+    ms_dict["custom"] = not_done["report"]
 
+    projects = collections.OrderedDict()
     for item in proj_ms:
-        prj_cd = item.get("project__prj_cd")
-        proj = proj_ms_dict.get(prj_cd)
+        prj_cd = item["prj_cd"]
+        proj = projects.get(prj_cd)
         if proj is None:
-            prj_attrs = {
-                "prj_nm": item["project__prj_nm"],
-                "year": item["project__year"],
-                "slug": item["project__slug"],
-                "prj_cd": item["project__prj_cd"],
-                "prj_ldr": item["project__prj_ldr__username"],
-                "prj_lead": "{} {}".format(
-                    item["project__prj_ldr__first_name"],
-                    item["project__prj_ldr__last_name"],
-                ),
-                "project_type": item["project__project_type__project_type"],
+            proj = {
+                "attrs": {
+                    "prj_nm": item["prj_nm"],
+                    "year": item["year"],
+                    "slug": item["slug"],
+                    "prj_cd": prj_cd,
+                    "prj_ldr": item["prj_ldr__username"],
+                    "prj_lead": "{} {}".format(
+                        item["prj_ldr__first_name"], item["prj_ldr__last_name"]
+                    ),
+                    "project_type": item["project_type__project_type"],
+                },
+                "milestones": ms_dict.copy(),
+                "cancelled": item["cancelled"],
+                "approved": None,
+                "signoff": None,
             }
-            # add our empty milestone entries here. they will be updated on subsequent iterations:
-            proj_ms_dict[prj_cd] = {"attrs": prj_attrs, "milestones": dict(ms_dict)}
-        else:
-            proj = proj_ms_dict.pop(prj_cd)
-            # build a dictionary that contains the status of this milestone:
-            status = {
-                "type": "report" if item["milestone__report"] else "milestone",
-                "required": item["required"],
-                "completed": True if item["completed"] else False,
-            }
-            # add status code here - keep logic out of templates:
-            if status["completed"] is True:
-                if status["required"] is True:
-                    status["status"] = "required-done"
-                else:
-                    status["status"] = "notRequired-done"
-            else:
-                if status["required"] is True:
-                    status["status"] = "required-notDone"
-                else:
-                    status["status"] = "notRequired-notDone"
-            # get the project milestones
-            ms = proj.pop("milestones")
-
-            # add our current mileone
-            ms[item["milestone__label"]] = status
-            proj["milestones"] = ms
-            proj_ms_dict[prj_cd] = dict(proj)
-
-    return proj_ms_dict
+            projects[prj_cd] = proj
+
+        label = item["projectmilestones__milestone__label"]
+        completed = item["projectmilestones__completed"] is not None
+        if label == "Approved":
+            proj["approved"] = completed
+        elif label == "Sign off":
+            proj["signoff"] = completed
+        elif label in ms_dict and label != "custom":
+            report = item["projectmilestones__milestone__report"]
+            ms_type = "report" if report else "milestone"
+            required = bool(item["projectmilestones__required"])
+            proj["milestones"][label] = statuses[(ms_type, required, completed)]
+
+    buckets = {
+        "submitted": collections.OrderedDict(),
+        "approved": collections.OrderedDict(),
+        "cancelled": collections.OrderedDict(),
+        "complete": collections.OrderedDict(),
+    }
+
+    for prj_cd, proj in projects.items():
+        cancelled = proj.pop("cancelled")
+        approved = proj.pop("approved")
+        signoff = proj.pop("signoff")
+        year = int(proj["attrs"]["year"])
+        if year >= first_year:
+            if cancelled:
+                buckets["cancelled"][prj_cd] = proj
+            elif approved and signoff is False:
+                buckets["approved"][prj_cd] = proj
+            if approved is False and signoff is False:
+                buckets["submitted"][prj_cd] = proj
+        if year >= first_year_complete and not cancelled and approved and signoff:
+            buckets["complete"][prj_cd] = proj
+
+    return buckets
 
 
 def get_projects_for_approval(year, this_year=True):
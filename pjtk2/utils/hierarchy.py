@@ -0,0 +1,148 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/hierarchy.py
+Created: 18 Oct 2026 09:40:12
+
+
+DESCRIPTION:
+
+Functions to resolve the employee-supervisor hierarchy.  Each
+function retrieves the complete chain of supervisors or the entire
+subtree of employees in a single recursive query rather than walking
+the hierarchy one employee (and one query) at a time.
+
+The results (lists of employee ids) can optionally be cached for the
+life of the process by setting EMPLOYEE_HIERARCHY_CACHE=True in
+settings.  The cache is cleared by signals in models.py whenever an
+employee is saved or deleted.  NOTE - the cache is local to each
+process, so it should only be enabled if employees are edited in the
+same process that serves the pages (or if a little stale data is
+acceptable).
+
+A. Cottrill
+=============================================================
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+
+_hierarchy_cache = {}
+
+
+SUBORDINATES_SQL = """
+WITH RECURSIVE subordinates(id, path) AS (
+    SELECT emp.id, ARRAY[usr.username::text]
+      FROM {employee} emp
+      JOIN {user} usr ON usr.id = emp.user_id
+     WHERE emp.id = %s
+  UNION ALL
+    SELECT emp.id, sub.path || usr.username::text
+      FROM {employee} emp
+      JOIN {user} usr ON usr.id = emp.user_id
+      JOIN subordinates sub ON emp.supervisor_id = sub.id
+     WHERE NOT usr.username = ANY(sub.path)
+)
+SELECT id FROM subordinates ORDER BY path;
+"""
+
+
+SUPERVISORS_SQL = """
+WITH RECURSIVE supervisors(id, supervisor_id, path) AS (
+    SELECT emp.id, emp.supervisor_id, ARRAY[emp.id]
+      FROM {employee} emp
+     WHERE emp.id = %s
+  UNION ALL
+    SELECT emp.id, emp.supervisor_id, sup.path || emp.id
+      FROM {employee} emp
+      JOIN supervisors sup ON emp.id = sup.supervisor_id
+     WHERE NOT emp.id = ANY(sup.path)
+)
+SELECT id FROM supervisors ORDER BY array_length(path, 1);
+"""
+
+
+def clear_hierarchy_cache():
+    """Remove everything from the per-process hierarchy cache."""
+    _hierarchy_cache.clear()
+
+
+def _use_cache(use_cache):
+    if use_cache is None:
+        return getattr(settings, "EMPLOYEE_HIERARCHY_CACHE", False)
+    return use_cache
+
+
+def _run_hierarchy_query(sql, employee_id):
+    """Format the sql with the actual table names, execute it and
+    return the list of employee ids."""
+
+    from pjtk2.models import Employee
+
+    User = get_user_model()
+    sql = sql.format(employee=Employee._meta.db_table, user=User._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [employee_id])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_subordinate_ids(employee_id, use_cache=None):
+    """Return the id of the employee followed by the ids of every
+    employee that reports to them either directly or indirectly.  The
+    ids are returned depth-first, with the employees under each
+    supervisor sorted by username (the same order returned by
+    recursing through employee.employee_set).
+
+    Arguments:
+    - `employee_id`: the id of the employee at the top of the subtree
+    - `use_cache`: use the per-process cache? defaults to the value of
+      settings.EMPLOYEE_HIERARCHY_CACHE
+
+    """
+
+    key = ("subordinates", employee_id)
+    cache = _use_cache(use_cache)
+    if cache and key in _hierarchy_cache:
+        return list(_hierarchy_cache[key])
+
+    ids = _run_hierarchy_query(SUBORDINATES_SQL, employee_id)
+    if cache:
+        _hierarchy_cache[key] = ids
+    return list(ids)
+
+
+def get_supervisor_ids(employee_id, use_cache=None):
+    """Return the id of the employee followed by the ids of their
+    supervisor, their supervisor's supervisor and so on up to the top of
+    the hierarchy.
+
+    Arguments:
+    - `employee_id`: the id of the employee at the bottom of the chain
+    - `use_cache`: use the per-process cache? defaults to the value of
+      settings.EMPLOYEE_HIERARCHY_CACHE
+
+    """
+
+    key = ("supervisors", employee_id)
+    cache = _use_cache(use_cache)
+    if cache and key in _hierarchy_cache:
+        return list(_hierarchy_cache[key])
+
+    ids = _run_hierarchy_query(SUPERVISORS_SQL, employee_id)
+    if cache:
+        _hierarchy_cache[key] = ids
+    return list(ids)
+
+
+def get_employees(employee_ids):
+    """Return a list of employee objects (with their users and
+    supervisors) in the same order as the list of ids.  All of the
+    employees are retrieved in a single query."""
+
+    from pjtk2.models import Employee
+
+    employees = Employee.all_objects.select_related("user", "supervisor__user").in_bulk(
+        employee_ids
+    )
+    return [employees[x] for x in employee_ids if x in employees]
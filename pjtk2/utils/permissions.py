@@ -0,0 +1,95 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/permissions.py
+Created: 18 Oct 2026 13:05:41
+
+
+DESCRIPTION:
+
+A request-scoped permission context.  The role of the current user
+(manager, dba or employee) is retrieved from their employee profile
+the first time it is needed and the result of can_edit() is memoized
+for each project, so views and template tags can check permissions
+as often as they like during a request without repeating queries.
+
+The PermissionMiddleware in pjtk2/middleware.py attaches a context to
+each request as request.permissions - use get_permissions(request) to
+retrieve it (one will be created if the middleware isn't installed).
+
+A. Cottrill
+=============================================================
+"""
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import cached_property
+
+
+class PermissionContext(object):
+    """The permissions of a single user.  Create one per request (or
+    user) - the cached values are never refreshed."""
+
+    def __init__(self, user):
+        self.user = user
+        self._can_edit = {}
+
+    @property
+    def is_authenticated(self):
+        return self.user is not None and self.user.is_authenticated
+
+    @cached_property
+    def role(self):
+        """The role from the employee profile of the user, or None if
+        the user is anonymous or doesn't have a profile."""
+        if not self.is_authenticated:
+            return None
+        try:
+            return self.user.employee.role
+        except ObjectDoesNotExist:
+            return None
+
+    @cached_property
+    def is_manager(self):
+        return self.role == "manager"
+
+    @cached_property
+    def is_dba(self):
+        return self.role == "dba"
+
+    def can_edit(self, project):
+        """Should this user be allowed to edit this project? In order to
+        edit, the user must be either the project owner, the field lead,
+        a manager, a superuser or a dba, and the project can't be
+        complete.  The answer is memoized for each project."""
+
+        key = project.pk
+        if key not in self._can_edit:
+            self._can_edit[key] = self._get_can_edit(project)
+        return self._can_edit[key]
+
+    def _get_can_edit(self, project):
+
+        if project.is_complete():
+            return False
+
+        if not self.is_authenticated:
+            return False
+
+        user = self.user
+        return bool(
+            user.is_superuser
+            or user.id == project.owner_id
+            or user.id == project.field_ldr_id
+            or self.is_dba
+            or self.is_manager
+        )
+
+
+def get_permissions(request):
+    """Return the permission context of the current request, creating
+    (and attaching) one if the request doesn't have one yet."""
+
+    permissions = getattr(request, "permissions", None)
+    if permissions is None:
+        permissions = PermissionContext(getattr(request, "user", None))
+        request.permissions = permissions
+    return permissions
@@ -0,0 +1,252 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/point_upload.py
+Created: 18 Oct 2026 17:02:38
+
+
+DESCRIPTION:
+
+The set based pipeline used to save the sample points uploaded for a
+project.
+
+The points are streamed into a temporary table with COPY, checked
+against the polygon of the lake associated with the project in a
+single ST_Contains query, and then (in the same transaction) either
+replace or are appended to the sample points of the project.  The
+project multipoints and convex hull are then rebuilt with one
+INSERT ... ON CONFLICT statement each - the hull is calculated from
+the new multipoint rather than by aggregating the sample points a
+second time.  The same statements are used to rebuild the geometries
+of many projects at once (see the rebuild_project_geometries command).
+
+Nothing here calls Project.save() (which re-renders the markdown
+fields), so the caches that the post_save signals would normally
+clear are cleared explicitly.
+
+A. Cottrill
+=============================================================
+"""
+
+import csv
+import io
+
+from django.db import connection, transaction
+
+from pjtk2.models import (
+    POLYGON_RESOLUTIONS,
+    ProjectMultiPoints,
+    ProjectPolygon,
+    SamplePoint,
+    bump_cache_version,
+)
+from pjtk2.utils.roi import clear_roi_cache
+from pjtk2.utils.vector_tiles import clear_vector_tiles
+
+
+STAGED_TABLE = "pjtk2_staged_points"
+
+STAGE_SQL = """
+DROP TABLE IF EXISTS {table};
+CREATE TEMPORARY TABLE {table} (
+    row_number integer,
+    label varchar(60),
+    dd_lat double precision,
+    dd_lon double precision
+) ON COMMIT DROP;
+"""
+
+COPY_SQL = """
+COPY {table} (row_number, label, dd_lat, dd_lon) FROM STDIN WITH (FORMAT csv)
+"""
+
+OUTSIDE_LAKE_SQL = """
+SELECT staged.row_number
+  FROM {table} AS staged, {lake_table} AS lake
+ WHERE lake.id = %s
+   AND NOT ST_Contains(
+       lake.geom,
+       ST_SetSRID(ST_MakePoint(staged.dd_lon, staged.dd_lat), 4326)
+   )
+ ORDER BY staged.row_number
+"""
+
+INSERT_POINTS_SQL = """
+INSERT INTO {point_table} (project_id, label, geom)
+SELECT %s, label, ST_SetSRID(ST_MakePoint(dd_lon, dd_lat), 4326)
+  FROM {table}
+ ORDER BY row_number
+"""
+
+# a project without any points shouldn't have a multipoint or polygon.
+# Both statements rebuild the geometries of any number of projects at
+# once (grouped by project).
+MULTIPOINT_SQL = """
+WITH points AS (
+    SELECT project_id, ST_Multi(ST_Collect(geom)) AS geom
+      FROM {point_table}
+     WHERE project_id = ANY(%(project_ids)s)
+     GROUP BY project_id
+), deleted AS (
+    DELETE FROM {multipoint_table}
+     WHERE project_id = ANY(%(project_ids)s)
+       AND project_id NOT IN (SELECT project_id FROM points)
+)
+INSERT INTO {multipoint_table} (project_id, geom)
+SELECT project_id, geom FROM points
+ON CONFLICT (project_id) DO UPDATE SET geom = EXCLUDED.geom
+"""
+
+# the hull is only saved if the points form a polygon (at least three
+# points that aren't in a line).  The simplified versions of the hull
+# (see POLYGON_RESOLUTIONS) are saved with it.
+HULL_SQL = """
+WITH hulls AS (
+    SELECT project_id, ST_ConvexHull(geom) AS geom
+      FROM {multipoint_table}
+     WHERE project_id = ANY(%(project_ids)s)
+), polygons AS (
+    SELECT project_id, geom FROM hulls WHERE GeometryType(geom) = 'POLYGON'
+), deleted AS (
+    DELETE FROM {polygon_table}
+     WHERE project_id = ANY(%(project_ids)s)
+       AND project_id NOT IN (SELECT project_id FROM polygons)
+)
+INSERT INTO {polygon_table} (project_id, geom{simplified_columns})
+SELECT project_id, geom{simplified_values} FROM polygons
+ON CONFLICT (project_id) DO UPDATE SET geom = EXCLUDED.geom{simplified_updates}
+"""
+
+
+class PointUploadError(ValueError):
+    """Some of the uploaded points can't be saved.  row_numbers are the
+    (zero based) positions of the offending points."""
+
+    def __init__(self, message, row_numbers=None):
+        super(PointUploadError, self).__init__(message)
+        self.row_numbers = row_numbers or []
+
+
+def _table_names():
+    qn = connection.ops.quote_name
+    return {
+        "table": STAGED_TABLE,
+        "point_table": qn(SamplePoint._meta.db_table),
+        "multipoint_table": qn(ProjectMultiPoints._meta.db_table),
+        "polygon_table": qn(ProjectPolygon._meta.db_table),
+    }
+
+
+def stage_points(cursor, points):
+    """COPY the points into a temporary table that is dropped when the
+    transaction is committed.  Must be called inside a transaction.
+
+    Arguments:
+    - `cursor`: a database cursor
+    - `points`: an iterable of (label, dd_lat, dd_lon) tuples
+
+    """
+
+    cursor.execute(STAGE_SQL.format(table=STAGED_TABLE))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for i, (label, dd_lat, dd_lon) in enumerate(points):
+        writer.writerow([i, label, repr(float(dd_lat)), repr(float(dd_lon))])
+    buffer.seek(0)
+    cursor.copy_expert(COPY_SQL.format(table=STAGED_TABLE), buffer)
+
+
+def staged_points_outside_lake(cursor, lake):
+    """Return the row numbers of the staged points that are not within
+    the lake polygon."""
+
+    sql = OUTSIDE_LAKE_SQL.format(
+        table=STAGED_TABLE, lake_table=connection.ops.quote_name(lake._meta.db_table)
+    )
+    cursor.execute(sql, [lake.id])
+    return [x[0] for x in cursor.fetchall()]
+
+
+def _simplified_sql():
+    """The columns, values and updates of the simplified polygons in
+    HULL_SQL, and the simplify tolerance of each one."""
+    sql = {"simplified_columns": "", "simplified_values": "", "simplified_updates": ""}
+    params = {}
+    for resolution, tolerance, precision, zoom in POLYGON_RESOLUTIONS:
+        column = "geom_" + resolution
+        sql["simplified_columns"] += ", " + column
+        sql["simplified_values"] += (
+            ", ST_SimplifyPreserveTopology(geom, %({})s)".format(column)
+        )
+        sql["simplified_updates"] += ", {0} = EXCLUDED.{0}".format(column)
+        params[column] = tolerance
+    return sql, params
+
+
+def update_project_geometries(cursor, project_ids):
+    """Rebuild the multipoints and convex hulls of the projects from
+    their sample points - two statements regardless of the number of
+    projects.
+
+    Arguments:
+    - `cursor`: a database cursor
+    - `project_ids`: a project id or a list of project ids
+
+    """
+    if isinstance(project_ids, int):
+        project_ids = [project_ids]
+    if not project_ids:
+        return
+    tables = _table_names()
+    params = {"project_ids": list(project_ids)}
+    cursor.execute(MULTIPOINT_SQL.format(**tables), params)
+
+    simplified, tolerances = _simplified_sql()
+    params.update(tolerances)
+    cursor.execute(HULL_SQL.format(**tables, **simplified), params)
+
+
+def upload_sample_points(project, points, replace=False):
+    """Save the points as sample points of the project, replacing its
+    existing points if replace is True, and update the project
+    multipoints and polygon - all in one transaction.  Raises a
+    PointUploadError (and nothing is saved) if any of the points are
+    outside of the lake associated with the project.  Returns the number
+    of points that were saved.
+
+    Arguments:
+    - `project`: the project the points belong to
+    - `points`: a sequence of (label, dd_lat, dd_lon) tuples
+    - `replace`: delete the existing points of the project first?
+
+    """
+
+    tables = _table_names()
+    lake = project.lake
+    with transaction.atomic(), connection.cursor() as cursor:
+        stage_points(cursor, points)
+
+        if lake is not None and lake.geom:
+            outside = staged_points_outside_lake(cursor, lake)
+            if outside:
+                raise PointUploadError(
+                    "{} of the supplied points are not within the bounds of "
+                    "the lake associated with this project.".format(len(outside)),
+                    outside,
+                )
+
+        if replace:
+            cursor.execute(
+                "DELETE FROM {point_table} WHERE project_id = %s".format(**tables),
+                [project.id],
+            )
+        cursor.execute(INSERT_POINTS_SQL.format(**tables), [project.id])
+        count = cursor.rowcount
+
+        update_project_geometries(cursor, project.id)
+        bump_cache_version([project.id])
+
+    # the signals that usually clear these aren't sent by raw sql
+    clear_vector_tiles()
+    clear_roi_cache()
+    return count
@@ -0,0 +1,227 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/points_file.py
+Created: 18 Oct 2026 17:40:12
+
+
+DESCRIPTION:
+
+A streaming parser for the sample point files (csv or xlsx) uploaded
+for a project.
+
+The rows are read one at a time - csv files with csv.reader and xlsx
+files with openpyxl in read only mode (iter_rows(values_only=True)) -
+and are converted in chunks of CHUNK_SIZE rows.  Only the labels and
+two numpy arrays of coordinates are kept, so large files (hundreds of
+thousands of points) can be validated in bounded memory.  The extent
+of the lake is checked for all of the points at once with numpy; the
+points inside it are tested against the lake polygon itself in a
+single ST_Contains query when they are saved (see
+pjtk2.utils.point_upload).
+
+Every problem is reported with the row(s) of the file it occurs in.
+The rows are numbered as they are read (the first row of the file is
+row 1), before any empty rows are skipped.
+
+A. Cottrill
+=============================================================
+"""
+
+import csv
+import io
+from itertools import islice
+
+import numpy as np
+from openpyxl import load_workbook
+
+
+EXPECTED_HEADER = ["POINT_LABEL", "DD_LAT", "DD_LON"]
+CHUNK_SIZE = 10000
+
+# the number of row numbers included in each error message
+MAX_REPORTED_ROWS = 10
+
+
+class PointsFileError(ValueError):
+    """The points file can't be read at all (e.g. a bad header)."""
+
+
+class ParsedPoints:
+    """The labels and coordinates of the points in a points file, and
+    the errors found in each row.
+
+    errors is a dictionary of error message: list of row numbers.
+
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.dd_lat = np.empty(0)
+        self.dd_lon = np.empty(0)
+        self.row_numbers = np.empty(0, dtype=int)
+        self.errors = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        """(label, dd_lat, dd_lon) of each point."""
+        return zip(self.labels, self.dd_lat.tolist(), self.dd_lon.tolist())
+
+    def add_error(self, message, rows):
+        if len(rows):
+            self.errors.setdefault(message, []).extend(int(x) for x in rows)
+
+    def error_messages(self):
+        """A list of the error messages, each followed by (some of) the
+        rows it occurred in."""
+        return [describe_rows(msg, rows) for msg, rows in self.errors.items()]
+
+
+def describe_rows(message, rows):
+    """Append (up to MAX_REPORTED_ROWS of) the file rows to message, e.g.
+    'At least one point is missing a label. Rows: 3, 7.'"""
+    rows = sorted(int(x) for x in rows)
+    if not rows:
+        return message
+    shown = ", ".join(str(x) for x in rows[:MAX_REPORTED_ROWS])
+    if len(rows) > MAX_REPORTED_ROWS:
+        shown += " and {} more".format(len(rows) - MAX_REPORTED_ROWS)
+    label = "Row" if len(rows) == 1 else "Rows"
+    return "{} {}: {}.".format(message, label, shown)
+
+
+def read_csv_rows(points_file):
+    """Yield the (row number, row) of each non-empty row of a csv file
+    with any quotes removed.  The rows are numbered before the empty
+    ones are skipped, so the numbers match the file."""
+    # encoding catches the byte-order-mark that can cause issues:
+    text = io.TextIOWrapper(points_file, encoding="utf-8-sig")
+    try:
+        reader = csv.reader(text, delimiter=",", quotechar='"')
+        for row_number, row in enumerate(reader, 1):
+            if row:
+                yield row_number, [x.replace('"', "") for x in row]
+    finally:
+        # don't let the wrapper close the uploaded file
+        text.detach()
+
+
+def read_xlsx_rows(points_file):
+    """Yield the (row number, row) of each non-empty row of the first
+    worksheet in an xlsx file."""
+    wb = load_workbook(filename=points_file, read_only=True, data_only=True)
+    try:
+        # min_row=1 - empty rows at the top of the sheet are included
+        rows = wb.worksheets[0].iter_rows(min_row=1, values_only=True)
+        for row_number, row in enumerate(rows, 1):
+            if any(x is not None and x != "" for x in row):
+                yield row_number, list(row)
+    finally:
+        wb.close()
+
+
+def read_rows(points_file, filename):
+    """Yield the (row number, row) of each non-empty row of the points
+    file - the rows are lists of values."""
+    if filename.lower().endswith("xlsx"):
+        return read_xlsx_rows(points_file)
+    return read_csv_rows(points_file)
+
+
+def _convert_chunk(chunk, points):
+    """Convert a chunk of (row number, row) pairs to labels and
+    coordinates, recording the rows with missing labels or invalid
+    coordinates."""
+
+    labels = []
+    coords = np.full((len(chunk), 2), np.nan)
+    row_numbers = np.empty(len(chunk), dtype=int)
+    missing_labels = []
+    for i, (row_number, row) in enumerate(chunk):
+        row_numbers[i] = row_number
+        label = row[0] if row else None
+        if label is None or str(label).strip() == "":
+            missing_labels.append(row_number)
+        labels.append("" if label is None else str(label).strip())
+        try:
+            coords[i] = (float(row[1]), float(row[2]))
+        except (ValueError, TypeError, IndexError):
+            pass
+
+    invalid = ~np.isfinite(coords).all(axis=1)
+    points.add_error("At least one point is missing a label.", missing_labels)
+    points.add_error(
+        "At least one point has an invalid latitude or longitude.",
+        row_numbers[invalid],
+    )
+    return labels, coords, row_numbers
+
+
+def parse_points(rows, max_points=None, chunk_size=CHUNK_SIZE):
+    """Parse the rows of a points file (an iterable of (row number, row)
+    pairs, the first of which is the header).  Returns a ParsedPoints
+    object and raises a PointsFileError if the header is wrong, there
+    aren't any points or there are more than max_points.
+
+    Arguments:
+    - `rows`: an iterable of numbered rows (e.g. from read_rows())
+    - `max_points`: the maximum number of points allowed (or None)
+    - `chunk_size`: the number of rows converted at a time
+
+    """
+
+    rows = iter(rows)
+    _, header = next(rows, (1, []))
+    received_header = [str(x).strip() for x in header if x is not None]
+    if received_header != EXPECTED_HEADER:
+        raise PointsFileError(
+            "Malformed header in submitted file. "
+            "The header must contain the fields: 'POINT_LABEL', 'DD_LAT' and "
+            "'DD_LON'. The uploaded header is {}".format(
+                ", ".join(["'{}'".format(x) for x in received_header])
+            )
+        )
+
+    points = ParsedPoints()
+    labels = []
+    coords = []
+    row_numbers = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        if max_points and len(labels) + len(chunk) > max_points:
+            raise PointsFileError(
+                "The points file contains more than {} points! ".format(max_points)
+                + "Reduce the number of points and try again."
+            )
+        chunk_labels, chunk_coords, chunk_rows = _convert_chunk(chunk, points)
+        labels.extend(chunk_labels)
+        coords.append(chunk_coords)
+        row_numbers.append(chunk_rows)
+
+    if not labels:
+        raise PointsFileError("Points_File does not appear to contain any data!")
+
+    coords = np.concatenate(coords)
+    points.labels = labels
+    points.dd_lat = coords[:, 0]
+    points.dd_lon = coords[:, 1]
+    points.row_numbers = np.concatenate(row_numbers)
+    return points
+
+
+def outside_extent(points, extent):
+    """Return a boolean array that is True for each point that is not
+    strictly inside the extent (xmin, ymin, xmax, ymax) - the same test
+    as envelope.contains(point).  Points with invalid coordinates are
+    not included (they are reported separately)."""
+
+    xmin, ymin, xmax, ymax = extent
+    lat = points.dd_lat
+    lon = points.dd_lon
+    with np.errstate(invalid="ignore"):
+        inside = (lon > xmin) & (lon < xmax) & (lat > ymin) & (lat < ymax)
+    return ~inside & np.isfinite(lat) & np.isfinite(lon)
+
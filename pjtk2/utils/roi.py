@@ -0,0 +1,165 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/roi.py
+Created: 18 Oct 2026 15:41:09
+
+
+DESCRIPTION:
+
+Preprocessing of the regions of interest (roi) drawn on the project
+maps and posted to the roi api endpoints.
+
+Every roi is normalized the same way before it is used in a spatial
+query:
+
+  - it must be a polygon or multipolygon (a closed linear ring is
+    converted to a polygon),
+  - it is transformed to EPSG:4326 if it has a different srid,
+  - hand drawn polygons with lots of vertices are simplified
+    (preserving their topology) to settings.ROI_SIMPLIFY_TOLERANCE,
+  - invalid (self-intersecting) polygons are repaired, and
+  - the coordinates are rounded to ROI_PRECISION decimal places so
+    that the same region always produces exactly the same geometry.
+
+The results page makes several api calls with the same roi, so the
+normalized geometry is cached by a hash of the submitted text, and
+the results calculated from it (e.g. the ids of the contained and
+overlapping projects) are cached by a hash of the normalized geometry.
+Like the project facets, a generation number stored in the cache is
+included in every key and is incremented by signals in models.py
+whenever the project multipoints change.
+
+A. Cottrill
+=============================================================
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSException, GEOSGeometry, Polygon, WKTWriter
+from django.core.cache import cache
+
+
+ROI_GENERATION_KEY = "pjtk2:roi:generation"
+
+# 7 decimal places is about 1 cm - far more precise than anyone can
+# draw a polygon on a map.
+ROI_PRECISION = 7
+ROI_SRID = 4326
+
+
+class InvalidROI(ValueError):
+    """The region of interest is not a usable polygon."""
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+def _simplify(roi):
+    """Simplify rois with more than settings.ROI_SIMPLIFY_MIN_COORDS
+    vertices - smaller polygons are returned unchanged."""
+    tolerance = getattr(settings, "ROI_SIMPLIFY_TOLERANCE", None)
+    min_coords = getattr(settings, "ROI_SIMPLIFY_MIN_COORDS", 250)
+    if not tolerance or roi.num_coords <= min_coords:
+        return roi
+    simplified = roi.simplify(tolerance, preserve_topology=True)
+    if simplified.empty:
+        return roi
+    return simplified
+
+
+def _normalize(roi):
+    """Return the normalized version of the roi (a GEOS geometry) as
+    wkt.  Raises InvalidROI if it isn't a polygon."""
+
+    if roi.geom_type not in ("Polygon", "MultiPolygon"):
+        try:
+            roi = Polygon(roi, srid=roi.srid)
+        except (TypeError, ValueError, GEOSException):
+            raise InvalidROI("roi is not a valid polygon.")
+
+    if roi.srid is None:
+        roi.srid = ROI_SRID
+    elif roi.srid != ROI_SRID:
+        roi = roi.transform(ROI_SRID, clone=True)
+
+    roi = _simplify(roi)
+    if not roi.valid:
+        # buffer(0) fixes self-intersections and bow ties
+        roi = roi.buffer(0)
+    if roi.empty or roi.geom_type not in ("Polygon", "MultiPolygon"):
+        raise InvalidROI("roi is not a valid polygon.")
+
+    writer = WKTWriter(trim=True, precision=ROI_PRECISION)
+    return writer.write(roi).decode()
+
+
+def normalize_roi(roi):
+    """Validate and normalize a region of interest.  Returns a polygon
+    or multipolygon (srid=4326) and raises InvalidROI if the roi can't
+    be used.
+
+    Arguments:
+    - `roi`: a GEOS geometry or a string (wkt, ewkt, hex or geojson)
+
+    """
+
+    if isinstance(roi, str):
+        key = "pjtk2:roi:geom:{}".format(_hash(roi))
+        wkt = cache.get(key)
+        if wkt is None:
+            try:
+                geom = GEOSGeometry(roi)
+            except (ValueError, GEOSException):
+                raise InvalidROI(
+                    "roi could not be converted to a valid GEOS geometry."
+                )
+            wkt = _normalize(geom)
+            timeout = getattr(settings, "ROI_CACHE_TIMEOUT", 60 * 10)
+            cache.set(key, wkt, timeout)
+    else:
+        wkt = _normalize(roi)
+    return GEOSGeometry(wkt, srid=ROI_SRID)
+
+
+def roi_key(roi):
+    """A hash of the (normalized) roi that identifies it in the cache."""
+    writer = WKTWriter(trim=True, precision=ROI_PRECISION)
+    return _hash(writer.write(roi).decode())
+
+
+def get_roi_generation():
+    """Return the current roi generation, creating it if needed."""
+    cache.add(ROI_GENERATION_KEY, 1, None)
+    return cache.get(ROI_GENERATION_KEY, 1)
+
+
+def clear_roi_cache():
+    """Increment the roi generation so that all of the cached roi
+    results are ignored.  Called by signals in models.py."""
+    try:
+        cache.incr(ROI_GENERATION_KEY)
+    except ValueError:
+        cache.add(ROI_GENERATION_KEY, 1, None)
+
+
+def get_roi_result(name, roi, calculate):
+    """Return the cached result called name for the (normalized) roi,
+    calculating it with calculate(roi) if it isn't in the cache.
+
+    Arguments:
+    - `name`: identifies the result - different results of the same
+      roi are cached separately
+    - `roi`: a normalized roi (from normalize_roi())
+    - `calculate`: a function that returns the (picklable) result
+
+    """
+
+    key = "pjtk2:roi:{}:{}:{}".format(get_roi_generation(), name, roi_key(roi))
+    result = cache.get(key)
+    if result is None:
+        result = calculate(roi)
+        timeout = getattr(settings, "ROI_CACHE_TIMEOUT", 60 * 10)
+        cache.set(key, result, timeout)
+    return result
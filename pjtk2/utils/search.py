@@ -0,0 +1,137 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/search.py
+Created: 18 Oct 2026 12:31:05
+
+
+DESCRIPTION:
+
+Functions used to search the full text of projects.  The
+content_search column of each project is maintained by a database
+trigger (see migration 0007_weighted_content_search) and contains a
+weighted tsvector - the project name and project code are weighted A,
+the abstract B and the comment C.
+
+The search terms are converted to a tsquery in which every word must
+match but may be the start of a longer word (so 'salv' finds
+'salvelinus').  Matching projects are ordered by SearchRank, and
+ts_headline snippets highlighting the matched words can be created for
+the projects that are actually displayed.
+
+A. Cottrill
+=============================================================
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Func, TextField, Value
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+SEARCH_CONFIG = "english"
+
+# words are split on anything that isn't a letter or a digit
+# (including underscores) - the same way the postgres parser splits
+# project codes like LHA_IA12_123.
+WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# the highlighted words are delimited with markers that are replaced
+# with html tags *after* the snippet has been escaped.
+START_SEL = "[[hl]]"
+STOP_SEL = "[[/hl]]"
+HEADLINE_OPTIONS = (
+    'StartSel="{}", StopSel="{}", MaxFragments=2, MaxWords=30, MinWords=12, '
+    'FragmentDelimiter=" ... "'
+).format(START_SEL, STOP_SEL)
+
+
+class SearchHeadline(Func):
+    """ts_headline(config, document, query, options) - returns the parts
+    of the document that match the query with the matched words
+    highlighted."""
+
+    function = "ts_headline"
+    template = "%(function)s('{}'::regconfig, %(expressions)s)".format(SEARCH_CONFIG)
+    output_field = TextField()
+
+    def __init__(self, expression, query, options=HEADLINE_OPTIONS, **extra):
+        super(SearchHeadline, self).__init__(
+            expression, query, Value(options), **extra
+        )
+
+
+def build_search_query(text):
+    """Convert the search text entered by a user into a SearchQuery that
+    matches projects containing every word (or a word starting with
+    it).  Returns None if the text does not contain any words.
+
+    Arguments:
+    - `text`: the search terms entered by the user
+
+    """
+    words = WORD_RE.findall(text or "")
+    if not words:
+        return None
+    tsquery = " & ".join("{}:*".format(x.lower()) for x in words)
+    return SearchQuery(tsquery, config=SEARCH_CONFIG, search_type="raw")
+
+
+def rank_projects(queryset, text):
+    """Filter the project queryset to those that match the search text
+    and order them by relevance (then by end date).  If the text doesn't
+    contain any words, the queryset is returned unchanged.
+
+    Arguments:
+    - `queryset`: a project queryset
+    - `text`: the search terms entered by the user
+
+    """
+    query = build_search_query(text)
+    if query is None:
+        return queryset
+    return (
+        queryset.filter(content_search=query)
+        .annotate(rank=SearchRank(F("content_search"), query))
+        .order_by("-rank", "-prj_date1")
+    )
+
+
+def format_snippet(headline):
+    """Escape the headline returned by ts_headline and replace the
+    highlight markers with <mark> tags."""
+    snippet = escape(headline)
+    snippet = snippet.replace(escape(START_SEL), "<mark>")
+    snippet = snippet.replace(escape(STOP_SEL), "</mark>")
+    return mark_safe(snippet)
+
+
+def add_search_snippets(projects, text):
+    """Add a highlighted snippet of the abstract of each project to the
+    list of projects (as project.snippet).  The snippets for all of the
+    projects are created in a single query - ts_headline is expensive so
+    it should only be called for the projects on the current page.
+
+    Arguments:
+    - `projects`: a list (or page) of project objects
+    - `text`: the search terms entered by the user
+
+    """
+
+    from ..models import Project
+
+    projects = list(projects)
+    query = build_search_query(text)
+    if query is None or not projects:
+        return projects
+
+    headlines = dict(
+        Project.all_objects.filter(pk__in=[x.pk for x in projects])
+        .annotate(headline=SearchHeadline(F("abstract"), query))
+        .values_list("pk", "headline")
+    )
+    for project in projects:
+        headline = headlines.get(project.pk)
+        project.snippet = format_snippet(headline) if headline else ""
+    return projects
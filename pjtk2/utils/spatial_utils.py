@@ -12,9 +12,41 @@ A. Cottrill
 =============================================================
 """
 
-from django.db.models import Q
-from django.contrib.gis.db.models import Collect
+from django.db.models import BooleanField, FloatField, Func, Q, Value
+from django.contrib.gis.db.models import Collect, GeometryField
 from pjtk2.models import SamplePoint, Project, ProjectPolygon
+from pjtk2.utils.roi import get_roi_result
+
+
+class PointX(Func):
+    """ST_X - the x coordinate (longitude) of a point.  Lets the
+    coordinates be retrieved with .values() instead of building a GEOS
+    object for every point."""
+
+    function = "ST_X"
+    output_field = FloatField()
+
+
+class PointY(Func):
+    """ST_Y - the y coordinate (latitude) of a point."""
+
+    function = "ST_Y"
+    output_field = FloatField()
+
+
+class Within(Func):
+    """ST_Within(a, b) - True if the first geometry is completely inside
+    the second.  Used to annotate rows with a spatial predicate instead
+    of filtering them."""
+
+    function = "ST_Within"
+    output_field = BooleanField()
+
+
+def roi_value(roi):
+    """Wrap a region of interest so it can be used as an argument of a
+    database function."""
+    return Value(roi, output_field=GeometryField(srid=4326))
 
 # from olwidget.widgets import InfoMap, InfoLayer, Map
 
@@ -155,34 +187,26 @@ def find_roi_projects(roi, project_types=None, first_year=None, last_year=None):
             # the convex hull because pojects with less than three points
             # can't have a polygon.
 
-            projects = {}
-
-            contained = (
-                Project.objects.filter(multipoints__geom__within=roi)
-                .select_related("project_type")
-                .distinct()
-            )
-
-            overlapping = (
-                Project.objects.filter(multipoints__geom__intersects=roi)
-                .exclude(multipoints__geom__within=roi)
-                .select_related("project_type")
-                .distinct()
-            )
+            # every project with a point in the roi is found with one
+            # (index assisted) intersects query, and is annotated with
+            # whether or not all of its points are within the roi.
+            # Each project has only one multipoint, so no distinct()
+            # is required.
+            candidates = roi_candidates(roi).select_related("project_type")
 
             if project_types:
-                contained = contained.filter(project_type__in=project_types)
-                overlapping = overlapping.filter(project_type__in=project_types)
-
+                candidates = candidates.filter(project_type__in=project_types)
             if first_year:
-                contained = contained.filter(year__gte=first_year)
-                overlapping = overlapping.filter(year__gte=first_year)
+                candidates = candidates.filter(year__gte=first_year)
             if last_year:
-                contained = contained.filter(year__lte=last_year)
-                overlapping = overlapping.filter(year__lte=last_year)
+                candidates = candidates.filter(year__lte=last_year)
 
-            projects["contained"] = contained
-            projects["overlapping"] = overlapping
+            projects = {"contained": [], "overlapping": []}
+            for project in candidates:
+                if project.roi_within:
+                    projects["contained"].append(project)
+                else:
+                    projects["overlapping"].append(project)
 
     except AttributeError:
         pass
@@ -190,6 +214,35 @@ def find_roi_projects(roi, project_types=None, first_year=None, last_year=None):
     return projects
 
 
+def roi_candidates(roi):
+    """Return the projects with at least one sample point in the
+    region of interest, annotated with roi_within - True if all of their
+    points are in the roi."""
+    return Project.objects.filter(multipoints__geom__intersects=roi).annotate(
+        roi_within=Within("multipoints__geom", roi_value(roi))
+    )
+
+
+def classify_roi_projects(roi):
+    """Return a dictionary with the ids of the projects that are
+    contained in and overlap the region of interest, regardless of
+    project type or year."""
+    project_ids = {"contained": [], "overlapping": []}
+    for project_id, within in roi_candidates(roi).values_list("id", "roi_within"):
+        if within:
+            project_ids["contained"].append(project_id)
+        else:
+            project_ids["overlapping"].append(project_id)
+    return project_ids
+
+
+def get_roi_project_ids(roi):
+    """The (cached) ids of the projects that are contained in and
+    overlap the normalized region of interest.  Shared by the roi api
+    endpoints so the projects are only classified once for each roi."""
+    return get_roi_result("projects", roi, classify_roi_projects)
+
+
 def find_roi_points(roi, prj_cds):
     """Return a two element dictionary containing lists of projects that
        are entirely contained within and overlap with the region-of-interest
@@ -0,0 +1,238 @@
+"""
+=============================================================
+~/pjtk2/pjtk2/utils/vector_tiles.py
+Created: 18 Oct 2026 14:52:16
+
+
+DESCRIPTION:
+
+Mapbox Vector Tiles (MVT) of the sample points and project polygons.
+
+Each tile is built by PostGIS in a single query - the points and
+polygons that overlap the (buffered) tile are selected with the
+spatial index, projected to web mercator and clipped to the tile with
+ST_AsMVTGeom, and encoded with ST_AsMVT.  The tile contains two layers,
+'project_polygons' and 'sample_points', so the map only ever receives
+the features it can actually draw, at the resolution it draws them.
+At lower zoom levels the simplified project polygons (see
+POLYGON_RESOLUTIONS in models.py) are drawn instead of the full ones.
+
+The rows in each layer are selected by ordinary (filtered) querysets,
+so the tiles can be filtered the same way as the other api endpoints.
+
+Tiles are cached by z/x/y and the normalized query string.  Like the
+project facets, a generation number stored in the cache is included in
+every key and is incremented by signals in models.py whenever a
+project or its multipoints or polygon (which are recalculated every
+time sample points are uploaded) are saved or deleted.  Tiles also expire after
+settings.VECTOR_TILE_CACHE_TIMEOUT seconds.
+
+A. Cottrill
+=============================================================
+"""
+
+import hashlib
+import math
+
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F
+
+from .facets import normalize_query
+
+
+TILE_GENERATION_KEY = "pjtk2:vector_tiles:generation"
+
+# the size of a tile in tile coordinates and the number of tile
+# coordinates that features are allowed to extend past the edge of the
+# tile (so that point symbols and polygon outlines aren't cut off).
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 22
+
+# half the width of the web mercator (EPSG:3857) world in metres
+ORIGIN_SHIFT = 20037508.342789244
+EARTH_RADIUS = 6378137.0
+
+TILE_SQL = """
+WITH bounds AS (
+    SELECT ST_MakeEnvelope(%s, %s, %s, %s, 3857) AS geom
+), polygons AS (
+    SELECT ST_AsMVTGeom(
+               ST_Transform({polygon_geom}, 3857), bounds.geom, {extent}, {buffer}, true
+           ) AS geom,
+           src.prj_cd, src.prj_nm, src.year, src.project_type, src.slug
+      FROM ({polygons}) AS src
+      JOIN {polygon_table} AS poly ON poly.id = src.id
+     CROSS JOIN bounds
+), points AS (
+    SELECT ST_AsMVTGeom(
+               ST_Transform(pts.geom, 3857), bounds.geom, {extent}, {buffer}, true
+           ) AS geom,
+           src.label, src.prj_cd, src.year, src.project_type
+      FROM ({points}) AS src
+      JOIN {point_table} AS pts ON pts.id = src.id
+     CROSS JOIN bounds
+)
+SELECT COALESCE(
+           (SELECT ST_AsMVT(polygons, 'project_polygons', {extent}, 'geom')
+              FROM polygons WHERE geom IS NOT NULL),
+           ''::bytea
+       ) || COALESCE(
+           (SELECT ST_AsMVT(points, 'sample_points', {extent}, 'geom')
+              FROM points WHERE geom IS NOT NULL),
+           ''::bytea
+       )
+"""
+
+
+def tile_bounds(z, x, y):
+    """Return the web mercator bounds (xmin, ymin, xmax, ymax) of the
+    tile z/x/y.  Tiles are numbered from the top left corner of the
+    world (the xyz scheme used by leaflet).  Raises a ValueError if the
+    tile does not exist.
+    """
+    z, x, y = int(z), int(x), int(y)
+    ntiles = 2 ** z
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < ntiles and 0 <= y < ntiles):
+        raise ValueError("Tile {}/{}/{} does not exist.".format(z, x, y))
+    size = 2 * ORIGIN_SHIFT / ntiles
+    xmin = -ORIGIN_SHIFT + x * size
+    ymax = ORIGIN_SHIFT - y * size
+    return (xmin, ymax - size, xmin + size, ymax)
+
+
+def mercator_to_lonlat(mx, my):
+    """Convert web mercator metres to longitude and latitude."""
+    lon = math.degrees(mx / EARTH_RADIUS)
+    lat = math.degrees(2 * math.atan(math.exp(my / EARTH_RADIUS)) - math.pi / 2)
+    return (lon, lat)
+
+
+def tile_bbox(z, x, y, buffer=TILE_BUFFER):
+    """Return the bounding box (a polygon in EPSG:4326) of the tile z/x/y
+    expanded by buffer tile coordinates on every side - the area that
+    can contribute features to the tile."""
+    xmin, ymin, xmax, ymax = tile_bounds(z, x, y)
+    pad = (xmax - xmin) * buffer / TILE_EXTENT
+    xmin, ymin = mercator_to_lonlat(max(xmin - pad, -ORIGIN_SHIFT), ymin - pad)
+    xmax, ymax = mercator_to_lonlat(min(xmax + pad, ORIGIN_SHIFT), ymax + pad)
+    bbox = Polygon.from_bbox((xmin, ymin, xmax, ymax))
+    bbox.srid = 4326
+    return bbox
+
+
+def render_tile(points, polygons, z, x, y, polygon_column="geom"):
+    """Build the vector tile z/x/y containing the sample points and
+    project polygons in the querysets.  Only the rows that overlap the
+    tile are encoded.  Returns the tile as bytes (which will be empty
+    if there is nothing in the tile).
+
+    Arguments:
+    - `points`: a (filtered) SamplePoint queryset
+    - `polygons`: a (filtered) ProjectPolygon queryset
+    - `z`, `x`, `y`: the zoom level, column and row of the tile
+    - `polygon_column`: the ProjectPolygon column that is drawn - one
+      of the simplified polygons at lower zoom levels
+
+    """
+
+    bounds = tile_bounds(z, x, y)
+    bbox = tile_bbox(z, x, y)
+
+    points = (
+        points.filter(geom__bboverlaps=bbox)
+        .order_by()
+        .values(
+            "id",
+            "label",
+            prj_cd=F("project__prj_cd"),
+            year=F("project__year"),
+            project_type=F("project__project_type__project_type"),
+        )
+    )
+    polygons = (
+        polygons.filter(geom__bboverlaps=bbox)
+        .order_by()
+        .values(
+            "id",
+            prj_cd=F("project__prj_cd"),
+            prj_nm=F("project__prj_nm"),
+            year=F("project__year"),
+            project_type=F("project__project_type__project_type"),
+            slug=F("project__slug"),
+        )
+    )
+
+    connection = connections[points.db]
+    qn = connection.ops.quote_name
+    points_sql, points_params = points.query.sql_with_params()
+    polygons_sql, polygons_params = polygons.query.sql_with_params()
+
+    polygon_geom = "poly.{}".format(qn(polygon_column))
+    if polygon_column != "geom":
+        # fall back to the full polygon if it hasn't been simplified
+        polygon_geom = "COALESCE({}, poly.geom)".format(polygon_geom)
+
+    sql = TILE_SQL.format(
+        polygon_geom=polygon_geom,
+        extent=TILE_EXTENT,
+        buffer=TILE_BUFFER,
+        polygons=polygons_sql,
+        polygon_table=qn(polygons.model._meta.db_table),
+        points=points_sql,
+        point_table=qn(points.model._meta.db_table),
+    )
+    params = list(bounds) + list(polygons_params) + list(points_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile else b""
+
+
+def get_tile_generation():
+    """Return the current tile generation, creating it if needed."""
+    cache.add(TILE_GENERATION_KEY, 1, None)
+    return cache.get(TILE_GENERATION_KEY, 1)
+
+
+def clear_vector_tiles():
+    """Increment the tile generation so that all of the cached tiles
+    are ignored.  Called by signals in models.py."""
+    try:
+        cache.incr(TILE_GENERATION_KEY)
+    except ValueError:
+        cache.add(TILE_GENERATION_KEY, 1, None)
+
+
+def get_vector_tile(points, polygons, z, x, y, query_dict, polygon_column="geom"):
+    """Return the vector tile z/x/y, using the cached tile built with
+    the same filters if it exists.
+
+    Arguments:
+    - `points`: the filtered SamplePoint queryset
+    - `polygons`: the filtered ProjectPolygon queryset
+    - `z`, `x`, `y`: the zoom level, column and row of the tile
+    - `query_dict`: the parameters that were used to filter the
+      querysets - usually request.GET
+    - `polygon_column`: the ProjectPolygon column that is drawn
+
+    """
+
+    query = normalize_query(query_dict, exclude=())
+    key = "pjtk2:vector_tiles:{}:{}/{}/{}:{}".format(
+        get_tile_generation(),
+        int(z),
+        int(x),
+        int(y),
+        hashlib.md5(query.encode("utf-8")).hexdigest(),
+    )
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(points, polygons, z, x, y, polygon_column)
+        timeout = getattr(settings, "VECTOR_TILE_CACHE_TIMEOUT", 60 * 60)
+        cache.set(key, tile, timeout)
+    return tile
@@ -42,10 +42,11 @@ from ..forms import (
     NoticesForm,
     SisterProjectsForm,
     ApproveProjectsForm2,
+    get_approval_changes,
 )
 
 from ..utils.helpers import (
-    is_manager,
+    approve_projects,
     # group_required,
     make_possessive,
     get_messages_dict,
@@ -53,47 +54,64 @@ from ..utils.helpers import (
     my_messages,
     get_minions,
     get_sisters_dict,
-    make_proj_ms_dict,
+    make_proj_ms_matrix,
     get_project_filters,
 )
+from ..utils.permissions import get_permissions
 
 User = get_user_model()
 
 
-def get_proj_ms(project_ids, milestones):
-    """
+def get_proj_ms_matrix(owner_ids, milestones, this_year):
+    """Return the milestone matrix used on the 'my projects' and
+    'employee projects' pages for all of the active projects owned by
+    the users in owner_ids.  Each project and all of its project
+    milestones (including 'Approved' and 'Sign off' which are used to
+    classify each project) are retrieved in a single query - a left
+    join, so projects without any milestones are included too - and
+    then sorted into the submitted, approved, cancelled and complete
+    buckets by make_proj_ms_matrix().
+
+    Submitted, approved and cancelled projects are included for the
+    last five years, completed projects for the last fifteen.
 
     Arguments:
-    - `project_ids`:
+    - `owner_ids`: a list of user ids
+    - `milestones`: the milestones that make up the columns of the matrix
+    - `this_year`: the current year
+
     """
 
+    first_year = this_year - 5
+    first_year_complete = this_year - 15
+
     project_milestones = (
-        ProjectMilestones.objects.select_related("project", "milestone")
-        # .exclude(
-        #    milestone__label__in=["Approved", "Submitted", "Cancelled", "Sign off"]
-        # )
-        .filter(milestone__in=milestones)
-        .filter(project__pk__in=project_ids)
-        .prefetch_related("project__project_type", "project__prj_ldr")
-        .order_by("-project__year", "project__prj_cd", "milestone__order")
+        Project.objects.filter(
+            active=True,
+            owner__pk__in=owner_ids,
+            year__gte=min(first_year, first_year_complete),
+        )
+        .order_by("-year", "prj_cd", "projectmilestones__milestone__order")
         .values(
-            "project__prj_cd",
-            "project__prj_nm",
-            "project__year",
-            "project__slug",
-            "project__prj_ldr__first_name",
-            "project__prj_ldr__last_name",
-            "project__prj_ldr__username",
-            "project__project_type__project_type",
-            "milestone__category",
-            "milestone__report",
-            "milestone__label",
-            "required",
-            "completed",
+            "prj_cd",
+            "prj_nm",
+            "year",
+            "slug",
+            "cancelled",
+            "prj_ldr__first_name",
+            "prj_ldr__last_name",
+            "prj_ldr__username",
+            "project_type__project_type",
+            "projectmilestones__milestone__report",
+            "projectmilestones__milestone__label",
+            "projectmilestones__required",
+            "projectmilestones__completed",
         )
     )
 
-    return project_milestones
+    return make_proj_ms_matrix(
+        project_milestones, milestones, first_year, first_year_complete
+    )
 
 
 # ==========================
@@ -111,7 +129,7 @@ def approveprojects2(request):
 
     """
 
-    if is_manager(request.user) is False:
+    if get_permissions(request).is_manager is False:
         return HttpResponseRedirect(reverse("ApprovedProjectsList"))
 
     project_formset = formset_factory(form=ApproveProjectsForm2, extra=0)
@@ -137,10 +155,12 @@ def approveprojects2(request):
         )
 
         if this_year_formset.is_valid() and last_year_formset.is_valid():
-            for form in this_year_formset:
-                form.save()
-            for form in last_year_formset:
-                form.save()
+            # apply all of the changes at once rather than saving each
+            # form (and sending its messages) one at a time.
+            approved, unapproved = get_approval_changes(
+                this_year_formset, last_year_formset
+            )
+            approve_projects(approved, unapproved)
 
             return HttpResponseRedirect(reverse("ApprovedProjectsList"))
         else:
@@ -179,7 +199,7 @@ def approveprojects(request):
     approved/unapproved checkbox widget.
     """
 
-    if is_manager(request.user) is False:
+    if get_permissions(request).is_manager is False:
         return HttpResponseRedirect(reverse("ApprovedProjectsList"))
 
     project_formset = modelformset_factory(
@@ -190,15 +210,15 @@ def approveprojects(request):
     # TODO - test that projects in the future are included in this year
     # thisyears = Project.this_year.all().filter(SignOff=False)
     # lastyears = Project.last_year.all().filter(SignOff=False)
+    # approval status is read from milestone_flags - no need to
+    # prefetch the project milestones.
     thisyears = (
         Project.this_year.all()
         .select_related("prj_ldr", "project_type")
-        .prefetch_related("projectmilestones", "projectmilestones__milestone")
     )
     lastyears = (
         Project.last_year.all()
         .select_related("prj_ldr", "project_type")
-        .prefetch_related("projectmilestones", "projectmilestones__milestone")
     )
 
     year = datetime.datetime.now().year
@@ -269,7 +289,7 @@ def approve_project(request, slug):
     from the project detail page.
     """
 
-    if not is_manager(request.user):
+    if not get_permissions(request).is_manager:
         HttpResponseRedirect(reverse("ProjectList"))
 
     project = get_object_or_404(Project, slug=slug)
@@ -286,7 +306,7 @@ def unapprove_project(request, slug):
     from the project detail page.
     """
 
-    if not is_manager(request.user):
+    if not get_permissions(request).is_manager:
         HttpResponseRedirect(reverse("ProjectList"))
 
     project = Project.objects.get(slug=slug)
@@ -314,7 +334,7 @@ def cancel_project(request, slug):
 
     project = get_object_or_404(Project, slug=slug)
 
-    if is_manager(request.user):
+    if get_permissions(request).is_manager:
         project.cancel(request.user)
     return HttpResponseRedirect(project.get_absolute_url())
 
@@ -327,7 +347,7 @@ def uncancel_project(request, slug):
 
     project = get_object_or_404(Project, slug=slug)
 
-    if is_manager(request.user):
+    if get_permissions(request).is_manager:
         project.uncancel()
     return HttpResponseRedirect(project.get_absolute_url())
 
@@ -341,7 +361,7 @@ def signoff_project(request, slug):
 
     user = User.objects.get(pk=request.user.id)
     project = get_object_or_404(Project, slug=slug)
-    if is_manager(user):
+    if get_permissions(request).is_manager:
         project.signoff(user)
     return HttpResponseRedirect(project.get_absolute_url())
 
@@ -354,9 +374,8 @@ def reopen_project(request, slug):
     entries edited.
     """
 
-    user = User.objects.get(pk=request.user.id)
     project = get_object_or_404(Project, slug=slug)
-    if is_manager(user):
+    if get_permissions(request).is_manager:
         project.reopen()
     return HttpResponseRedirect(project.get_absolute_url())
 
@@ -370,7 +389,7 @@ def report_milestones(request, slug):
     reporting requirements for each project.
     """
 
-    if not is_manager(request.user):
+    if not get_permissions(request).is_manager:
         return HttpResponseRedirect(reverse("ProjectList"))
 
     project = Project.objects.get(slug=slug)
@@ -477,45 +496,7 @@ def my_projects(request):
 
     # get the submitted, approved and completed projects from the last five years
     this_year = datetime.datetime.now(pytz.utc).year
-
-    submitted_projects = (
-        Project.objects.submitted()
-        .filter(owner__pk__in=employees)
-        .filter(year__gte=this_year - 5)
-        .values_list("pk")
-    )
-
-    prj_milestones = get_proj_ms(submitted_projects, milestones)
-    submitted = make_proj_ms_dict(prj_milestones, milestones)
-
-    approved_projects = (
-        Project.objects.approved()
-        .filter(owner__pk__in=employees)
-        .filter(year__gte=this_year - 5)
-        .values_list("pk")
-    )
-    prj_milestones = get_proj_ms(approved_projects, milestones)
-    approved = make_proj_ms_dict(prj_milestones, milestones)
-
-    cancelled_projects = (
-        Project.objects.cancelled()
-        .filter(owner__pk__in=employees)
-        .filter(year__gte=this_year - 5)
-        .values_list("pk")
-    )
-
-    prj_milestones = get_proj_ms(cancelled_projects, milestones)
-    cancelled = make_proj_ms_dict(prj_milestones, milestones)
-
-    completed_projects = (
-        Project.objects.completed()
-        .filter(owner__pk__in=employees)
-        .filter(year__gte=this_year - 15)
-        .values_list("pk")
-    )
-
-    prj_milestones = get_proj_ms(completed_projects, milestones)
-    complete = make_proj_ms_dict(prj_milestones, milestones)
+    projects = get_proj_ms_matrix(employees, milestones, this_year)
 
     notices = get_messages_dict(my_messages(user))
     notices_count = len(notices)
@@ -540,14 +521,14 @@ def my_projects(request):
         {
             "bookmarks": bookmarks,
             "formset": notices_formset,
-            "complete": complete,
-            "complete_count": len(completed_projects),
-            "approved": approved,
-            "approved_count": len(approved_projects),
-            "cancelled": cancelled,
-            "cancelled_count": len(cancelled_projects),
-            "submitted": submitted,
-            "submitted_count": len(submitted_projects),
+            "complete": projects["complete"],
+            "complete_count": len(projects["complete"]),
+            "approved": projects["approved"],
+            "approved_count": len(projects["approved"]),
+            "cancelled": projects["cancelled"],
+            "cancelled_count": len(projects["cancelled"]),
+            "submitted": projects["submitted"],
+            "submitted_count": len(projects["submitted"]),
             "boss": boss,
             "notices_count": notices_count,
             "milestones": milestone_dict,
@@ -564,11 +545,10 @@ def employee_projects(request, employee_name):
     """
     # get the employee user object
     my_employee = get_object_or_404(User, username=employee_name)
-    user = User.objects.get(pk=request.user.id)
 
     # if I am not a manager or in the list of supervisors associated
     # with this employee, return me to my projects page
-    if is_manager(user) is False:
+    if get_permissions(request).is_manager is False:
         redirect_url = reverse("MyProjects")
         return HttpResponseRedirect(redirect_url)
 
@@ -597,45 +577,7 @@ def employee_projects(request, employee_name):
 
     # get the submitted, approved and completed projects from the last five years
     this_year = datetime.datetime.now(pytz.utc).year
-
-    submitted_projects = (
-        Project.objects.submitted()
-        .filter(owner=my_employee)
-        .filter(year__gte=this_year - 5)
-        .values_list("pk")
-    )
-
-    prj_milestones = get_proj_ms(submitted_projects, milestones)
-    submitted = make_proj_ms_dict(prj_milestones, milestones)
-
-    approved_projects = (
-        Project.objects.approved()
-        .filter(owner=my_employee)
-        .filter(year__gte=this_year - 5)
-        .values_list("pk")
-    )
-    prj_milestones = get_proj_ms(approved_projects, milestones)
-    approved = make_proj_ms_dict(prj_milestones, milestones)
-
-    cancelled_projects = (
-        Project.objects.cancelled()
-        .filter(owner=my_employee)
-        .filter(year__gte=this_year - 5)
-        .values_list("pk")
-    )
-
-    prj_milestones = get_proj_ms(cancelled_projects, milestones)
-    cancelled = make_proj_ms_dict(prj_milestones, milestones)
-
-    completed_projects = (
-        Project.objects.completed()
-        .filter(owner=my_employee)
-        .filter(year__gte=this_year - 15)
-        .values_list("pk")
-    )
-
-    prj_milestones = get_proj_ms(completed_projects, milestones)
-    complete = make_proj_ms_dict(prj_milestones, milestones)
+    projects = get_proj_ms_matrix([my_employee.id], milestones, this_year)
 
     template_name = "pjtk2/employee_projects.html"
 
@@ -651,14 +593,14 @@ def employee_projects(request, employee_name):
         {
             "employee": my_employee,
             "label": label,
-            "complete": complete,
-            "approved": approved,
-            "cancelled": cancelled,
-            "submitted": submitted,
-            "complete_count": len(completed_projects),
-            "approved_count": len(approved_projects),
-            "cancelled_count": len(cancelled_projects),
-            "submitted_count": len(submitted_projects),
+            "complete": projects["complete"],
+            "approved": projects["approved"],
+            "cancelled": projects["cancelled"],
+            "submitted": projects["submitted"],
+            "complete_count": len(projects["complete"]),
+            "approved_count": len(projects["approved"]),
+            "cancelled_count": len(projects["cancelled"]),
+            "submitted_count": len(projects["submitted"]),
             "milestones": milestone_dict,
             "edit": True,
         },
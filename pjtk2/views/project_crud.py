@@ -15,12 +15,14 @@
 
 from functools import partial, wraps
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 
 from django.forms import inlineformset_factory, formset_factory
 from django.http import HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404
+from django.utils.functional import SimpleLazyObject
 
 User = get_user_model()
 
@@ -35,50 +37,40 @@ from ..forms import (
 )
 
 from ..utils.helpers import (
-    get_assignments_with_paths,
-    is_dba,
-    is_manager,
     can_edit,
-    get_or_none,
+    get_assignments_with_paths,
+    get_project_detail,
     update_milestones,
 )
+from ..utils.permissions import get_permissions
+from ..utils.point_upload import PointUploadError
+from ..utils.points_file import describe_rows
 
 
 # @login_required
 def project_detail(request, slug):
     """
     View project details.
-    """
 
-    project = get_object_or_404(Project, slug=slug)
+    Most of the page is cached in fragments keyed by the project id and
+    its cache_version.  Only the project itself and the elements that
+    depend on the current user (edit buttons, bookmarks) are retrieved
+    for every request - get_project_detail() is only called if one of
+    the fragments has to be rendered.
+    """
 
-    milestones = project.get_milestones()
-    core = get_assignments_with_paths(project)
-    custom = get_assignments_with_paths(project, core=False)
+    project = get_object_or_404(Project.all_objects, slug=slug)
+    permissions = get_permissions(request)
 
-    # user = User.objects.get(pk=request.user.id)
-    user = get_or_none(User, pk=request.user.id)
-    edit = can_edit(user, project)
-    manager = is_manager(user)
+    context = {
+        "project": project,
+        "edit": permissions.can_edit(project) and not project.cancelled,
+        "manager": permissions.is_manager,
+        "detail": SimpleLazyObject(lambda: get_project_detail(slug, permissions)),
+        "cache_timeout": settings.PROJECT_DETAIL_CACHE_TIMEOUT,
+    }
 
-    if project.cancelled:
-        edit = False
-
-    has_sister = project.has_sister()
-
-    return render(
-        request,
-        "pjtk2/projectdetail.html",
-        {
-            "milestones": milestones,
-            "Core": core,
-            "Custom": custom,
-            "project": project,
-            "edit": edit,
-            "manager": manager,
-            "has_sister": has_sister,
-        },
-    )
+    return render(request, "pjtk2/projectdetail.html", context)
 
 
 def edit_project(request, slug):
@@ -92,7 +84,7 @@ def edit_project(request, slug):
 
     project = get_object_or_404(Project, slug=slug)
 
-    if can_edit(request.user, project) is False:
+    if get_permissions(request).can_edit(project) is False:
         return HttpResponseRedirect(project.get_absolute_url())
 
     return crud_project(request, slug, action="Edit")
@@ -133,8 +125,9 @@ def crud_project(request, slug, action="New"):
     # find out if the user is a manager or superuser, if so set manager
     # to true so that he or she can edit all fields.
     user = User.objects.get(pk=request.user.id)
-    manager = is_manager(user)
-    dba = is_dba(user)
+    permissions = get_permissions(request)
+    manager = permissions.is_manager
+    dba = permissions.is_dba
 
     if action == "Copy":
         milestones = None
@@ -291,7 +284,7 @@ def delete_report(request, slug, pk):
     report = get_object_or_404(Report, id=pk)
     project = get_object_or_404(Project, slug=slug)
 
-    if not can_edit(request.user, project):
+    if not get_permissions(request).can_edit(project):
         return HttpResponseRedirect(project.get_absolute_url())
 
     if request.method == "POST":
@@ -347,7 +340,7 @@ def delete_associated_file(request, id):
     associated_file = get_object_or_404(AssociatedFile, id=id)
     project = associated_file.project
 
-    if not can_edit(request.user, project):
+    if not get_permissions(request).can_edit(project):
         return HttpResponseRedirect(project.get_absolute_url())
 
     if request.method == "POST":
@@ -370,7 +363,7 @@ def spatial_point_upload(request, slug):
 
     project = Project.objects.get(slug=slug)
     # verify that only authorized users can add spatial data.
-    if can_edit(request.user, project) is False:
+    if get_permissions(request).can_edit(project) is False:
         return HttpResponseRedirect(project.get_absolute_url())
 
     if request.method == "POST":
@@ -379,12 +372,19 @@ def spatial_point_upload(request, slug):
         form = SpatialPointUploadForm(project=project)
 
     if form.is_valid():
-        form.save()
-        return HttpResponseRedirect(project.get_absolute_url())
+        try:
+            form.save()
+        except PointUploadError as err:
+            # the points were rejected when they were saved - report the
+            # rows of the file they came from like the other form errors.
+            points = form.cleaned_data["points_file"]
+            rows = points.row_numbers[err.row_numbers]
+            form.add_error("points_file", describe_rows(str(err), rows))
+        else:
+            return HttpResponseRedirect(project.get_absolute_url())
 
-    else:
-        return render(
-            request,
-            "pjtk2/UploadSpatialPoints.html",
-            {"project": project, "form": form},
-        )
+    return render(
+        request,
+        "pjtk2/UploadSpatialPoints.html",
+        {"project": project, "form": form},
+    )
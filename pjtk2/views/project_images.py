@@ -24,7 +24,7 @@ from ..models import Project, ProjectImage
 
 from ..forms import ProjectImageForm, EditImageForm
 
-from ..utils.helpers import can_edit
+from ..utils.permissions import get_permissions
 
 
 @login_required
@@ -38,7 +38,7 @@ def project_add_image(request, slug):
 
     project = get_object_or_404(Project, slug=slug)
 
-    if can_edit(request.user, project) is False:
+    if get_permissions(request).can_edit(project) is False:
         return HttpResponseRedirect(project.get_absolute_url())
 
     form = ProjectImageForm()
@@ -77,7 +77,7 @@ def edit_image(request, pk):
     image = get_object_or_404(ProjectImage, pk=pk)
     project = image.project
 
-    if can_edit(request.user, project) is False:
+    if get_permissions(request).can_edit(project) is False:
         return HttpResponseRedirect(project.get_absolute_url())
 
     form = EditImageForm(instance=image)
@@ -119,7 +119,7 @@ def project_images(request, slug):
     """
     project = get_object_or_404(Project, slug=slug)
 
-    if can_edit(request.user, project) is False:
+    if get_permissions(request).can_edit(project) is False:
         return HttpResponseRedirect(project.get_absolute_url())
 
     return render(request, "pjtk2/project_sort_images.html", {"project": project})
@@ -159,7 +159,7 @@ def delete_image_file(request, pk):
     image = get_object_or_404(ProjectImage, pk=pk)
     project = image.project
 
-    if can_edit(request.user, project) is False:
+    if get_permissions(request).can_edit(project) is False:
         return HttpResponseRedirect(project.get_absolute_url())
 
     if request.method == "POST":
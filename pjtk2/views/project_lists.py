@@ -21,10 +21,9 @@
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.contrib.gis.geos import Polygon
 from django.core.exceptions import ImproperlyConfigured
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q, Count, F
+from django.db.models import Q
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView
 from django.views.generic.base import TemplateView
@@ -39,8 +38,11 @@ from ..forms import GeoForm
 
 from ..filters import ProjectFilter
 
-from ..utils.helpers import is_manager
+from ..utils.facets import get_project_facets
+from ..utils.permissions import get_permissions
+from ..utils.search import add_search_snippets, rank_projects
 
+from ..utils.roi import InvalidROI, normalize_roi
 from ..utils.spatial_utils import find_roi_projects  # ,  get_map
 
 
@@ -124,6 +126,18 @@ class ListFilteredMixin(object):
         return super(ListFilteredMixin, self).get_context_data(**kwargs)
 
 
+class CountedPaginator(Paginator):
+    """A paginator for a queryset that has already been counted (e.g. by
+    the project facets) - the count is passed in rather than running
+    another COUNT(*) query."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super(CountedPaginator, self).__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # replaces the cached_property
+            self.count = count
+
+
 class ProjectSearch(ListView):
     """
     """
@@ -134,6 +148,35 @@ class ProjectSearch(ListView):
     # filterset_class = ProjectFilter
     template_name = "pjtk2/ProjectSearch.html"
     paginate_by = 50
+    paginator_class = CountedPaginator
+
+    def get_facets(self):
+        """All four facets and the total are calculated from the filtered
+        queryset (built once by get_queryset()) in a single query that is
+        cached for each distinct search."""
+        if not hasattr(self, "_facets"):
+            self._facets = get_project_facets(self.object_list, self.request.GET)
+        return self._facets
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        """The paginator uses the project count of the facets."""
+        kwargs["count"] = self.get_facets()["project_count"]
+        return super(ProjectSearch, self).get_paginator(queryset, per_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate the queryset, but return the first page if the page
+        isn't a number and the last page if it is out of range rather
+        than a 404."""
+
+        paginator = self.get_paginator(queryset, page_size)
+        page = self.request.GET.get(self.page_kwarg)
+        try:
+            page = paginator.page(page)
+        except PageNotAnInteger:
+            page = paginator.page(1)
+        except EmptyPage:
+            page = paginator.page(paginator.num_pages)
+        return (paginator, page, page.object_list, page.has_other_pages())
 
     def get_queryset(self):
 
@@ -142,7 +185,8 @@ class ProjectSearch(ListView):
         qs = Project.objects.select_related("project_type", "prj_ldr").all()
 
         if search:
-            qs = qs.filter(content_search=search)
+            # the best matches first
+            qs = rank_projects(qs, search)
 
         filtered_qs = ProjectFilter(self.request.GET, qs)
 
@@ -165,67 +209,24 @@ class ProjectSearch(ListView):
         if lake_abbrev:
             context["lake"] = Lake.objects.filter(abbrev=lake_abbrev).first()
 
-        # need to add our factetted counts:
-        qs = self.get_queryset()
-        # calculate our facets by lake:
-        lakes = (
-            qs.select_related("lake")
-            .all()
-            .values(lakeName=F("lake__lake_name"), lakeAbbrev=F("lake__abbrev"))
-            .order_by("lake")
-            .annotate(N=Count("lake__lake_name"))
-        )
-        context["lakes"] = lakes
-
-        project_types = (
-            qs.select_related("project_type")
-            .all()
-            .values(
-                projType=F("project_type__project_type"),
-                projTypeId=F("project_type__id"),
-            )
-            .order_by("project_type")
-            .annotate(N=Count("project_type"))
-        )
-        context["project_types"] = project_types
-
-        project_scope = (
-            qs.select_related("project_type")
-            .all()
-            .values(projScope=F("project_type__scope"))
-            .order_by("project_type__scope")
-            .annotate(N=Count("project_type__scope"))
-        )
+        # the facets were already retrieved for the paginator
+        facets = self.get_facets()
+        context["lakes"] = facets["lakes"]
+        context["project_types"] = facets["project_types"]
 
         scope_lookup = dict(ProjectType.PROJECT_SCOPE_CHOICES)
+        project_scope = [dict(x) for x in facets["project_scope"]]
         for scope in project_scope:
             scope["name"] = scope_lookup.get(scope["projScope"])
-
         context["project_scope"] = project_scope
 
-        protocols = (
-            qs.select_related("protocol")
-            .all()
-            .values(
-                projProtocol=F("protocol__protocol"),
-                protocolAbbrev=F("protocol__abbrev"),
-            )
-            .order_by("protocol")
-            .annotate(N=Count("protocol"))
-        )
-        context["protocols"] = protocols
+        context["protocols"] = facets["protocols"]
+        context["project_count"] = facets["project_count"]
 
-        paginator = Paginator(self.object_list, self.paginate_by)
-        page = self.request.GET.get("page")
-        try:
-            paged_qs = paginator.page(page)
-        except PageNotAnInteger:
-            paged_qs = paginator.page(1)
-        except EmptyPage:
-            paged_qs = paginator.page(paginator.num_pages)
-
-        context["project_count"] = qs.count()
-        context["object_list"] = paged_qs.object_list
+        if context["search"]:
+            context["object_list"] = add_search_snippets(
+                context["object_list"], context["search"]
+            )
 
         return context
 
@@ -321,17 +322,13 @@ class ApprovedProjectsList(ListView):
 
     def get_context_data(self, **kwargs):
         context = super(ApprovedProjectsList, self).get_context_data(**kwargs)
-        context["manager"] = is_manager(self.request.user)
+        context["manager"] = get_permissions(self.request).is_manager
         context["approved"] = True
         return context
 
     def get_queryset(self):
         """Start with just approved projects"""
-        qs = (
-            Project.objects.approved()
-            .select_related("project_type", "prj_ldr")
-            .prefetch_related("projectmilestones", "projectmilestones__milestone")
-        )
+        qs = Project.objects.approved().select_related("project_type", "prj_ldr")
 
         filtered_qs = ProjectFilter(self.request.GET, qs)
 
@@ -355,48 +352,42 @@ def find_projects_roi_view(request):
     if request.method == "POST":
         form = GeoForm(request.POST)
         if form.is_valid():
-            roi = form.cleaned_data["selection"][0]
-            if roi.geom_type == "LinearRing":
-                roi = Polygon(roi)
+            # the normalized roi is also used by the api calls made by
+            # the results page - so they can share its cached results.
+            try:
+                roi = normalize_roi(form.cleaned_data["selection"][0])
+            except InvalidROI as err:
+                form.add_error("selection", str(err))
 
+        if form.is_valid():
             project_types = form.cleaned_data["project_types"]
             first_year = form.cleaned_data["first_year"]
             last_year = form.cleaned_data["last_year"]
 
             projects = find_roi_projects(roi, project_types, first_year, last_year)
 
-            # there must be a better way to do this - build the url
-            # filters to be used by the api calls when the template is
-            # rendered.  THe points are retrieved using ajax calls to
-            # improve performance - the page loads, and then points are
-            # added.
-            api_filter_string = "?first_year={}&last_year={}".format(
-                first_year, last_year
+            # the map draws the points and polygons of the contained
+            # and overlapping projects from the vector tiles (filtered
+            # by project code) - the page loads, and then only the
+            # tiles that are visible are retrieved.
+            contained_prj_cds = ",".join([x.prj_cd for x in projects["contained"]])
+            overlapping_prj_cds = ",".join(
+                [x.prj_cd for x in projects["overlapping"]]
             )
-            if project_types:
-                ids = ",".join([str(x.id) for x in project_types])
-                api_filter_string += "&project_type=" + ids
 
             return render(
                 request,
                 "pjtk2/show_projects_gis.html",
                 {
-                    "api_filter_string": api_filter_string,
+                    "contained_prj_cds": contained_prj_cds,
+                    "overlapping_prj_cds": overlapping_prj_cds,
                     "roi": roi,
                     "contained": projects["contained"],
                     "overlapping": projects["overlapping"],
                 },
             )
         else:
-            return render(
-                request,
-                "pjtk2/find_projects_gis.html",
-                {
-                    "form": form,
-                    "contained": projects["contained"],
-                    "overlapping": projects["overlapping"],
-                },
-            )
+            return render(request, "pjtk2/find_projects_gis.html", {"form": form})
     else:
         form = GeoForm()
     return render(request, "pjtk2/find_projects_gis.html", {"form": form})